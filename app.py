@@ -35,6 +35,12 @@ if 'revenus' not in st.session_state:
 if 'depenses' not in st.session_state:
     st.session_state.depenses = []
 
+# --- Préchauffage d'OpenFisca ---
+# Les processus de calcul fiscal sont lancés et préchauffés en arrière-plan (une seule fois
+# par serveur) ; OpenFisca n'est pas importé dans le thread de la page.
+from utils import fiscalite
+fiscalite.demarrer_prechauffage()
+
 pg = st.navigation(
     {
         "Fichier": [
@@ -13,7 +13,7 @@ Graphiques générés:
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
-from core.patrimoine_logic import calculate_monthly_payment
+from core.loan_schedule import get_portfolio
 
 # --- Constantes ---
 RENTAL_INCOME_WEIGHT = 0.70  # Pondération des revenus locatifs par les banques
@@ -66,12 +66,8 @@ def calculate_current_debt_service(passifs):
     """
     total_debt_service = 0
     debt_details = []
-    for passif in passifs:
-        mensualite = calculate_monthly_payment(
-            passif.get('montant_initial', 0),
-            passif.get('taux_annuel', 0),
-            passif.get('duree_mois', 0)
-        )
+    for passif, mensualite in zip(passifs, get_portfolio(passifs).mensualites):
+        mensualite = float(mensualite)
         if mensualite > 0:
             debt_details.append({
                 'libelle': passif.get('libelle', 'Prêt non identifié'),
@@ -0,0 +1,153 @@
+# --- Index des actifs et passifs du foyer ---
+# Les listes `st.session_state.actifs` / `st.session_state.passifs` (dictionnaires, format de
+# sauvegarde JSON) restent la source de vérité : les pages les modifient en place. Le magasin
+# d'entités en tient un index synchronisé (actif par id, prêts par actif, dette par actif) et
+# versionné : chaque enregistrement porte une version incrémentée à chaque modification, ce qui
+# permet aux calculs dépendants de savoir sans recalcul si leurs entrées ont changé.
+
+def _figer(valeur):
+    """Valeur hachable équivalente (listes et dictionnaires convertis en tuples)."""
+    if isinstance(valeur, dict):
+        return tuple(sorted((k, _figer(v)) for k, v in valeur.items()))
+    if isinstance(valeur, (list, tuple, set)):
+        return tuple(_figer(v) for v in valeur)
+    return valeur
+
+def empreinte_entite(entite):
+    """Empreinte du contenu d'un actif ou d'un passif (comparée d'une synchronisation à l'autre)."""
+    return _figer(entite)
+
+class _EntityRecord:
+    """Enregistrement versionné d'une entité : identifiant, dictionnaire d'origine et empreinte."""
+
+    __slots__ = ('id', 'data', 'version', 'empreinte')
+
+    def __init__(self, entity_id, data, empreinte):
+        self.id = entity_id
+        self.data = data
+        self.version = 1
+        self.empreinte = empreinte
+
+    def mettre_a_jour(self, data, empreinte):
+        """Rattache le dictionnaire courant ; retourne True si son contenu a changé."""
+        self.data = data
+        if empreinte == self.empreinte:
+            return False
+        self.empreinte = empreinte
+        self.version += 1
+        return True
+
+class ActifRecord(_EntityRecord):
+    __slots__ = ()
+
+class PassifRecord(_EntityRecord):
+    __slots__ = ('actif_associe_id',)
+
+    def __init__(self, entity_id, data, empreinte):
+        super().__init__(entity_id, data, empreinte)
+        self.actif_associe_id = data.get('actif_associe_id')
+
+    def mettre_a_jour(self, data, empreinte):
+        self.actif_associe_id = data.get('actif_associe_id')
+        return super().mettre_a_jour(data, empreinte)
+
+class EntityStore:
+    """
+    Index des actifs et passifs avec recherche en O(1) par identifiant d'actif et index inverse
+    actif → prêts. `synchroniser` met l'index à jour depuis les listes du session_state (un seul
+    parcours) ; `version` augmente dès qu'une entité est ajoutée, supprimée, déplacée ou modifiée.
+    """
+
+    __slots__ = ('actifs', 'passifs', 'version', '_empreintes', '_actifs_par_id', '_prets_par_actif', '_dette_par_actif')
+
+    def __init__(self):
+        self.actifs = []
+        self.passifs = []
+        self.version = 0
+        self._empreintes = (None, None)
+        self._actifs_par_id = {}
+        self._prets_par_actif = {}
+        self._dette_par_actif = {}
+
+    @staticmethod
+    def _cle(entite, index, prefixe):
+        # Les passifs créés depuis la page Patrimoine n'ont pas toujours d'identifiant
+        return entite.get('id') or f"{prefixe}{index}"
+
+    def _synchroniser_liste(self, records, entites, classe, prefixe):
+        anciens = {r.id: r for r in records}
+        nouveaux = []
+        for i, entite in enumerate(entites):
+            cle = self._cle(entite, i, prefixe)
+            empreinte = empreinte_entite(entite)
+            record = anciens.pop(cle, None)
+            if record is None:
+                record = classe(cle, entite, empreinte)
+            else:
+                record.mettre_a_jour(entite, empreinte)
+            nouveaux.append(record)
+        return nouveaux
+
+    def synchroniser(self, actifs, passifs):
+        """Met l'index à jour depuis les listes d'actifs et de passifs ; retourne True s'il a changé."""
+        empreintes = (tuple(empreinte_entite(a) for a in actifs), tuple(empreinte_entite(p) for p in passifs))
+        if empreintes == self._empreintes:
+            # Contenus inchangés : les dictionnaires courants sont rattachés (listes rechargées, copies)
+            for record, entite in zip(self.actifs + self.passifs, list(actifs) + list(passifs)):
+                record.data = entite
+            return False
+        self._empreintes = empreintes
+
+        self.actifs = self._synchroniser_liste(self.actifs, actifs, ActifRecord, 'actif_')
+        self.passifs = self._synchroniser_liste(self.passifs, passifs, PassifRecord, 'passif_')
+        self._actifs_par_id = {r.id: r for r in self.actifs}
+        self._prets_par_actif = {}
+        self._dette_par_actif = {}
+        for record in self.passifs:
+            actif_id = record.actif_associe_id
+            if actif_id:
+                self._prets_par_actif.setdefault(actif_id, []).append(record)
+                self._dette_par_actif[actif_id] = self._dette_par_actif.get(actif_id, 0) + record.data.get('crd_calcule', 0)
+        self.version += 1
+        return True
+
+    def get_actif(self, actif_id):
+        """Dictionnaire de l'actif d'identifiant donné (None s'il n'existe pas)."""
+        record = self._actifs_par_id.get(actif_id)
+        return record.data if record else None
+
+    def prets_associes(self, actif_id):
+        """Prêts associés à un actif, dans l'ordre de la liste des passifs."""
+        if not actif_id:
+            return []
+        return [r.data for r in self._prets_par_actif.get(actif_id, [])]
+
+    def dette_par_actif(self):
+        """Somme des CRD calculés (`crd_calcule`) des prêts de chaque actif."""
+        return self._dette_par_actif
+
+    def version_actif(self, actif_id):
+        """Versions de l'actif et de ses prêts : identique tant qu'aucune de ces entités n'a changé."""
+        record = self._actifs_par_id.get(actif_id)
+        return (record.version if record else 0, tuple((r.id, r.version) for r in self._prets_par_actif.get(actif_id, [])))
+
+_STORE_HORS_SESSION = EntityStore()
+
+def get_entity_store(actifs=None, passifs=None):
+    """
+    Magasin d'entités de la session, synchronisé avec les listes fournies (par défaut celles
+    du session_state). Hors session Streamlit, un magasin de module est utilisé.
+    """
+    import streamlit as st
+    try:
+        if actifs is None:
+            actifs = st.session_state.get('actifs', [])
+        if passifs is None:
+            passifs = st.session_state.get('passifs', [])
+        if '_entity_store' not in st.session_state:
+            st.session_state['_entity_store'] = EntityStore()
+        store = st.session_state['_entity_store']
+    except Exception:  # session_state inaccessible (exécution hors Streamlit)
+        store = _STORE_HORS_SESSION
+    store.synchroniser([] if actifs is None else actifs, [] if passifs is None else passifs)
+    return store
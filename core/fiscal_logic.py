@@ -1,42 +1,45 @@
-import streamlit as st
 from datetime import date
-from .patrimoine_logic import find_associated_loans, calculate_loan_annual_breakdown
+from .patrimoine_logic import calculate_loan_annual_breakdown
+from .foyer import foyer_depuis_session
+from utils.bareme_ir import calculer_ir_foyer, parametres_ir_disponibles
 
-try:
-    from utils.openfisca_utils import analyser_fiscalite_foyer
-    OPENFISCA_AVAILABLE = True
-except ImportError:
-    OPENFISCA_AVAILABLE = False
+from utils import fiscalite
+from utils.openfisca_worker import executer_tache
 
-def calculate_monthly_income_tax():
+OPENFISCA_AVAILABLE = fiscalite.OPENFISCA_READY
+
+# --- Calculs sur un instantané du foyer (core.foyer.FoyerSnapshot), sans Streamlit ---
+
+def impot_mensuel(foyer):
     """
     Calcule l'impôt sur le revenu mensuel basé sur les revenus du foyer.
     Retourne 0 si les données sont insuffisantes ou en cas d'erreur.
     """
     if not OPENFISCA_AVAILABLE:
         # Calcul approximatif si OpenFisca n'est pas disponible
-        return calculate_simple_income_tax_monthly()
+        return impot_mensuel_simplifie(foyer)
     
     try:
         # Récupération des données du foyer
-        parents = st.session_state.get('parents', [])
-        enfants = st.session_state.get('enfants', [])
+        parents = foyer.parents
+        enfants = foyer.enfants
         
         if not parents:
             return 0
         
         # Calcul des revenus annuels
         revenus_annuels = {}
-        for revenu in st.session_state.get('revenus', []):
+        for revenu in foyer.revenus:
             if revenu.get('type') == 'Salaire' and revenu.get('montant', 0) > 0:
                 prenom = revenu.get('libelle', 'Inconnu').split(' ')[-1]
                 revenus_annuels[prenom] = revenu.get('montant', 0) * 12
         
         # Calcul du revenu foncier net
-        _, revenu_foncier_net = get_revenus_imposables(date.today().year)
+        _, revenu_foncier_net = revenus_imposables(foyer, date.today().year)
         
-        # Appel à OpenFisca
-        fiscalite_results = analyser_fiscalite_foyer(
+        # Appel à OpenFisca (processus de calcul fiscal : OpenFisca n'est pas importé par la page)
+        fiscalite_results = executer_tache(
+            'foyer', message="Calcul de l'impôt sur le revenu",
             annee=date.today().year,
             parents=parents,
             enfants=enfants,
@@ -49,60 +52,76 @@ def calculate_monthly_income_tax():
         ir_annuel = fiscalite_results.get('ir_net', 0)
         return round(ir_annuel / 12, 2)
         
-    except Exception as e:
+    except Exception:
         # En cas d'erreur, utiliser le calcul simplifié
-        return calculate_simple_income_tax_monthly()
+        return impot_mensuel_simplifie(foyer)
 
-def calculate_simple_income_tax_monthly():
+def impot_mensuel_simplifie(foyer):
     """
     Calcul simplifié de l'impôt sur le revenu mensuel (fallback).
-    Utilise une approximation basée sur les tranches d'imposition 2024.
+    Utilise le noyau NumPy de `utils.bareme_ir` (barème, quotient familial, décote et
+    abattement de 10 %), sans simulation OpenFisca. Les paramètres de l'année ne sont utilisés
+    que s'ils ont déjà été extraits dans ce processus (sinon paramètres intégrés) : ce repli ne
+    construit pas le système socio-fiscal dans le processus de la page.
     """
     try:
-        # Calcul du revenu total annuel
-        total_revenus_annuel = 0
-        for revenu in st.session_state.get('revenus', []):
-            if revenu.get('type') == 'Salaire' and revenu.get('montant', 0) > 0:
-                total_revenus_annuel += revenu.get('montant', 0) * 12
-        
-        # Revenus fonciers
-        _, revenu_foncier_net = get_revenus_imposables(date.today().year)
-        total_revenus_annuel += revenu_foncier_net
-        
-        # Estimation du nombre de parts fiscales
-        parents = st.session_state.get('parents', [])
-        enfants = st.session_state.get('enfants', [])
-        parts_fiscales = len(parents) if parents else 1
-        parts_fiscales += len(enfants) * 0.5
-        
-        # Calcul simplifié avec les tranches 2024
-        revenu_par_part = total_revenus_annuel / parts_fiscales
-        
-        # Tranches d'imposition 2024 (approximation)
-        if revenu_par_part <= 11294:
-            ir_annuel = 0
-        elif revenu_par_part <= 28797:
-            ir_annuel = (revenu_par_part - 11294) * 0.11 * parts_fiscales
-        elif revenu_par_part <= 82341:
-            ir_annuel = (1925.33 + (revenu_par_part - 28797) * 0.30) * parts_fiscales
-        elif revenu_par_part <= 177106:
-            ir_annuel = (17988.63 + (revenu_par_part - 82341) * 0.41) * parts_fiscales
-        else:
-            ir_annuel = (56851.28 + (revenu_par_part - 177106) * 0.45) * parts_fiscales
-        
-        return round(max(0, ir_annuel) / 12, 2)
-        
+        parents = foyer.parents
+        enfants = foyer.enfants
+        if not parents:
+            return 0
+
+        annee = date.today().year
+        revenus_salaires, revenu_foncier_net = revenus_imposables(foyer, annee)
+        resultats = calculer_ir_foyer(
+            annee=annee,
+            parents=parents,
+            enfants=enfants,
+            revenus_annuels=revenus_salaires,
+            revenu_foncier_net=revenu_foncier_net,
+            est_parent_isole=(len(parents) == 1),
+            parametres=parametres_ir_disponibles(annee)
+        )
+        return round(max(0, resultats['ir_net']) / 12, 2)
+
     except Exception:
         return 0
 
-def get_revenus_imposables(year_of_analysis):
+def taux_marginal(foyer):
     """
-    Calcule les revenus imposables (salaires et fonciers) pour une année donnée.
-    Cette fonction est partagée par les pages d'analyse fiscale.
+    Estime la tranche marginale d'imposition (en décimal) du foyer. Le calcul est confié aux
+    processus OpenFisca (le système socio-fiscal n'est pas construit par la page) ; sans
+    OpenFisca, le noyau NumPy de `utils.bareme_ir` utilise les paramètres par défaut.
+    Retourne None si le foyer n'est pas renseigné.
+    """
+    parents = foyer.parents
+    if not parents:
+        return None
+    try:
+        annee = date.today().year
+        revenus_salaires, revenu_foncier_net = revenus_imposables(foyer, annee)
+        parametres_foyer = dict(
+            annee=annee,
+            parents=parents,
+            enfants=foyer.enfants,
+            revenus_annuels=revenus_salaires,
+            revenu_foncier_net=revenu_foncier_net,
+            est_parent_isole=(len(parents) == 1),
+        )
+        if OPENFISCA_AVAILABLE:
+            resultats = executer_tache('foyer', message="Estimation de la TMI", **parametres_foyer)
+        else:
+            resultats = calculer_ir_foyer(parametres=parametres_ir_disponibles(annee), **parametres_foyer)
+        return resultats['tmi'] / 100
+    except Exception:
+        return None
+
+def revenus_imposables(foyer, year_of_analysis):
+    """
+    Calcule les revenus imposables (salaires et fonciers) du foyer pour une année donnée.
     """
     # 1. Revenus du travail
     revenus_salaires = {}
-    for revenu in st.session_state.get('revenus', []):
+    for revenu in foyer.revenus:
         if revenu.get('type') == 'Salaire':
             # Suppose que le libellé est "Salaire Prénom"
             prenom = revenu.get('libelle', 'Inconnu').split(' ')[-1]
@@ -111,17 +130,38 @@ def get_revenus_imposables(year_of_analysis):
     # 2. Revenus fonciers (hors LMNP)
     total_loyers_bruts_annee = 0
     total_charges_deductibles_annee = 0
-    passifs = st.session_state.get('passifs', [])
-    actifs_productifs = [a for a in st.session_state.get('actifs', []) if a.get('type') == 'Immobilier productif' and a.get('mode_exploitation') != 'Location Meublée']
+    store = foyer.entites()
+    actifs_productifs = [a for a in foyer.actifs if a.get('type') == 'Immobilier productif' and a.get('mode_exploitation') != 'Location Meublée']
 
     for asset in actifs_productifs:
         loyers_annuels = asset.get('loyers_mensuels', 0) * 12
         charges_annuelles = asset.get('charges', 0) * 12
         taxe_fonciere = asset.get('taxe_fonciere', 0)
-        loans = find_associated_loans(asset.get('id'), passifs)
+        loans = store.prets_associes(asset.get('id'))
         interets_emprunt = sum(calculate_loan_annual_breakdown(l, year=year_of_analysis).get('interest', 0) for l in loans)
         total_loyers_bruts_annee += loyers_annuels
         total_charges_deductibles_annee += (charges_annuelles + taxe_fonciere + interets_emprunt)
 
     revenu_foncier_net = max(0, total_loyers_bruts_annee - total_charges_deductibles_annee)
-    return revenus_salaires, revenu_foncier_net
\ No newline at end of file
+    return revenus_salaires, revenu_foncier_net
+
+# --- Adaptateurs Streamlit : le foyer est lu dans le session_state ---
+
+def calculate_monthly_income_tax():
+    """Impôt sur le revenu mensuel du foyer de la session (voir `impot_mensuel`)."""
+    return impot_mensuel(foyer_depuis_session())
+
+def calculate_simple_income_tax_monthly():
+    """Impôt sur le revenu mensuel simplifié du foyer de la session (voir `impot_mensuel_simplifie`)."""
+    return impot_mensuel_simplifie(foyer_depuis_session())
+
+def estimate_marginal_tax_rate():
+    """TMI du foyer de la session (voir `taux_marginal`)."""
+    return taux_marginal(foyer_depuis_session())
+
+def get_revenus_imposables(year_of_analysis):
+    """
+    Revenus imposables (salaires et fonciers) du foyer de la session pour une année donnée.
+    Cette fonction est partagée par les pages d'analyse fiscale.
+    """
+    return revenus_imposables(foyer_depuis_session(), year_of_analysis)
@@ -1,9 +1,9 @@
-import streamlit as st
 import uuid
 import pandas as pd
 from datetime import date
 from core.patrimoine_logic import calculate_monthly_payment
-from core.fiscal_logic import calculate_monthly_income_tax
+from core.fiscal_logic import impot_mensuel
+from core.foyer import foyer_depuis_session
 
 # --- Constantes ---
 INSEE_DECILES_2021 = {
@@ -39,33 +39,32 @@ def calculate_consumption_units(parents, enfants):
     all_members = parents[1:] + enfants
     return 1.0 + sum(0.3 if calculate_age(m.get('date_naissance')) < 14 else 0.5 for m in all_members)
 
-def sync_all_flux_data():
+# --- Flux automatiques d'un instantané du foyer (core.foyer.FoyerSnapshot), sans Streamlit ---
+
+def salaires_manquants(foyer):
+    """Nouvelles entrées de salaire (montant nul) pour les parents qui n'en ont pas encore."""
+    parent_prenoms = {p['prenom'] for p in foyer.parents if p.get('prenom')}
+    salaire_prenoms = {r['libelle'].split(' ')[1] for r in foyer.revenus if r.get('type') == 'Salaire'}
+    return [{
+        'id': f"salaire_{prenom}",
+        'libelle': f"Salaire {prenom}",
+        'montant': 0.0,
+        'type': 'Salaire'
+    } for prenom in parent_prenoms - salaire_prenoms]
+
+def flux_automatiques(foyer, auto_ir_enabled=True):
     """
-    Synchronise les revenus et dépenses avec les données des autres pages (Famille, Patrimoine).
-    - Salaires des parents.
+    Revenus et dépenses déduits des autres données du foyer (nouvelles listes de dictionnaires) :
     - Loyers, charges, et taxes des biens immobiliers.
     - Mensualités des prêts.
-    Cette fonction reconstruit les listes à chaque exécution pour garantir la cohérence.
+    - Impôt sur le revenu mensuel (si `auto_ir_enabled`).
+    Les salaires et les entrées manuelles ne sont pas inclus.
     """
-    if 'revenus' not in st.session_state:
-        st.session_state.revenus = []
-    if 'depenses' not in st.session_state:
-        st.session_state.depenses = []
-
-    # --- 1. Conserver les entrées manuelles et séparer les salaires ---
-    manual_revenus = [r for r in st.session_state.revenus if 'source_id' not in r and r.get('type') != 'Salaire']
-    manual_depenses = [d for d in st.session_state.depenses if 'source_id' not in d]
-    
-    # On commence avec une liste vide pour les flux automatiques
     auto_revenus = []
     auto_depenses = []
 
-    # --- 2. Synchronisation des salaires ---
-    sync_salaires(auto_revenus) # Modifie la liste auto_revenus directement
-
-    # --- 3. Synchronisation avec le patrimoine ---
     # Actifs immobiliers -> Revenus (loyers) et Dépenses (charges, taxe)
-    for asset in st.session_state.get('actifs', []):
+    for asset in foyer.actifs:
         asset_id = asset['id']
         asset_type = asset.get('type')
 
@@ -82,17 +81,15 @@ def sync_all_flux_data():
                 auto_depenses.append({'id': f"charges_{asset_id}", 'libelle': f"Charges de '{asset.get('libelle', 'N/A')}'", 'montant': asset['charges'], 'categorie': 'Logement', 'source_id': asset_id})
 
     # Passifs (prêts) -> Dépenses (mensualités)
-    for passif in st.session_state.get('passifs', []):
+    for passif in foyer.passifs:
         passif_id = passif.get('id', str(uuid.uuid4()))
-        if 'id' not in passif: passif['id'] = passif_id
         mensualite = calculate_monthly_payment(passif.get('montant_initial', 0), passif.get('taux_annuel', 0), passif.get('duree_mois', 0))
         if mensualite > 0:
             auto_depenses.append({'id': f"pret_{passif_id}", 'libelle': f"Mensualité de '{passif.get('libelle', 'Prêt N/A')}'", 'montant': mensualite, 'categorie': 'Remboursement de prêts', 'source_id': passif_id})
 
-    # --- 4. Synchronisation de l'impôt sur le revenu ---
     # Calcul automatique de l'impôt sur le revenu mensuel (si activé)
-    if st.session_state.get('auto_ir_enabled', True):
-        ir_mensuel = calculate_monthly_income_tax()
+    if auto_ir_enabled:
+        ir_mensuel = impot_mensuel(foyer)
         if ir_mensuel > 0:
             auto_depenses.append({
                 'id': 'impot_revenu_auto', 
@@ -102,34 +99,61 @@ def sync_all_flux_data():
                 'source_id': 'fiscal_auto'
             })
 
-    # --- 5. Réassemblage des listes ---
-    st.session_state.revenus = auto_revenus + manual_revenus
+    return auto_revenus, auto_depenses
+
+# --- Adaptateurs Streamlit : les listes du session_state sont mises à jour ---
+
+def sync_all_flux_data():
+    """
+    Synchronise les revenus et dépenses avec les données des autres pages (Famille, Patrimoine).
+    - Salaires des parents.
+    - Loyers, charges, et taxes des biens immobiliers.
+    - Mensualités des prêts.
+    Cette fonction reconstruit les listes à chaque exécution pour garantir la cohérence.
+    """
+    import streamlit as st
+    if 'revenus' not in st.session_state:
+        st.session_state.revenus = []
+    if 'depenses' not in st.session_state:
+        st.session_state.depenses = []
+
+    # --- 1. Conserver les entrées manuelles et séparer les salaires ---
+    manual_revenus = [r for r in st.session_state.revenus if 'source_id' not in r and r.get('type') != 'Salaire']
+    manual_depenses = [d for d in st.session_state.depenses if 'source_id' not in d]
+
+    # --- 2. Synchronisation des salaires ---
+    auto_revenus = []
+    sync_salaires(auto_revenus) # Modifie la liste auto_revenus directement
+
+    # Les passifs sans identifiant en reçoivent un (référencé par leur dépense de mensualité)
+    for passif in st.session_state.get('passifs', []):
+        if 'id' not in passif: passif['id'] = str(uuid.uuid4())
+
+    # --- 3. Synchronisation avec le patrimoine et l'impôt sur le revenu ---
+    revenus_patrimoine, auto_depenses = flux_automatiques(foyer_depuis_session(), st.session_state.get('auto_ir_enabled', True))
+
+    # --- 4. Réassemblage des listes ---
+    st.session_state.revenus = auto_revenus + revenus_patrimoine + manual_revenus
     st.session_state.depenses = auto_depenses + manual_depenses
 
 def sync_salaires(auto_revenus_list):
     """
     S'assure que chaque parent a une entrée de salaire et l'ajoute à la liste fournie.
     """
-    # On s'assure que chaque parent a une entrée de salaire
-    parent_prenoms = {p['prenom'] for p in st.session_state.get('parents', []) if p.get('prenom')}
-    salaire_prenoms = {r['libelle'].split(' ')[1] for r in st.session_state.revenus if r.get('type') == 'Salaire'}
-
+    import streamlit as st
     # Ajouter les salaires manquants
-    for prenom in parent_prenoms - salaire_prenoms:
-        st.session_state.revenus.insert(0, {
-            'id': f"salaire_{prenom}",
-            'libelle': f"Salaire {prenom}",
-            'montant': 0.0,
-            'type': 'Salaire'
-        })
+    for salaire in salaires_manquants(foyer_depuis_session()):
+        st.session_state.revenus.insert(0, salaire)
     
     # Ajoute les salaires existants et corrects à la liste des revenus auto
+    parent_prenoms = {p['prenom'] for p in st.session_state.get('parents', []) if p.get('prenom')}
     for r in st.session_state.revenus:
         if r.get('type') == 'Salaire' and r['libelle'].split(' ')[1] in parent_prenoms:
             auto_revenus_list.append(r)
 
 def add_flux_item(category):
     """Ajoute un revenu (non-salaire) ou une dépense."""
+    import streamlit as st
     if category == 'revenus':
         st.session_state.revenus.append({
             'id': str(uuid.uuid4()),
@@ -147,6 +171,7 @@ def add_flux_item(category):
 
 def remove_flux_item(category, item_id):
     """Supprime un item de flux par son ID."""
+    import streamlit as st
     if category == 'revenus':
         st.session_state.revenus = [r for r in st.session_state.revenus if r['id'] != item_id]
     elif category == 'depenses':
@@ -0,0 +1,91 @@
+# --- Instantané du foyer ---
+# Les moteurs de calcul (projection, fiscalité, flux) prennent en argument un `FoyerSnapshot` :
+# une copie figée des listes du session_state (parents, enfants, actifs, passifs, revenus,
+# dépenses). Ils ne dépendent donc pas de Streamlit et peuvent tourner dans un processus de
+# travail, un traitement par lots ou un banc d'essai ; les pages les appellent via de fines
+# fonctions d'adaptation qui construisent l'instantané avec `foyer_depuis_session`.
+
+from core.entity_store import EntityStore, empreinte_entite
+
+CHAMPS_FOYER = ('parents', 'enfants', 'actifs', 'passifs', 'revenus', 'depenses')
+
+class EntiteFigee(dict):
+    """Dictionnaire en lecture seule (une entité du foyer) ; reste sérialisable en JSON et par pickle."""
+
+    __slots__ = ()
+
+    def _lecture_seule(self, *args, **kwargs):
+        raise TypeError("Les entités d'un FoyerSnapshot sont en lecture seule")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __ior__ = _lecture_seule
+
+    def __reduce__(self):
+        return (EntiteFigee, (dict(self),))
+
+def figer(valeur):
+    """Copie figée d'une valeur : dictionnaires en `EntiteFigee`, listes en tuples."""
+    if isinstance(valeur, dict):
+        return EntiteFigee({k: figer(v) for k, v in valeur.items()})
+    if isinstance(valeur, (list, tuple)):
+        return tuple(figer(v) for v in valeur)
+    return valeur
+
+class FoyerSnapshot:
+    """
+    Instantané immuable du foyer. Chaque champ de `CHAMPS_FOYER` est un tuple d'entités figées ;
+    `remplacer` retourne un nouvel instantané. Deux instantanés de même contenu sont égaux et ont
+    le même hash, ce qui permet de mettre en cache un calcul par ses arguments.
+    """
+
+    __slots__ = CHAMPS_FOYER + ('_empreinte', '_entites')
+
+    def __init__(self, parents=(), enfants=(), actifs=(), passifs=(), revenus=(), depenses=()):
+        for champ, entites in zip(CHAMPS_FOYER, (parents, enfants, actifs, passifs, revenus, depenses)):
+            object.__setattr__(self, champ, figer(list(entites or ())))
+        object.__setattr__(self, '_empreinte', None)
+        object.__setattr__(self, '_entites', None)
+
+    def __setattr__(self, nom, valeur):
+        raise AttributeError("FoyerSnapshot est immuable : utiliser remplacer()")
+
+    def __reduce__(self):
+        return (FoyerSnapshot, tuple(getattr(self, champ) for champ in CHAMPS_FOYER))
+
+    def remplacer(self, **champs):
+        """Nouvel instantané dont les champs indiqués sont remplacés."""
+        valeurs = {champ: getattr(self, champ) for champ in CHAMPS_FOYER}
+        valeurs.update(champs)
+        return FoyerSnapshot(**valeurs)
+
+    def empreinte(self):
+        """Empreinte hachable du contenu (calculée une fois)."""
+        if self._empreinte is None:
+            object.__setattr__(self, '_empreinte', tuple(empreinte_entite(getattr(self, champ)) for champ in CHAMPS_FOYER))
+        return self._empreinte
+
+    def __eq__(self, autre):
+        return isinstance(autre, FoyerSnapshot) and self.empreinte() == autre.empreinte()
+
+    def __hash__(self):
+        return hash(self.empreinte())
+
+    def entites(self):
+        """Index des actifs et passifs de l'instantané (voir core/entity_store.py), construit une fois."""
+        if self._entites is None:
+            store = EntityStore()
+            store.synchroniser(self.actifs, self.passifs)
+            object.__setattr__(self, '_entites', store)
+        return self._entites
+
+    def __repr__(self):
+        return 'FoyerSnapshot(' + ', '.join(f"{champ}={len(getattr(self, champ))}" for champ in CHAMPS_FOYER) + ')'
+
+def foyer_depuis_session(**remplacements):
+    """
+    Instantané du foyer construit depuis le session_state Streamlit (listes absentes : vides).
+    Les champs passés en argument remplacent ceux de la session.
+    """
+    import streamlit as st
+    valeurs = {champ: st.session_state.get(champ, []) for champ in CHAMPS_FOYER if champ not in remplacements}
+    valeurs.update(remplacements)
+    return FoyerSnapshot(**valeurs)
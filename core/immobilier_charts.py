@@ -16,18 +16,22 @@ from .patrimoine_logic import (
     calculate_property_tax,
     calculate_net_yield_tax,
     calculate_savings_effort,
-    find_associated_loans,
     calculate_loan_annual_breakdown,
     calculate_lmnp_amortissement_annuel
 )
+from .loan_schedule import get_portfolio
+from .entity_store import get_entity_store
 
 
-def calculate_property_metrics(asset, passifs, tmi, social_tax, year_of_analysis):
-    """Calcule toutes les métriques de performance pour un bien immobilier."""
+def calculate_property_metrics(asset, passifs, tmi, social_tax, year_of_analysis, store=None):
+    """
+    Calcule toutes les métriques de performance pour un bien immobilier.
+    `store` : magasin d'entités déjà synchronisé, à passer quand plusieurs biens sont analysés à la suite.
+    """
     metrics = {}
     
     # 1. Trouver le prêt associé
-    loans = find_associated_loans(asset.get('id'), passifs)
+    loans = (store or get_entity_store(passifs=passifs)).prets_associes(asset.get('id'))
     metrics['loan_found'] = bool(loans)
 
     # 2. Calculer les différentes rentabilités
@@ -181,6 +185,11 @@ def generate_projection_data(asset, loans, tmi_pct, social_tax_pct, projection_d
 
     # --- Initialisation pour la logique d'amortissement LMNP ---
     is_lmnp = asset.get('mode_exploitation') == 'Location Meublée'
+    annees = list(range(start_year, start_year + projection_duration + 1))
+    portefeuille = get_portfolio(loans)
+    prets_annuels = portefeuille.annual(annees)
+    capital_par_annee = portefeuille.total(prets_annuels['capital'])
+    interets_par_annee = portefeuille.total(prets_annuels['interest'])
     stock_amortissement_restant = {'immeuble': 0, 'travaux': 0, 'meubles': 0}
     amortissement_annuel = {'immeuble': 0, 'travaux': 0, 'meubles': 0}
 
@@ -207,9 +216,9 @@ def generate_projection_data(asset, loans, tmi_pct, social_tax_pct, projection_d
         amortissement_annuel['travaux'] = valeur_travaux / DUREE_AMORTISSEMENT_TRAVAUX if DUREE_AMORTISSEMENT_TRAVAUX > 0 else 0
         amortissement_annuel['meubles'] = valeur_meubles / DUREE_AMORTISSEMENT_MEUBLES if DUREE_AMORTISSEMENT_MEUBLES > 0 else 0
 
-    for year in range(start_year, start_year + projection_duration + 1):
+    for i, year in enumerate(annees):
         # --- Calculs communs ---
-        capital_rembourse_annuel = sum(calculate_loan_annual_breakdown(l, year=year).get('capital', 0) for l in loans)
+        capital_rembourse_annuel = float(capital_par_annee[i])
         amortissement_utilise_annee = 0
 
         # --- Logique spécifique à la location meublée (LMNP) ---
@@ -228,7 +237,7 @@ def generate_projection_data(asset, loans, tmi_pct, social_tax_pct, projection_d
             loyers_annuels = asset.get('loyers_mensuels', 0) * 12
             charges_annuelles = asset.get('charges', 0) * 12
             taxe_fonciere = asset.get('taxe_fonciere', 0)
-            interets_emprunt = sum(calculate_loan_annual_breakdown(l, year=year).get('interest', 0) for l in loans)
+            interets_emprunt = float(interets_par_annee[i])
             revenu_avant_amortissement = max(0, loyers_annuels - charges_annuelles - taxe_fonciere - interets_emprunt)
 
             # 3. Déterminer l'amortissement réellement utilisé et la nouvelle réserve
@@ -351,14 +360,14 @@ def create_amortissement_projection_fig(df_projection):
     return fig
 
 
-def create_non_productive_waterfall_fig(asset, passifs, year_of_analysis):
-    """Crée le graphique en cascade pour un bien de jouissance."""
+def create_non_productive_waterfall_fig(asset, passifs, year_of_analysis, store=None):
+    """Crée le graphique en cascade pour un bien de jouissance (`store` : voir calculate_property_metrics)."""
     # 1. Calculer les coûts annuels
     charges_annuelles = asset.get('charges', 0) * 12
     taxe_fonciere = asset.get('taxe_fonciere', 0)
     
     # 2. Trouver les prêts associés
-    loans = find_associated_loans(asset.get('id'), passifs)
+    loans = (store or get_entity_store(passifs=passifs)).prets_associes(asset.get('id'))
     interets_annuels = sum(calculate_loan_annual_breakdown(l, year=year_of_analysis).get('interest', 0) for l in loans)
     capital_rembourse_annuel = sum(calculate_loan_annual_breakdown(l, year=year_of_analysis).get('capital', 0) for l in loans)
 
@@ -0,0 +1,336 @@
+import numpy as np
+from datetime import date
+from functools import lru_cache
+
+# --- Échéancier vectorisé des prêts ---
+# Le tableau d'amortissement complet d'un prêt est calculé une seule fois (tableaux NumPy) puis
+# mis en cache : les CRD, répartitions annuelles et intérêts cumulés se lisent par découpage,
+# au lieu de recalculer les formules fermées pour chaque couple (prêt, année).
+
+def _annuity(capital, monthly_rate, nb_months):
+    """Mensualité constante remboursant `capital` en `nb_months` mois (même formule que `calculate_monthly_payment`)."""
+    if nb_months <= 0:
+        return 0.0
+    if monthly_rate == 0:
+        return capital / nb_months
+    return capital * (monthly_rate * (1 + monthly_rate)**nb_months) / ((1 + monthly_rate)**nb_months - 1)
+
+def compute_amortization(principal, annual_rate, duration_months, insurance_rate=0.0, deferral_months=0, deferral_type='partiel',
+                         rate_steps=None, early_repayments=None, early_repayment_mode='mensualite', monthly_payment=None, horizon_months=None):
+    """
+    Tableau d'amortissement mensuel vectorisé d'un prêt.
+
+    Args:
+        principal: Capital emprunté
+        annual_rate: Taux annuel en décimal (0.035 pour 3,5 %)
+        duration_months: Durée totale du prêt en mois, différé compris
+        insurance_rate: Taux annuel d'assurance en décimal, appliqué au capital initial
+        deferral_months: Nombre de mois de différé en début de prêt
+        deferral_type: 'partiel' (intérêts payés, capital inchangé) ou 'total' (intérêts capitalisés)
+        rate_steps: Paliers de taux [(mois, taux_annuel)] : nouveau taux à partir du mois indiqué (1 = premier mois)
+        early_repayments: Remboursements anticipés [(mois, montant)] versés à la fin du mois indiqué
+        early_repayment_mode: Après un remboursement anticipé, 'mensualite' recalcule la mensualité sur la durée
+            restante, 'duree' la conserve (le prêt se termine plus tôt)
+        monthly_payment: Mensualité hors assurance imposée ; par défaut, annuité constante sur le capital à la
+            fin du différé et la durée restante, recalculée à chaque palier de taux
+        horizon_months: Nombre de mois des tableaux retournés (par défaut la durée du prêt)
+
+    Returns:
+        dict de tableaux NumPy indexés par mois (indice 0 = premier mois) : 'payment' (mensualité hors
+        assurance), 'interest' (intérêts payés), 'capital' (capital amorti, négatif en différé total),
+        'insurance', 'early_repayment', 'crd' (capital restant dû en fin de mois) et 'rate' (taux
+        annuel), ainsi que 'monthly_payment', la mensualité hors assurance après le différé.
+        Chaque segment à taux et mensualité constants est calculé par la formule fermée du CRD.
+    """
+    n = int(duration_months)
+    horizon = n if horizon_months is None else int(horizon_months)
+    taille = max(n, horizon)
+    rates = np.full(taille, float(annual_rate))
+    for mois, taux in sorted(rate_steps or []):
+        rates[max(0, int(mois) - 1):] = taux
+    monthly_rates = rates / 12
+    anticipes = {}
+    for mois, montant in early_repayments or []:
+        if 0 < int(mois) <= n:
+            anticipes[int(mois)] = anticipes.get(int(mois), 0) + montant
+
+    payment = np.zeros(taille)
+    interest = np.zeros(taille)
+    crd = np.zeros(taille)
+    early = np.zeros(taille)
+    actif = np.zeros(taille, dtype=bool)
+
+    # --- Différé : capital constant (partiel) ou intérêts capitalisés (total) ---
+    d = min(max(0, int(deferral_months)), n)
+    capital_courant = principal
+    if d:
+        if deferral_type == 'total':
+            crd[:d] = principal * np.cumprod(1 + monthly_rates[:d])
+        else:
+            crd[:d] = principal
+            interest[:d] = principal * monthly_rates[:d]
+            payment[:d] = interest[:d]
+        actif[:d] = True
+        capital_courant = crd[d - 1]
+
+    # --- Amortissement : segments entre changements de taux et remboursements anticipés ---
+    bornes = {d, n}
+    bornes.update((d + 1 + np.flatnonzero(monthly_rates[d + 1:n] != monthly_rates[d:n - 1])).tolist())
+    bornes.update(m for m in anticipes if d <= m < n)
+    bornes = sorted(b for b in bornes if d <= b <= n)
+    mensualite = monthly_payment if monthly_payment is not None else _annuity(capital_courant, monthly_rates[d] if d < n else 0, n - d)
+    mensualite_initiale = mensualite
+    fin_pret = n
+    for debut, fin in zip(bornes[:-1], bornes[1:]):
+        if capital_courant <= 0:
+            fin_pret = debut
+            break
+        r = monthly_rates[debut]
+        if debut > d and monthly_payment is None and (r != monthly_rates[debut - 1] or (debut in anticipes and early_repayment_mode == 'mensualite')):
+            mensualite = _annuity(capital_courant, r, n - debut)
+        j = np.arange(1, fin - debut + 1)
+        if r == 0:
+            soldes = capital_courant - j * mensualite
+        else:
+            croissance = (1 + r) ** j
+            soldes = capital_courant * croissance - mensualite * (croissance - 1) / r
+        rembourse = np.flatnonzero(soldes <= 0)
+        if rembourse.size:
+            fin = debut + rembourse[0] + 1
+            soldes = np.maximum(0, soldes[:rembourse[0] + 1])
+        precedents = np.concatenate([[capital_courant], soldes[:-1]])
+        interest[debut:fin] = precedents * r
+        payment[debut:fin] = mensualite
+        crd[debut:fin] = soldes
+        actif[debut:fin] = True
+        capital_courant = soldes[-1]
+        if fin in anticipes:
+            montant = min(anticipes[fin], capital_courant)
+            early[fin - 1] = montant
+            capital_courant -= montant
+            crd[fin - 1] = capital_courant
+        if rembourse.size:
+            fin_pret = fin
+            break
+
+    # Après la fin du prêt, le CRD reste à sa dernière valeur (nul si le prêt est soldé)
+    if fin_pret < taille:
+        crd[fin_pret:] = crd[fin_pret - 1] if fin_pret > 0 else principal
+    insurance = np.where(actif, principal * insurance_rate / 12, 0.0)
+    precedents = np.concatenate([[principal], crd[:-1]])
+    capital = precedents - crd - early
+
+    return {
+        'payment': payment[:horizon],
+        'interest': interest[:horizon],
+        'capital': capital[:horizon],
+        'insurance': insurance[:horizon],
+        'early_repayment': early[:horizon],
+        'crd': crd[:horizon],
+        'rate': rates[:horizon],
+        'monthly_payment': mensualite_initiale,
+    }
+
+def _months_passed(start_date, on_date):
+    """Mois pleins écoulés entre le début du prêt et une date (0 si le prêt n'a pas commencé)."""
+    if start_date > on_date:
+        return 0
+    return (on_date.year - start_date.year) * 12 + (on_date.month - start_date.month)
+
+class LoanSchedule:
+    """
+    Échéancier mois par mois d'un prêt à mensualités constantes.
+
+    Les tableaux sont indexés par le nombre de mensualités payées : `crd[k]` est le capital restant
+    dû après k mensualités (calculé par `compute_amortization`), `payment`, `interest` et `capital`
+    détaillent la k-ième mensualité (k = 1..n, indice k - 1).
+    """
+
+    __slots__ = ('principal', 'annual_rate_pct', 'duration_months', 'start_date', 'monthly_payment',
+                 'crd', 'payment', 'interest', 'capital', 'cumulative_interest')
+
+    def __init__(self, principal, annual_rate_pct, duration_months, start_date):
+        self.principal = principal
+        self.annual_rate_pct = annual_rate_pct
+        self.duration_months = int(duration_months)
+        self.start_date = start_date
+
+        tableau = compute_amortization(principal, annual_rate_pct / 100, self.duration_months)
+        self.monthly_payment = tableau['monthly_payment']
+        crd = np.concatenate([[principal], tableau['crd']])
+        crd[self.duration_months] = 0.0
+        self.crd = crd
+        self.payment = tableau['payment']
+        self.capital = tableau['capital']
+        self.interest = tableau['interest']
+        self.cumulative_interest = np.concatenate([[0.0], np.cumsum(self.interest)])
+
+    def payments_made(self, on_date):
+        """Nombre de mensualités payées à une date (bornée par la durée du prêt)."""
+        return min(_months_passed(self.start_date, on_date), self.duration_months)
+
+    def crd_at(self, on_date=None):
+        """Capital restant dû à une date (mêmes conventions que `calculate_crd`)."""
+        if on_date is None:
+            on_date = date.today()
+        if self.start_date > on_date:
+            return self.principal
+        months_passed = _months_passed(self.start_date, on_date)
+        if months_passed >= self.duration_months:
+            return 0.0
+        return float(self.crd[months_passed])
+
+    def annual_breakdown(self, year=None):
+        """Capital, intérêts et total payé sur une année civile (voir `calculate_loan_annual_breakdown`)."""
+        if year is None:
+            year = date.today().year
+        debut, fin = date(year - 1, 12, 31), date(year, 12, 31)
+        capital_rembourse = self.crd_at(debut) - self.crd_at(fin)
+        total_paye_annee = (self.payments_made(fin) - self.payments_made(debut)) * self.monthly_payment
+        interets_payes = total_paye_annee - capital_rembourse
+        return {'capital': max(0, capital_rembourse), 'interest': max(0, interets_payes), 'total_paid': max(0, total_paye_annee)}
+
+    def annual_breakdowns(self, years):
+        """Répartitions annuelles de plusieurs années, en tableaux NumPy ('capital', 'interest', 'total_paid')."""
+        lignes = [self.annual_breakdown(y) for y in years]
+        return {cle: np.array([l[cle] for l in lignes]) for cle in ('capital', 'interest', 'total_paid')}
+
+    def cumulative_interest_at(self, on_date=None):
+        """Intérêts cumulés payés jusqu'à une date."""
+        if on_date is None:
+            on_date = date.today()
+        return float(self.cumulative_interest[self.payments_made(on_date)])
+
+@lru_cache(maxsize=1024)
+def _cached_schedule(principal, annual_rate_pct, duration_months, start_date):
+    return LoanSchedule(principal, annual_rate_pct, duration_months, start_date)
+
+def is_valid_loan(principal, annual_rate_pct, duration_months, start_date):
+    """Prêt exploitable par l'échéancier (mêmes conditions que les fonctions de `patrimoine_logic`)."""
+    return bool(principal and principal > 0 and annual_rate_pct is not None and duration_months and duration_months > 0 and start_date)
+
+def get_schedule(principal, annual_rate_pct, duration_months, start_date):
+    """Échéancier mis en cache, indexé par les caractéristiques du prêt (None si le prêt est incomplet)."""
+    if not is_valid_loan(principal, annual_rate_pct, duration_months, start_date):
+        return None
+    return _cached_schedule(principal, annual_rate_pct, int(duration_months), start_date)
+
+def get_loan_schedule(loan):
+    """Échéancier d'un passif (dictionnaire de `st.session_state.passifs`), ou None."""
+    if not loan:
+        return None
+    return get_schedule(loan.get('montant_initial', 0), loan.get('taux_annuel'), loan.get('duree_mois', 0), loan.get('date_debut'))
+
+# --- Portefeuille de prêts (matrice prêts × mois) ---
+# Tous les passifs du foyer sont empilés sur un calendrier mensuel commun : les totaux mensuels et
+# annuels (mensualités, intérêts, CRD) par prêt ou par actif associé sont des réductions NumPy.
+
+_ABSENT = object()
+_CHAMPS_PRET = ('id', 'actif_associe_id', 'libelle', 'montant_initial', 'taux_annuel', 'duree_mois', 'date_debut')
+
+def _mois(d):
+    """Indice de mois calendaire d'une date (année * 12 + mois - 1)."""
+    return d.year * 12 + d.month - 1
+
+class LoanPortfolio:
+    """
+    Échéanciers de tous les passifs sur un calendrier mensuel commun.
+
+    Les matrices ont une ligne par passif (ordre de la liste fournie) et une colonne par mois
+    (`mois`, indices de `_mois`) : `crd` est le capital restant dû en fin de mois (mêmes
+    conventions que `calculate_crd`, y compris pour les prêts incomplets), `nb_paiements` le nombre
+    cumulé de mensualités payées, `payment`, `capital` et `interest` le détail de chaque mois.
+    Avant le calendrier aucun prêt n'a commencé, après ils sont tous remboursés.
+    """
+
+    __slots__ = ('loans', 'ids', 'actifs', 'mensualites', 'mois', 'crd', 'nb_paiements', 'payment', 'capital', 'interest', '_echeances')
+
+    def __init__(self, passifs):
+        from core.patrimoine_logic import calculate_monthly_payment
+        self.loans = list(passifs)
+        self.ids = [p.get('id') for p in self.loans]
+        self.actifs = [p.get('actif_associe_id') for p in self.loans]
+        # Mensualité contractuelle, même pour un prêt sans date de début (voir calculate_current_debt_service)
+        self.mensualites = np.array([
+            calculate_monthly_payment(p.get('montant_initial', 0), p.get('taux_annuel', 0), p.get('duree_mois', 0)) for p in self.loans
+        ], dtype=float)
+
+        schedules = [get_loan_schedule(p) for p in self.loans]
+        valides = [s for s in schedules if s is not None]
+        if valides:
+            debut = min(_mois(s.start_date) for s in valides) - 1
+            fin = max(_mois(s.start_date) + s.duration_months for s in valides)
+        else:
+            debut = fin = _mois(date.today())
+        self.mois = np.arange(debut, fin + 1)
+
+        nb_prets, nb_mois = len(self.loans), len(self.mois)
+        self.crd = np.zeros((nb_prets, nb_mois))
+        self.nb_paiements = np.zeros((nb_prets, nb_mois), dtype=int)
+        self._echeances = np.zeros(nb_prets)
+        for i, (passif, schedule) in enumerate(zip(self.loans, schedules)):
+            if schedule is None:
+                self.crd[i] = passif.get('montant_initial', 0)
+                continue
+            k = self.mois - _mois(schedule.start_date)
+            self.nb_paiements[i] = np.clip(k, 0, schedule.duration_months)
+            self.crd[i] = np.where(k < 0, schedule.principal, schedule.crd[self.nb_paiements[i]])
+            self._echeances[i] = schedule.monthly_payment
+
+        self.payment = np.diff(self.nb_paiements, axis=1, prepend=0) * self._echeances[:, None]
+        self.capital = -np.diff(self.crd, axis=1, prepend=self.crd[:, :1])
+        self.interest = self.payment - self.capital
+
+    def _colonnes(self, indices_mois):
+        """Colonnes du calendrier (bornées aux extrémités) pour des indices de mois."""
+        return np.clip(np.asarray(indices_mois) - self.mois[0], 0, len(self.mois) - 1)
+
+    def crd_at(self, on_date=None):
+        """CRD de chaque prêt à une date."""
+        if on_date is None:
+            on_date = date.today()
+        return self.crd[:, self._colonnes(_mois(on_date))]
+
+    def crd_fin_annee(self, years):
+        """CRD de chaque prêt au 31 décembre des années demandées (prêts × années)."""
+        return self.crd[:, self._colonnes(np.asarray(years) * 12 + 11)]
+
+    def annual(self, years):
+        """
+        Capital, intérêts et total payé de chaque prêt sur les années civiles demandées
+        (prêts × années), identiques à `calculate_loan_annual_breakdown`.
+        """
+        fin = self._colonnes(np.asarray(years) * 12 + 11)
+        debut = self._colonnes((np.asarray(years) - 1) * 12 + 11)
+        capital = self.crd[:, debut] - self.crd[:, fin]
+        total_paye = (self.nb_paiements[:, fin] - self.nb_paiements[:, debut]) * self._echeances[:, None]
+        interets = total_paye - capital
+        return {'capital': np.maximum(0, capital), 'interest': np.maximum(0, interets), 'total_paid': np.maximum(0, total_paye)}
+
+    def total(self, tableau):
+        """Somme sur tous les prêts (une valeur par colonne)."""
+        return tableau.sum(axis=0)
+
+    def par_pret(self, tableau):
+        """Lignes d'un tableau indexées par identifiant de prêt."""
+        return dict(zip(self.ids, tableau))
+
+    def par_actif(self, tableau):
+        """Somme des lignes d'un tableau par actif associé (les prêts sans actif sont ignorés)."""
+        groupes = {}
+        for i, actif_id in enumerate(self.actifs):
+            if actif_id:
+                groupes.setdefault(actif_id, []).append(i)
+        return {actif_id: tableau[lignes].sum(axis=0) for actif_id, lignes in groupes.items()}
+
+@lru_cache(maxsize=64)
+def _cached_portfolio(cle):
+    return LoanPortfolio([{champ: v for champ, v in zip(_CHAMPS_PRET, caracteristiques) if v is not _ABSENT} for caracteristiques in cle])
+
+def get_portfolio(passifs):
+    """Portefeuille mis en cache, indexé par les caractéristiques de chaque passif."""
+    cle = tuple(tuple(p.get(champ, _ABSENT) for champ in _CHAMPS_PRET) for p in passifs)
+    try:
+        return _cached_portfolio(cle)
+    except TypeError:  # caractéristique non hachable : pas de cache
+        return LoanPortfolio(passifs)
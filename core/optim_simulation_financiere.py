@@ -6,13 +6,17 @@ Fonctions disponibles :
 - calculer_simulation_mensuelle : Simulation complète des investissements
 - calculer_effort_epargne_mensuel : Calcul de l'effort d'épargne
 - simulation_resume : Version résumée de la simulation
+- simulation_scalaires : Indicateurs de la simulation sans DataFrame (utilisé par l'optimiseur)
+- simulation_scalaires_et_gradients : Indicateurs et leurs dérivées par rapport aux 7 variables
 - maximiser_solde_final_avec_contrainte : Fonction d'optimisation
 - Fonctions utilitaires diverses
 """
 
 import pandas as pd
 import numpy as np
+from functools import lru_cache
 from scipy.optimize import minimize
+from core.loan_schedule import compute_amortization
 
 
 # ===== FONCTIONS DE CONVERSION =====
@@ -43,7 +47,8 @@ def calculer_simulation_mensuelle(
 ):
     """
     Calcule la simulation d'investissement sur assurance-vie, PER et SCPI
-    Renvoie les valeurs mensuelles (non cumulées) pour chaque mois.
+    Renvoie les valeurs mensuelles (non cumulées) pour chaque mois, en tableaux NumPy calculés
+    sur tous les mois à la fois (formes fermées, sans boucle mensuelle).
     Ajoute en sortie l'économie d'impôts du PER.
     Ajoute en sortie la fiscalité payée sur le mois (impots - réduction).
     Ajoute en sortie les soldes des supports (AV, PER, SCPI).
@@ -51,140 +56,130 @@ def calculer_simulation_mensuelle(
     scpi_europeenne_ratio : proportion du capital SCPI investi en SCPI européennes (sans prélèvements sociaux)
     """
     duree_mois = int(duree_annees * 12)
-    mensualite_credit_scpi = 0
     capital_scpi_total_initial = capital_scpi
-
     if credit_scpi_montant > 0 and credit_scpi_duree > 0:
-        taux_mensuel_credit = (credit_scpi_taux + credit_scpi_assurance) / 12
-        nb_mois_credit = convertir_annees_vers_mois(credit_scpi_duree)
-        if taux_mensuel_credit > 0:
-            mensualite_credit_scpi = credit_scpi_montant * (taux_mensuel_credit * (1 + taux_mensuel_credit)**nb_mois_credit) / ((1 + taux_mensuel_credit)**nb_mois_credit - 1)
-        else:
-            mensualite_credit_scpi = credit_scpi_montant / nb_mois_credit
         capital_scpi_total_initial = capital_scpi + credit_scpi_montant
 
-    solde_av = capital_av * (1 - frais_entree_av)
-    solde_per = capital_per * (1 - frais_entree_per)
-    solde_scpi = capital_scpi_total_initial * (1 - frais_entree_scpi)
-
-    capital_restant_credit_scpi = credit_scpi_montant
-    mois_restants_credit = convertir_annees_vers_mois(credit_scpi_duree) if credit_scpi_duree > 0 else 0
-
     taux_mensuel_av = (1 + taux_av) ** (1/12) - 1
     taux_mensuel_per = (1 + taux_per) ** (1/12) - 1
     taux_mensuel_distribution_scpi = (1 + taux_distribution_scpi) ** (1/12) - 1
     taux_mensuel_appreciation_scpi = (1 + taux_appreciation_scpi) ** (1/12) - 1
 
-    mois = []
-    versement_av_mensuel = []
-    versement_per_mensuel = []
-    versement_scpi_mensuel = []
-    economie_impot_per_mensuelle = []
-    interets_credit_scpi_mensuel = []
-    mensualite_credit_scpi_mensuel = []
-    revenu_scpi_brut_mensuel = []
-    impot_scpi_mensuel = []
-    fiscalite_payee_mensuelle = []
-    solde_av_mensuel = []
-    solde_per_mensuel = []
-    solde_scpi_mensuel = []
-    crd_pret_scpi_mensuel = []  # Ajout du CRD du prêt
-
-    versements_per_annee_courante = capital_per
-    annee_courante = 0
-
-    # Nouveau : capital brut SCPI pour calcul des revenus (sans enlever les frais d'entrée)
-    capital_scpi_brut = capital_scpi_total_initial
-
-    for mois_i in range(duree_mois):
-        interets_credit_scpi_mois = 0
-        mensualite_credit_mois = 0
-
-        if mois_restants_credit > 0 and capital_restant_credit_scpi > 0:
-            taux_mensuel_credit_seul = credit_scpi_taux / 12
-            interets_credit_scpi_mois = capital_restant_credit_scpi * taux_mensuel_credit_seul
-            capital_rembourse_mois = mensualite_credit_scpi - interets_credit_scpi_mois - (credit_scpi_montant * credit_scpi_assurance / 12)
-            capital_restant_credit_scpi = max(0, capital_restant_credit_scpi - capital_rembourse_mois)
-            mois_restants_credit -= 1
-            mensualite_credit_mois = mensualite_credit_scpi
-
-        revenus_scpi_bruts_mensuels = 0
-        impot_scpi_mois = 0
-        # Utiliser le capital brut pour le calcul des revenus (sans enlever les frais d'entrée)
-        if capital_scpi_brut > 0:
-            revenus_scpi_bruts_mensuels = capital_scpi_brut * taux_mensuel_distribution_scpi
-            base_imposable_scpi = max(0, revenus_scpi_bruts_mensuels - interets_credit_scpi_mois)
-            # Calcul du taux d'imposition SCPI en tenant compte du ratio européen
-            taux_imposition_scpi = tmi + (1 - scpi_europeenne_ratio) * 0.172
-            impot_scpi_mois = base_imposable_scpi * taux_imposition_scpi
-
-        economie_impot_per_mois = 0
-        nouvelle_annee = (mois_i > 0 and mois_i % 12 == 0)
-        if nouvelle_annee:
-            annee_courante += 1
-            versements_per_annee_courante = 0
-
-        versement_av_net = 0
-        versement_scpi_net = 0
-        versement_per_net = 0
-
-        if mois_i < duree_mois:
-            if versement_av > 0:
-                versement_av_net = versement_av * (1 - frais_entree_av)
-                solde_av += versement_av_net
-            if versement_scpi > 0:
-                versement_scpi_net = versement_scpi# * (1 - frais_entree_scpi) on ne paye les frais d'entrée des SCPI qu'à la revente
-                solde_scpi += versement_scpi_net
-                # Ajouter le versement brut au capital brut SCPI (sans enlever les frais d'entrée)
-                capital_scpi_brut += versement_scpi
-            if versement_per > 0:
-                versement_per_net = versement_per * (1 - frais_entree_per)
-                solde_per += versement_per_net
-                versements_per_annee_courante += versement_per
-                versement_deductible = min(versement_per, max(0, plafond_per_annuel - (versements_per_annee_courante - versement_per)))
-                economie_impot_per_mois = versement_deductible * tmi
-
-            solde_av *= (1 + taux_mensuel_av)
-            solde_per *= (1 + taux_mensuel_per)
-            solde_scpi *= (1 + taux_mensuel_appreciation_scpi)
-            # Appréciation du capital brut SCPI (sans enlever les frais d'entrée)
-            #capital_scpi_brut *= (1 + taux_mensuel_appreciation_scpi)
-
-        fiscalite_payee = impot_scpi_mois - economie_impot_per_mois
-
-        mois.append(mois_i + 1)  # Mois de 1 à 180 au lieu de 0 à 179
-        versement_av_mensuel.append(versement_av)
-        versement_per_mensuel.append(versement_per)
-        versement_scpi_mensuel.append(versement_scpi)
-        economie_impot_per_mensuelle.append(economie_impot_per_mois)
-        interets_credit_scpi_mensuel.append(interets_credit_scpi_mois)
-        mensualite_credit_scpi_mensuel.append(mensualite_credit_mois)
-        revenu_scpi_brut_mensuel.append(revenus_scpi_bruts_mensuels)
-        impot_scpi_mensuel.append(impot_scpi_mois)
-        fiscalite_payee_mensuelle.append(fiscalite_payee)
-        solde_av_mensuel.append(solde_av)
-        solde_per_mensuel.append(solde_per)
-        solde_scpi_mensuel.append(solde_scpi)
-        crd_pret_scpi_mensuel.append(capital_restant_credit_scpi)  # Ajout du CRD à chaque mois
+    # Séries calculées sur tous les mois à la fois (indices 0 à duree_mois - 1)
+    k, mois_dans_annee, premiere_annee, zeros = _calendrier(duree_mois)
+    versement_av_net = versement_av * (1 - frais_entree_av) if versement_av > 0 else 0
+    versement_per_net = versement_per * (1 - frais_entree_per) if versement_per > 0 else 0
+    # On ne paye les frais d'entrée des SCPI qu'à la revente
+    versement_scpi_net = versement_scpi if versement_scpi > 0 else 0
+
+    # Soldes AV, PER et SCPI : versement en début de mois puis revalorisation, s_k = s_0 g_k + v c_k
+    croissance, cumul_versements = _facteurs_croissance((taux_mensuel_av, taux_mensuel_per, taux_mensuel_appreciation_scpi), duree_mois)
+    soldes_initiaux = np.array([capital_av * (1 - frais_entree_av), capital_per * (1 - frais_entree_per), capital_scpi_total_initial * (1 - frais_entree_scpi)])
+    versements_nets = np.array([versement_av_net, versement_per_net, versement_scpi_net])
+    solde_av_mensuel, solde_per_mensuel, solde_scpi_mensuel = soldes_initiaux[:, None] * croissance + versements_nets[:, None] * cumul_versements
+
+    # Crédit SCPI : échéancier proportionnel au montant emprunté (CRD constant sans crédit)
+    if credit_scpi_montant > 0 and credit_scpi_duree > 0:
+        interets_unitaires, mensualites_unitaires, crd_unitaire = _echeancier_credit_unitaire(
+            credit_scpi_taux, credit_scpi_assurance, convertir_annees_vers_mois(credit_scpi_duree), duree_mois
+        )
+        interets_credit_scpi_mensuel = credit_scpi_montant * interets_unitaires
+        mensualite_credit_scpi_mensuel = credit_scpi_montant * mensualites_unitaires
+        crd_pret_scpi_mensuel = credit_scpi_montant * crd_unitaire
+    else:
+        interets_credit_scpi_mensuel = zeros.copy()
+        mensualite_credit_scpi_mensuel = zeros.copy()
+        crd_pret_scpi_mensuel = zeros + credit_scpi_montant
+
+    # Revenus SCPI sur le capital brut (sans enlever les frais d'entrée) avant le versement du mois
+    # (croissant : les versements SCPI retenus sont positifs ou nuls)
+    capital_scpi_brut = capital_scpi_total_initial + versement_scpi_net * k
+    revenu_scpi_brut_mensuel = capital_scpi_brut * taux_mensuel_distribution_scpi
+    # Calcul du taux d'imposition SCPI en tenant compte du ratio européen
+    taux_imposition_scpi = tmi + (1 - scpi_europeenne_ratio) * 0.172
+    impot_scpi_mensuel = np.maximum(0, revenu_scpi_brut_mensuel - interets_credit_scpi_mensuel) * taux_imposition_scpi
+    if capital_scpi_total_initial <= 0:
+        # Pas de revenus tant que le capital brut n'est pas positif
+        non_investi = capital_scpi_brut <= 0
+        revenu_scpi_brut_mensuel[non_investi] = 0.0
+        impot_scpi_mensuel[non_investi] = 0.0
+
+    # Économie d'impôt PER : versements déductibles dans la limite du plafond annuel
+    # (le capital initial compte dans les versements de la première année)
+    if versement_per > 0:
+        versements_per_anterieurs = capital_per * premiere_annee + versement_per * mois_dans_annee
+        economie_impot_per_mensuelle = np.minimum(versement_per, np.maximum(0, plafond_per_annuel - versements_per_anterieurs)) * tmi
+    else:
+        economie_impot_per_mensuelle = zeros.copy()
 
     return {
-        'mois': mois,
-        'versement_av_mensuel': versement_av_mensuel,
-        'versement_per_mensuel': versement_per_mensuel,
-        'versement_scpi_mensuel': versement_scpi_mensuel,
+        'mois': k + 1,  # Mois de 1 à 180 au lieu de 0 à 179
+        'versement_av_mensuel': zeros + versement_av,
+        'versement_per_mensuel': zeros + versement_per,
+        'versement_scpi_mensuel': zeros + versement_scpi,
         'economie_impot_per_mensuelle': economie_impot_per_mensuelle,
         'interets_credit_scpi_mensuel': interets_credit_scpi_mensuel,
         'mensualite_credit_scpi_mensuel': mensualite_credit_scpi_mensuel,
         'revenu_scpi_brut_mensuel': revenu_scpi_brut_mensuel,
         'impot_scpi_mensuel': impot_scpi_mensuel,
-        'fiscalite_payee_mensuelle': fiscalite_payee_mensuelle,
+        'fiscalite_payee_mensuelle': impot_scpi_mensuel - economie_impot_per_mensuelle,
         'solde_av_mensuel': solde_av_mensuel,
         'solde_per_mensuel': solde_per_mensuel,
         'solde_scpi_mensuel': solde_scpi_mensuel,
-        'crd_pret_scpi_mensuel': crd_pret_scpi_mensuel  # Ajout en sortie
+        'crd_pret_scpi_mensuel': crd_pret_scpi_mensuel
     }
 
 
+# ===== NOYAU VECTORISÉ DE LA SIMULATION =====
+# Les facteurs qui ne dépendent que des taux et de la durée (fixés pendant une optimisation) sont
+# mis en cache : chaque simulation se réduit alors à quelques opérations sur des tableaux.
+
+def _lecture_seule(*tableaux):
+    for tableau in tableaux:
+        tableau.flags.writeable = False
+    return tableaux
+
+
+@lru_cache(maxsize=64)
+def _calendrier(duree_mois):
+    """Indices des mois, rang du mois dans l'année (0 à 11), indicatrice de la première année et zéros."""
+    k = np.arange(duree_mois)
+    return _lecture_seule(k, (k % 12).astype(float), (k < 12).astype(float), np.zeros(duree_mois))
+
+
+@lru_cache(maxsize=256)
+def _facteurs_croissance(taux_mensuels, duree_mois):
+    """
+    Facteurs (g_k, c_k) de chaque taux r tels que s_k = s_0 g_k + v c_k pour un support alimenté de v
+    en début de mois puis revalorisé : g_k = (1 + r)^k et c_k = (1 + r) ((1 + r)^k - 1) / r (k si r = 0).
+    """
+    r = np.array(taux_mensuels)[:, None]
+    mois = np.arange(1, duree_mois + 1)
+    log_croissance = np.log1p(r) * mois
+    taux_nul = r == 0
+    cumul = np.where(taux_nul, mois, (1 + r) * np.expm1(log_croissance) / np.where(taux_nul, 1, r))
+    return _lecture_seule(np.exp(log_croissance), cumul)
+
+
+@lru_cache(maxsize=256)
+def _echeancier_credit_unitaire(credit_scpi_taux, credit_scpi_assurance, nb_mois_credit, duree_mois):
+    """
+    Intérêts, mensualités (assurance comprise) et CRD mensuels du crédit SCPI pour 1 € emprunté.
+    Mensualité calculée au taux assurance comprise ; l'assurance (sur le capital initial) en est
+    déduite pour obtenir la part qui rembourse intérêts et capital.
+    """
+    taux_mensuel_credit = (credit_scpi_taux + credit_scpi_assurance) / 12
+    if taux_mensuel_credit > 0:
+        mensualite_credit_scpi = (taux_mensuel_credit * (1 + taux_mensuel_credit)**nb_mois_credit) / ((1 + taux_mensuel_credit)**nb_mois_credit - 1)
+    else:
+        mensualite_credit_scpi = 1 / nb_mois_credit
+    echeancier = compute_amortization(
+        1.0, credit_scpi_taux, nb_mois_credit, insurance_rate=credit_scpi_assurance,
+        monthly_payment=mensualite_credit_scpi - credit_scpi_assurance / 12, horizon_months=duree_mois
+    )
+    return _lecture_seule(echeancier['interest'], echeancier['payment'] + echeancier['insurance'], echeancier['crd'])
+
+
 # ===== FONCTIONS D'ANALYSE =====
 
 def calculer_effort_epargne_mensuel(df):
@@ -243,14 +238,10 @@ def simulation_resume(
 
     params : dict contenant les autres paramètres nécessaires
     """
-    res = calculer_simulation_mensuelle(
+    res = _simuler_avec_params(
         capital_av, capital_per, capital_scpi,
         versement_av, versement_per, versement_scpi,
-        params['taux_av'], params['taux_per'], params['taux_distribution_scpi'], params['taux_appreciation_scpi'],
-        params['frais_entree_av'], params['frais_entree_per'], params['frais_entree_scpi'],
-        params['tmi'], params['plafond_per_annuel'], params['duree_annees'],
-        credit_scpi_montant, params['credit_scpi_duree'], params['credit_scpi_taux'], params['credit_scpi_assurance'],
-        params.get('scpi_europeenne_ratio', 0.0)
+        credit_scpi_montant, params
     )
     df_res = pd.DataFrame.from_dict(res)
     df_somme = somme_colonnes_solde_par_mois(df_res)
@@ -264,22 +255,392 @@ def simulation_resume(
     return solde_final_net, max_effort, df_res, effort_epargne_mensuel
 
 
+def simulation_scalaires(
+    capital_av, capital_per, capital_scpi,
+    versement_av, versement_per, versement_scpi,
+    credit_scpi_montant,
+    params
+):
+    """
+    Même simulation que `simulation_resume`, réduite directement sur les tableaux NumPy (sans
+    construire de DataFrame) : appelée à chaque évaluation de l'optimiseur.
+    Retourne (solde total net du CRD au dernier mois, effort d'épargne mensuel maximal,
+    mensualité maximale du crédit SCPI) sous forme de flottants.
+    """
+    res = _simuler_avec_params(
+        capital_av, capital_per, capital_scpi,
+        versement_av, versement_per, versement_scpi,
+        credit_scpi_montant, params
+    )
+    solde_final_net, effort = _solde_final_et_effort(res)
+    return float(solde_final_net), float(effort.max()), float(res['mensualite_credit_scpi_mensuel'].max())
+
+
+def simulation_scalaires_et_gradients(
+    capital_av, capital_per, capital_scpi,
+    versement_av, versement_per, versement_scpi,
+    credit_scpi_montant,
+    params
+):
+    """
+    Comme `simulation_scalaires`, avec les dérivées exactes des trois indicateurs par rapport aux
+    7 variables [capital_av, capital_per, capital_scpi, versement_av, versement_per, versement_scpi,
+    credit_scpi_montant] (jacobiens fournis à SLSQP).
+    L'effort maximal est dérivé au mois où il est atteint. Aux points anguleux (versement ou crédit
+    nul, base imposable SCPI nulle, plafond PER), la dérivée retenue est la dérivée à droite.
+
+    Returns:
+        tuple: ((solde final net, effort maximal, mensualité maximale), tableau 3 x 7 des dérivées)
+    """
+    res = _simuler_avec_params(
+        capital_av, capital_per, capital_scpi,
+        versement_av, versement_per, versement_scpi,
+        credit_scpi_montant, params
+    )
+    solde_final_net, effort = _solde_final_et_effort(res)
+    mois_pic = int(effort.argmax())
+    duree_mois = len(effort)
+    _, mois_dans_annee, premiere_annee, _ = _calendrier(duree_mois)
+    croissance, cumul_versements = _facteurs_croissance(_taux_mensuels_supports(params), duree_mois)
+    taux_distribution = (1 + params['taux_distribution_scpi']) ** (1/12) - 1
+    frais_av, frais_per, frais_scpi = params['frais_entree_av'], params['frais_entree_per'], params['frais_entree_scpi']
+    avec_credit = params['credit_scpi_duree'] > 0
+    if avec_credit:
+        interets_unitaires, mensualites_unitaires, crd_unitaire = _echeancier_credit_unitaire(
+            params['credit_scpi_taux'], params['credit_scpi_assurance'],
+            convertir_annees_vers_mois(params['credit_scpi_duree']), duree_mois
+        )
+    gradients = np.zeros((3, 7))
+
+    # Solde final net : s_N = s_0 g_N + v c_N pour chaque support, moins le CRD
+    gradients[0] = [
+        (1 - frais_av) * croissance[0, -1],
+        (1 - frais_per) * croissance[1, -1],
+        (1 - frais_scpi) * croissance[2, -1],
+        (1 - frais_av) * cumul_versements[0, -1] if versement_av >= 0 else 0.0,
+        (1 - frais_per) * cumul_versements[1, -1] if versement_per >= 0 else 0.0,
+        cumul_versements[2, -1] if versement_scpi >= 0 else 0.0,
+        (1 - frais_scpi) * croissance[2, -1] - crd_unitaire[-1] if avec_credit else -1.0,
+    ]
+
+    # Effort maximal : versements + impôt SCPI + mensualité - économie PER - revenus SCPI au mois du pic
+    derivee_revenu = taux_distribution * np.array([0, 0, 1.0, 0, 0, mois_pic if versement_scpi >= 0 else 0, 1.0 if avec_credit else 0])
+    derivee_effort = np.array([0, 0, 0, 1.0, 1.0, 1.0, 0]) - derivee_revenu
+    if avec_credit:
+        derivee_effort[6] += mensualites_unitaires[mois_pic]
+    if res['revenu_scpi_brut_mensuel'][mois_pic] - res['interets_credit_scpi_mensuel'][mois_pic] > 0:
+        taux_imposition_scpi = params['tmi'] + (1 - params.get('scpi_europeenne_ratio', 0.0)) * 0.172
+        derivee_impot = derivee_revenu.copy()
+        if avec_credit:
+            derivee_impot[6] -= interets_unitaires[mois_pic]
+        derivee_effort += taux_imposition_scpi * derivee_impot
+    if versement_per >= 0:
+        # Économie PER = tmi * min(v, max(0, plafond - versements antérieurs de l'année))
+        reste_plafond = params['plafond_per_annuel'] - (capital_per * premiere_annee[mois_pic] + versement_per * mois_dans_annee[mois_pic])
+        if versement_per <= max(0.0, reste_plafond):
+            derivee_effort[4] -= params['tmi']
+        elif reste_plafond > 0:
+            derivee_effort[1] += params['tmi'] * premiere_annee[mois_pic]
+            derivee_effort[4] += params['tmi'] * mois_dans_annee[mois_pic]
+    gradients[1] = derivee_effort
+
+    # Mensualité maximale du crédit SCPI : proportionnelle au montant emprunté
+    if avec_credit:
+        gradients[2, 6] = mensualites_unitaires.max()
+
+    valeurs = (float(solde_final_net), float(effort[mois_pic]), float(res['mensualite_credit_scpi_mensuel'].max()))
+    return valeurs, gradients
+
+
+def _solde_final_et_effort(res):
+    """Solde total net du CRD au dernier mois et effort d'épargne de chaque mois (tableau)."""
+    solde_final_net = (
+        res['solde_av_mensuel'][-1] + res['solde_per_mensuel'][-1] + res['solde_scpi_mensuel'][-1]
+        - res['crd_pret_scpi_mensuel'][-1]
+    )
+    effort = (
+        res['versement_per_mensuel']
+        + res['versement_av_mensuel']
+        + res['versement_scpi_mensuel']
+        - res['economie_impot_per_mensuelle']
+        + res['impot_scpi_mensuel']
+        + res['mensualite_credit_scpi_mensuel']
+        - res['revenu_scpi_brut_mensuel']
+    )
+    return solde_final_net, effort
+
+
+def _taux_mensuels_supports(params):
+    """Taux mensuels équivalents de l'AV, du PER et de la revalorisation des parts de SCPI."""
+    return tuple((1 + params[cle]) ** (1/12) - 1 for cle in ('taux_av', 'taux_per', 'taux_appreciation_scpi'))
+
+
+def _simuler_avec_params(
+    capital_av, capital_per, capital_scpi,
+    versement_av, versement_per, versement_scpi,
+    credit_scpi_montant,
+    params
+):
+    """Appelle `calculer_simulation_mensuelle` avec les paramètres fixes de `params`."""
+    return calculer_simulation_mensuelle(
+        capital_av, capital_per, capital_scpi,
+        versement_av, versement_per, versement_scpi,
+        params['taux_av'], params['taux_per'], params['taux_distribution_scpi'], params['taux_appreciation_scpi'],
+        params['frais_entree_av'], params['frais_entree_per'], params['frais_entree_scpi'],
+        params['tmi'], params['plafond_per_annuel'], params['duree_annees'],
+        credit_scpi_montant, params['credit_scpi_duree'], params['credit_scpi_taux'], params['credit_scpi_assurance'],
+        params.get('scpi_europeenne_ratio', 0.0)
+    )
+
+
 # ===== FONCTION D'OPTIMISATION =====
 
+# Arrondi des variables pour la clé du mémo des évaluations : bien plus fin que le pas des
+# différences finies de SLSQP (~1.5e-8), qui doivent rester des points distincts
+_DECIMALES_MEMO_OPTIM = 10
+
+# Écart relatif toléré entre l'optimum du programme linéaire et la simulation de contrôle
+_TOLERANCE_VERIFICATION_LP = 1e-6
+
+METHODES_OPTIMISATION = ('auto', 'lineaire', 'slsqp')
+
+
+def _bornes_optimisation(params, activer_vars, valeurs_defaut, capital_initial_max):
+    """Bornes et point de départ des 7 variables (une variable désactivée est fixée à sa valeur par défaut)."""
+    bounds = []
+    x0 = []
+    for i, active in enumerate(activer_vars):
+        if active:
+            if i == 3 or i == 5:  # versement_av ou versement_scpi
+                bounds.append((0, 10000))
+            elif i == 4:  # versement_per
+                bounds.append((0, params['plafond_per_annuel']/12))
+            elif i == 6:  # credit_scpi_montant
+                bounds.append((0, 1E7))
+            else:
+                bounds.append((0, capital_initial_max))
+            x0.append(0)
+        else:
+            bounds.append((valeurs_defaut[i], valeurs_defaut[i]))
+            x0.append(valeurs_defaut[i])
+    return bounds, x0
+
+
+# ===== FORMULATION LINÉAIRE =====
+# À taux fixés et TMI constante, le solde final net et l'effort d'épargne de chaque mois sont
+# affines en les 7 variables [capital_av, capital_per, capital_scpi, versement_av, versement_per,
+# versement_scpi, credit_scpi_montant], à deux exceptions près, traitées exactement :
+# - l'impôt SCPI tau * max(0, z_k) n'apparaît que dans la contrainte d'effort, et
+#   L_k + tau * max(0, z_k) <= E équivaut aux deux contraintes linéaires L_k <= E et L_k + tau * z_k <= E ;
+# - l'économie d'impôt PER de la première année dépend du mois où le plafond annuel est atteint
+#   (capital PER compris) : un programme linéaire est résolu par régime (plafond déjà atteint par
+#   le capital, atteint au mois j, jamais atteint) et le meilleur optimum est retenu.
+# Les années suivantes, le versement PER (borné au plafond / 12) est entièrement déductible.
+
+def _sans_lignes_redondantes(A, b, bornes_inf, bornes_sup):
+    """
+    Retire les contraintes mensuelles redondantes A_k . x <= b_k. Sur une suite de mois où
+    A_k . x - b_k est convexe en k pour tout x dans les bornes (différences secondes nulles, ou du
+    signe de la variable : mois sans crédit, intérêts décroissants du crédit), le maximum est
+    atteint aux deux mois qui encadrent la suite : les mois intermédiaires n'ajoutent rien.
+    """
+    lignes = np.column_stack([A, -b])
+    if len(lignes) < 3:
+        return A, b
+    difference_seconde = lignes[:-2] - 2 * lignes[1:-1] + lignes[2:]
+    tolerance = 1e-12 * np.abs(lignes).max(axis=0)
+    positive_permise = np.append(bornes_inf >= 0, True)
+    negative_permise = np.append(bornes_sup <= 0, False)
+    convexe = (
+        (np.abs(difference_seconde) <= tolerance)
+        | ((difference_seconde > 0) & positive_permise)
+        | ((difference_seconde < 0) & negative_permise)
+    ).all(axis=1)
+    garder = np.ones(len(lignes), dtype=bool)
+    garder[1:-1] = ~convexe
+    return A[garder], b[garder]
+
+
+def optimiser_programme_lineaire(params, effort_max, mensualite_max, capital_initial_max, bounds, evaluations=None):
+    """
+    Maximise le solde final net par programmation linéaire (scipy `linprog`, HiGHS) sous les
+    mêmes contraintes que `maximiser_solde_final_avec_contrainte`. `evaluations` (optionnel)
+    compte la simulation de vérification de la relaxation ('simulations').
+
+    Returns:
+        tuple: (x optimal (7 valeurs), solde final net du programme, nombre de programmes résolus),
+        ou None si aucun régime n'est réalisable.
+
+    Raises:
+        ValueError: si le versement PER peut dépasser le plafond / 12 sans être fixé (économie
+        d'impôt non linéaire au-delà de la première année).
+    """
+    from scipy.optimize import linprog
+
+    duree_mois = int(params['duree_annees'] * 12)
+    plafond, tmi = params['plafond_per_annuel'], params['tmi']
+    frais_av, frais_per, frais_scpi = params['frais_entree_av'], params['frais_entree_per'], params['frais_entree_scpi']
+    taux_distribution = (1 + params['taux_distribution_scpi']) ** (1/12) - 1
+    taux_imposition_scpi = tmi + (1 - params.get('scpi_europeenne_ratio', 0.0)) * 0.172
+    avec_credit = params['credit_scpi_duree'] > 0
+
+    k, mois_dans_annee, _, zeros = _calendrier(duree_mois)
+    croissance, cumul_versements = _facteurs_croissance(_taux_mensuels_supports(params), duree_mois)
+    if avec_credit:
+        interets_unitaires, mensualites_unitaires, crd_unitaire = _echeancier_credit_unitaire(
+            params['credit_scpi_taux'], params['credit_scpi_assurance'],
+            convertir_annees_vers_mois(params['credit_scpi_duree']), duree_mois
+        )
+    else:
+        interets_unitaires = mensualites_unitaires = zeros
+
+    # Solde final net = w . x
+    w = np.array([
+        (1 - frais_av) * croissance[0, -1],
+        (1 - frais_per) * croissance[1, -1],
+        (1 - frais_scpi) * croissance[2, -1],
+        (1 - frais_av) * cumul_versements[0, -1],
+        (1 - frais_per) * cumul_versements[1, -1],
+        cumul_versements[2, -1],
+        (1 - frais_scpi) * croissance[2, -1] - crd_unitaire[-1] if avec_credit else -1.0,
+    ])
+
+    # Effort du mois k hors impôt SCPI : L_k = A_k . x + b_k, impôt SCPI : tau * max(0, Z_k . x)
+    h = 1.0 if avec_credit else 0.0
+    A = np.zeros((duree_mois, 7))
+    A[:, 2] = -taux_distribution
+    A[:, 3] = 1.0
+    A[:, 4] = 1.0 - tmi
+    A[:, 5] = 1.0 - taux_distribution * k
+    A[:, 6] = mensualites_unitaires - h * taux_distribution
+    b = zeros.copy()
+    Z = np.zeros((duree_mois, 7))
+    Z[:, 2] = taux_distribution
+    Z[:, 5] = taux_distribution * k
+    Z[:, 6] = h * taux_distribution - interets_unitaires
+
+    # Années suivantes : versement PER entièrement déductible s'il ne dépasse pas le plafond / 12,
+    # économie constante s'il est fixé
+    versement_per_min, versement_per_max = bounds[4]
+    suite = k >= 12
+    if 12 * versement_per_max > plafond * (1 + 1e-12):
+        if versement_per_min != versement_per_max:
+            raise ValueError("Versement PER variable au-delà du plafond annuel : formulation linéaire inapplicable")
+        economie = np.minimum(versement_per_max, np.maximum(0, plafond - versement_per_max * mois_dans_annee)) if versement_per_max > 0 else zeros
+        A[suite, 4] = 1.0
+        b[suite] = -tmi * economie[suite]
+
+    contraintes_communes_A = [np.zeros(7), np.array([1.0, 1.0, 1.0, 0, 0, 0, 0])]
+    contraintes_communes_b = [0.0, capital_initial_max]
+    if avec_credit:
+        contraintes_communes_A[0] = np.array([0, 0, 0, 0, 0, 0, mensualites_unitaires.max()])
+        contraintes_communes_b[0] = mensualite_max
+    elif mensualite_max < 0:
+        return None
+
+    premiere_annee = np.arange(min(12, duree_mois))
+    bornes_inf, bornes_sup = np.array(bounds, dtype=float).T
+    nb_programmes = 0
+
+    def resoudre(j, relaxation=False):
+        """Programme du régime j : plafond PER atteint pendant le mois j de la première année
+        (-1 : déjà atteint par le capital, 12 : jamais atteint). Retourne (x, solde final) ou None."""
+        nonlocal nb_programmes
+        A_regime, b_regime = A.copy(), b.copy()
+        # Économie PER de la première année : tmi * (alpha_k capital_per + beta_k versement_per + gamma_k)
+        beta = (premiere_annee < j).astype(float)
+        alpha = np.zeros(len(premiere_annee))
+        gamma = np.zeros(len(premiere_annee))
+        if 0 <= j < len(premiere_annee):
+            alpha[j], beta[j], gamma[j] = -1.0, -float(j), plafond
+        A_regime[premiere_annee, 1] = -tmi * alpha
+        A_regime[premiere_annee, 4] = 1.0 - tmi * beta
+        b_regime[premiere_annee] = -tmi * gamma
+
+        if relaxation:
+            lignes_regime, bornes_regime = np.zeros((0, 7)), []
+        elif j == -1:
+            lignes_regime, bornes_regime = [[0, -1.0, 0, 0, 0, 0, 0]], [-plafond]
+        elif j == 12:
+            lignes_regime, bornes_regime = [[0, 1.0, 0, 0, 12.0, 0, 0]], [plafond]
+        else:
+            lignes_regime = [[0, 1.0, 0, 0, float(j), 0, 0], [0, -1.0, 0, 0, -float(j + 1), 0, 0]]
+            bornes_regime = [plafond, -plafond]
+
+        A_effort, b_effort = _sans_lignes_redondantes(A_regime, effort_max - b_regime, bornes_inf, bornes_sup)
+        A_effort_impot, b_effort_impot = _sans_lignes_redondantes(A_regime + taux_imposition_scpi * Z, effort_max - b_regime, bornes_inf, bornes_sup)
+        A_ub = np.vstack([A_effort, A_effort_impot, contraintes_communes_A, lignes_regime])
+        b_ub = np.concatenate([b_effort, b_effort_impot, contraintes_communes_b, bornes_regime])
+        res = linprog(-w, A_ub=A_ub, b_ub=b_ub, bounds=bounds, method='highs')
+        nb_programmes += 1
+        if res.status != 0:
+            return None
+        return list(np.clip(res.x, bornes_inf, bornes_sup)), -res.fun
+
+    # Relaxation : économie PER de la première année majorée par le versement (régime 12 sans sa
+    # contrainte). Son domaine contient le domaine réel, son optimum majore donc celui de chaque
+    # régime : s'il respecte les contraintes dans la simulation, c'est l'optimum global.
+    relaxation = resoudre(12, relaxation=True)
+    if relaxation is None or _optimum_lineaire_verifie(*relaxation, params, effort_max, mensualite_max, evaluations):
+        return relaxation and relaxation + (nb_programmes,)
+
+    # Sinon les régimes sont résolus en commençant par celui du point relâché puis par le plafond
+    # jamais atteint ; dès que l'un atteint la borne de la relaxation, l'optimum global est prouvé.
+    capital_per, versement_per = relaxation[0][1], relaxation[0][4]
+    if capital_per >= plafond:
+        regime_relaxation = -1
+    elif capital_per + 12 * versement_per <= plafond:
+        regime_relaxation = 12
+    else:
+        regime_relaxation = int((plafond - capital_per) // versement_per)
+    regimes = [regime_relaxation] + [j for j in (12, *range(-1, 12)) if j != regime_relaxation]
+    borne = relaxation[1] - _TOLERANCE_VERIFICATION_LP * 1e-3 * max(1.0, abs(relaxation[1]))
+    meilleur = None
+    for j in regimes:
+        optimum = resoudre(j)
+        if optimum is not None and (meilleur is None or optimum[1] > meilleur[1]):
+            meilleur = optimum
+            if meilleur[1] >= borne:
+                break
+    return meilleur and meilleur + (nb_programmes,)
+
+
+def _optimum_lineaire_verifie(x, solde_final_lp, params, effort_max, mensualite_max, evaluations=None):
+    """Contrôle l'optimum du programme linéaire par la simulation (solde, effort et mensualité)."""
+    if evaluations is not None:
+        evaluations['simulations'] += 1
+    solde_final, max_effort, mensualite = simulation_scalaires(*x, params)
+    tolerance = _TOLERANCE_VERIFICATION_LP * max(1.0, abs(solde_final), abs(effort_max), abs(mensualite_max))
+    return (
+        abs(solde_final - solde_final_lp) <= tolerance
+        and max_effort <= effort_max + tolerance
+        and mensualite <= mensualite_max + tolerance
+    )
+
+
 def maximiser_solde_final_avec_contrainte(
     params,
     effort_max,
     activer_vars=None,
     mensualite_max=1000,
     capital_initial_max=10000000,
-    valeurs_defaut=None
+    valeurs_defaut=None,
+    methode='auto'
 ):
     """
     Optimise le solde final sous contrainte d'effort d'épargne, de mensualité et de capital initial.
     activer_vars : liste de booléens (longueur 7) pour activer/désactiver chaque variable d'optimisation :
         [capital_av, capital_per, capital_scpi, versement_av, versement_per, versement_scpi, credit_scpi_montant]
     valeurs_defaut : liste de valeurs à utiliser si la variable n'est pas activée
+    methode : 'lineaire' (programme linéaire, optimum global), 'slsqp' (optimisation non linéaire
+        par différences finies) ou 'auto' (programme linéaire vérifié par la simulation, SLSQP en repli)
+    Le résultat contient 'methode' (méthode effectivement utilisée) et 'evaluations' : nombre
+    d'appels de l'objectif, de chaque contrainte simulée et de leurs jacobiens analytiques, de
+    simulations réellement exécutées et de programmes linéaires résolus.
     """
+    if methode not in METHODES_OPTIMISATION:
+        raise ValueError(f"Méthode d'optimisation inconnue : {methode} (attendu : {', '.join(METHODES_OPTIMISATION)})")
+
     if activer_vars is None:
         activer_vars = [True] * 7
 
@@ -294,76 +655,89 @@ def maximiser_solde_final_avec_contrainte(
             params.get('credit_scpi_montant', 0.0)
         ]
 
-    # Définir les bornes selon activation
-    bounds = []
-    x0 = []
-    for i, active in enumerate(activer_vars):
-        if active:
-            if i == 3 or i == 5:  # versement_av ou versement_scpi
-                bounds.append((0, 10000))
-            elif i == 4:  # versement_per
-                bounds.append((0, params['plafond_per_annuel']/12))
-            elif i == 6:  # credit_scpi_montant
-                bounds.append((0, 1E7))
-            else:
-                bounds.append((0, capital_initial_max))
-            x0.append(0)
-        else:
-            bounds.append((valeurs_defaut[i], valeurs_defaut[i]))
-            x0.append(valeurs_defaut[i])
+    bounds, x0 = _bornes_optimisation(params, activer_vars, valeurs_defaut, capital_initial_max)
+    evaluations = {'objectif': 0, 'contrainte_effort': 0, 'contrainte_mensualite': 0, 'jacobiens': 0, 'simulations': 0, 'programmes_lineaires': 0}
+
+    if methode != 'slsqp':
+        try:
+            optimum = optimiser_programme_lineaire(params, effort_max, mensualite_max, capital_initial_max, bounds, evaluations)
+        except ValueError as e:
+            if methode == 'lineaire':
+                raise
+            print(f"Optimisation : {e}, repli sur SLSQP")
+            optimum = None
+        if optimum is not None:
+            x_opt, solde_final_lp, evaluations['programmes_lineaires'] = optimum
+            if _optimum_lineaire_verifie(x_opt, solde_final_lp, params, effort_max, mensualite_max, evaluations):
+                return _resultat_optimisation(x_opt, True, 'lineaire', evaluations, params, effort_max, mensualite_max, capital_initial_max)
+            print("Optimisation : l'optimum linéaire diffère de la simulation, repli sur SLSQP")
+        if methode == 'lineaire':
+            raise ValueError("Le programme linéaire n'a pas d'optimum vérifié")
+
+    # Une simulation par point évalué, partagée par l'objectif et les contraintes (valeurs et
+    # jacobiens analytiques : pas de différences finies)
+    memo = {}
+    variables_actives = np.array(activer_vars, dtype=float)
+
+    def evaluer(x, fonction):
+        evaluations[fonction] += 1
+        x_full = [x[i] if activer_vars[i] else valeurs_defaut[i] for i in range(7)]
+        cle = tuple(round(float(v), _DECIMALES_MEMO_OPTIM) for v in x_full)
+        if cle not in memo:
+            evaluations['simulations'] += 1
+            valeurs, gradients = simulation_scalaires_et_gradients(*x_full, params)
+            # Une variable désactivée est remplacée par sa valeur par défaut : dérivée nulle
+            memo[cle] = (valeurs, gradients * variables_actives)
+        return memo[cle]
 
     def objectif(x):
-        x_full = [x[i] if activer_vars[i] else valeurs_defaut[i] for i in range(7)]
-        capital_av_test, capital_per_test, capital_scpi_test, versement_av_test, versement_per_test, versement_scpi_test, credit_scpi_montant_test = x_full
-        solde_final, _, _, _ = simulation_resume(
-            capital_av_test, capital_per_test, capital_scpi_test,
-            versement_av_test, versement_per_test, versement_scpi_test,
-            credit_scpi_montant_test,
-            params
-        )
+        (solde_final, _, _), _ = evaluer(x, 'objectif')
         return -solde_final
 
+    def jacobien_objectif(x):
+        _, gradients = evaluer(x, 'jacobiens')
+        return -gradients[0]
+
     def contrainte_effort(x):
-        x_full = [x[i] if activer_vars[i] else valeurs_defaut[i] for i in range(7)]
-        capital_av_test, capital_per_test, capital_scpi_test, versement_av_test, versement_per_test, versement_scpi_test, credit_scpi_montant_test = x_full
-        _, max_effort, _, _ = simulation_resume(
-            capital_av_test, capital_per_test, capital_scpi_test,
-            versement_av_test, versement_per_test, versement_scpi_test,
-            credit_scpi_montant_test,
-            params
-        )
+        (_, max_effort, _), _ = evaluer(x, 'contrainte_effort')
         return effort_max - max_effort
 
+    def jacobien_contrainte_effort(x):
+        _, gradients = evaluer(x, 'jacobiens')
+        return -gradients[1]
+
     def contrainte_mensualite(x):
-        x_full = [x[i] if activer_vars[i] else valeurs_defaut[i] for i in range(7)]
-        capital_av_test, capital_per_test, capital_scpi_test, versement_av_test, versement_per_test, versement_scpi_test, credit_scpi_montant_test = x_full
-        _, _, df_res_local, _ = simulation_resume(
-            capital_av_test, capital_per_test, capital_scpi_test,
-            versement_av_test, versement_per_test, versement_scpi_test,
-            credit_scpi_montant_test,
-            params
-        )
-        mensualite = df_res_local['mensualite_credit_scpi_mensuel'].max()
+        (_, _, mensualite), _ = evaluer(x, 'contrainte_mensualite')
         return mensualite_max - mensualite
 
+    def jacobien_contrainte_mensualite(x):
+        _, gradients = evaluer(x, 'jacobiens')
+        return -gradients[2]
+
     def contrainte_capital_initial(x):
         x_full = [x[i] if activer_vars[i] else valeurs_defaut[i] for i in range(7)]
         capital_av_test, capital_per_test, capital_scpi_test, _, _, _, _ = x_full
         total = capital_av_test + capital_per_test + capital_scpi_test
         return capital_initial_max - total
 
+    jacobien_capital_initial = -variables_actives * np.array([1.0, 1.0, 1.0, 0, 0, 0, 0])
+
     constraints = [
-        {'type': 'ineq', 'fun': contrainte_effort},
-        {'type': 'ineq', 'fun': contrainte_mensualite},
-        {'type': 'ineq', 'fun': contrainte_capital_initial}
+        {'type': 'ineq', 'fun': contrainte_effort, 'jac': jacobien_contrainte_effort},
+        {'type': 'ineq', 'fun': contrainte_mensualite, 'jac': jacobien_contrainte_mensualite},
+        {'type': 'ineq', 'fun': contrainte_capital_initial, 'jac': lambda x: jacobien_capital_initial}
     ]
 
-    res_opt = minimize(objectif, x0, bounds=bounds, constraints=constraints, method='SLSQP')
+    res_opt = minimize(objectif, x0, jac=jacobien_objectif, bounds=bounds, constraints=constraints, method='SLSQP')
     
-    x_opt = [res_opt.x[i] if activer_vars[i] else valeurs_defaut[i] for i in range(7)]
     x_opt = [res_opt.x[i] for i in range(7)]
+    return _resultat_optimisation(x_opt, res_opt.success, 'slsqp', evaluations, params, effort_max, mensualite_max, capital_initial_max)
+
 
+def _resultat_optimisation(x_opt, succes, methode, evaluations, params, effort_max, mensualite_max, capital_initial_max):
+    """Simulation complète de l'optimum retenu, vérification des contraintes et dictionnaire de résultat."""
     capital_av_opt, capital_per_opt, capital_scpi_opt, versement_av_opt, versement_per_opt, versement_scpi_opt, credit_scpi_montant_opt = x_opt
+    # DataFrame complet construit une seule fois, pour l'optimum retenu
     solde_final_opt, max_effort_opt, df_res_optimal, _ = simulation_resume(
         capital_av_opt, capital_per_opt, capital_scpi_opt,
         versement_av_opt, versement_per_opt, versement_scpi_opt,
@@ -402,10 +776,12 @@ def maximiser_solde_final_avec_contrainte(
         'credit_scpi_montant_opt': credit_scpi_montant_opt,
         'solde_final_opt': solde_final_opt,
         'max_effort_opt': max_effort_opt,
-        'success': res_opt.success,
+        'success': succes,
         'contraintes_satisfaites': contraintes_satisfaites,
         'messages_contraintes': messages_contraintes,
-        'df_res_optimal': df_res_optimal
+        'df_res_optimal': df_res_optimal,
+        'methode': methode,
+        'evaluations': evaluations
     }
 
 
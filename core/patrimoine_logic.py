@@ -1,8 +1,8 @@
 import pandas as pd
 from datetime import date
 import uuid
-import streamlit as st
-from datetime import date
+from core.loan_schedule import get_schedule
+from core.entity_store import get_entity_store
 # --- Fonctions de calcul de prêt ---
 
 def calculate_monthly_payment(principal, annual_rate_pct, duration_months):
@@ -20,32 +20,10 @@ def calculate_monthly_payment(principal, annual_rate_pct, duration_months):
     return payment
 
 def calculate_crd(principal, annual_rate_pct, duration_months, start_date, on_date=None):
-    """Calcule le Capital Restant Dû (CRD) à une date donnée."""
+    """Calcule le Capital Restant Dû (CRD) à une date donnée (lu dans l'échéancier en cache du prêt)."""
     if not all([principal > 0, annual_rate_pct is not None, duration_months > 0, start_date]):
         return principal
-
-    if on_date is None:
-        on_date = date.today()
-        
-    if start_date > on_date:
-        return principal
-
-    # On ne compte que les mois pleins écoulés
-    months_passed = (on_date.year - start_date.year) * 12 + (on_date.month - start_date.month)
-    total_months = duration_months
-    
-    if months_passed >= total_months:
-        return 0.0
-
-    monthly_payment = calculate_monthly_payment(principal, annual_rate_pct, duration_months)
-    monthly_rate = (annual_rate_pct / 100) / 12
-    remaining_months = total_months - months_passed
-    
-    if monthly_rate == 0:
-        return max(0, principal - (months_passed * monthly_payment))
-
-    crd = monthly_payment * (1 - (1 + monthly_rate)**-remaining_months) / monthly_rate
-    return max(0, crd)
+    return get_schedule(principal, annual_rate_pct, duration_months, start_date).crd_at(on_date)
 
 def calculate_loan_annual_breakdown(loan, year=None):
     """
@@ -75,33 +53,8 @@ def calculate_loan_annual_breakdown(loan, year=None):
     if not all([principal > 0, annual_rate_pct is not None, duration_months > 0, start_date]):
         return {'capital': 0, 'interest': 0, 'total_paid': 0}
 
-    # --- 1. Calcul du capital remboursé (méthode la plus fiable) ---
-    # On prend la fin de l'année N-1 et la fin de l'année N pour capturer tous les paiements de l'année N
-    date_debut_annee = date(year - 1, 12, 31)
-    date_fin_annee = date(year, 12, 31)
-
-    crd_debut_annee = calculate_crd(principal, annual_rate_pct, duration_months, start_date, on_date=date_debut_annee)
-    crd_fin_annee = calculate_crd(principal, annual_rate_pct, duration_months, start_date, on_date=date_fin_annee)
-    capital_rembourse = crd_debut_annee - crd_fin_annee
-
-    # --- 2. Calcul du total payé (nombre de mensualités) ---
-    mensualite = calculate_monthly_payment(principal, annual_rate_pct, duration_months)
-    total_duration_months = duration_months
-    
-    def get_months_passed(current_date):
-        if start_date > current_date: return 0
-        return (current_date.year - start_date.year) * 12 + (current_date.month - start_date.month)
-
-    months_passed_start = min(get_months_passed(date_debut_annee), total_duration_months)
-    months_passed_end = min(get_months_passed(date_fin_annee), total_duration_months)
-
-    nombre_paiements_annee = months_passed_end - months_passed_start
-    total_paye_annee = nombre_paiements_annee * mensualite
-
-    # --- 3. Calcul des intérêts par déduction ---
-    interets_payes = total_paye_annee - capital_rembourse
-
-    return {'capital': max(0, capital_rembourse), 'interest': max(0, interets_payes), 'total_paid': max(0, total_paye_annee)}
+    # Échéancier complet calculé une fois par prêt (core/loan_schedule.py)
+    return get_schedule(principal, annual_rate_pct, duration_months, start_date).annual_breakdown(year)
 
 # --- Fonctions de gestion des données du patrimoine ---
 
@@ -112,13 +65,8 @@ def get_patrimoine_df(actifs, passifs):
     if not actifs:
         return pd.DataFrame()
 
-    # Crée un dictionnaire qui mappe l'ID de chaque actif à sa dette totale (CRD)
-    dette_par_actif = {}
-    for p in passifs:
-        asset_id = p.get('actif_associe_id')
-        if asset_id:
-            crd = p.get('crd_calcule', 0)
-            dette_par_actif[asset_id] = dette_par_actif.get(asset_id, 0) + crd
+    # Dette totale (CRD) de chaque actif, tenue à jour par le magasin d'entités
+    dette_par_actif = get_entity_store(actifs, passifs).dette_par_actif()
 
     # Construit le DataFrame
     data = []
@@ -139,6 +87,7 @@ def get_patrimoine_df(actifs, passifs):
 
 def add_item(category):
     """Ajoute un élément à la liste des actifs ou passifs."""
+    import streamlit as st
     if category == 'actifs':
         st.session_state.actifs.append({
             'id': str(uuid.uuid4()),
@@ -158,6 +107,7 @@ def add_item(category):
 
 def remove_item(category, index):
     """Supprime un élément d'une liste à un index donné."""
+    import streamlit as st
     if category == 'actifs':
         asset_to_remove_id = st.session_state.actifs[index].get('id')
         st.session_state.actifs.pop(index)
@@ -171,12 +121,6 @@ def remove_item(category, index):
 
 # --- Fonctions d'analyse immobilière ---
 
-def find_associated_loans(asset_id, passifs):
-    """Trouve tous les prêts associés à un ID d'actif."""
-    if not asset_id:
-        return []
-    return [p for p in passifs if p.get('actif_associe_id') == asset_id]
-
 def calculate_lmnp_amortissement_annuel(asset):
     """
     Calcule l'amortissement annuel potentiel pour un bien en location meublée.
@@ -0,0 +1,87 @@
+# core/projection_cache.py
+
+import os
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+
+# Champs lus par generate_financial_projection (les autres, comme les libellés, n'influencent pas le résultat)
+_CHAMPS_PASSIF = ('id', 'actif_associe_id', 'montant_initial', 'taux_annuel', 'duree_mois', 'date_debut')
+_CHAMPS_REVENU = ('montant', 'type')
+_CHAMPS_DEPENSE = ('montant', 'categorie', 'source_id')
+
+def _extraire(entites, champs):
+    # Un champ absent est omis : la présence de 'source_id' compte pour les dépenses
+    return [{c: e[c] for c in champs if c in e} for e in entites]
+
+def cle_projection(parents, enfants, passifs, actifs, revenus, depenses, settings, projection_duration):
+    """
+    Calcule une empreinte stable (SHA-256) de toutes les entrées lues par `generate_financial_projection`.
+    Les parents, enfants et actifs productifs sont pris en entier (transmis au calcul de l'impôt
+    et de l'amortissement LMNP) ; seuls les champs utiles des passifs, revenus et dépenses comptent. L'année en cours fait partie de la clé (début de la projection).
+    """
+    contenu = {
+        'annee_debut': date.today().year,
+        'duree': int(projection_duration),
+        'parents': parents,
+        'enfants': enfants,
+        'passifs': _extraire(passifs, _CHAMPS_PASSIF),
+        'actifs': [a for a in actifs if a.get('type') == 'Immobilier productif'],
+        'revenus': _extraire(revenus, _CHAMPS_REVENU),
+        'depenses': _extraire(depenses, _CHAMPS_DEPENSE),
+        'settings': settings,
+    }
+    return hashlib.sha256(json.dumps(contenu, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+class ProjectionCache:
+    """
+    Cache LRU des projections financières récentes, indexé par `cle_projection` et partagé par
+    les sessions (protégé par un verrou). Revenir à un scénario déjà calculé est immédiat.
+    """
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Retourne une copie de la projection mise en cache, ou None."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key].copy()
+
+    def put(self, key, df):
+        """Ajoute une projection au cache (les plus anciennes sont évincées au-delà de `maxsize`)."""
+        with self._lock:
+            self._entries[key] = df.copy()
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Vide le cache et remet les compteurs à zéro."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Retourne les compteurs du cache."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+PROJECTION_CACHE = ProjectionCache(maxsize=int(os.environ.get('AUDIT_PROJECTION_CACHE_SIZE', 16)))
@@ -1,8 +1,12 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 from core.projection_logic import calculate_age
+from core.loan_schedule import get_portfolio
 from core.charts import create_gantt_chart_fig
+from core.foyer import foyer_depuis_session
+from core.projection_monte_carlo import simuler_monte_carlo, creer_hypotheses_monte_carlo
 
 def display_settings_ui(parents, enfants):
     """Affiche les widgets pour configurer les paramètres de la projection."""
@@ -74,16 +78,15 @@ def display_loan_crd_chart(df_projection, passifs):
         return
 
     # 1. Préparation des données pour le graphique
-    loan_options = {p['id']: p.get('libelle') or f"Prêt {p['id'][:4]}..." for p in passifs}
-    crd_columns = [col for col in df_projection.columns if col.startswith('CRD_')]
-    
-    if not crd_columns:
+    # CRD de fin d'année lus dans la matrice prêts × mois du portefeuille
+    if df_projection.empty or 'Année' not in df_projection.columns:
         st.info("Aucune donnée de Capital Restant Dû à afficher.")
         return
 
-    df_crd = df_projection[['Année'] + crd_columns].copy()
-    df_crd.columns = ['Année'] + [loan_options.get(col.replace('CRD_', ''), col) for col in df_crd.columns[1:]]
-    df_crd = df_crd.set_index('Année')
+    annees = df_projection['Année'].to_numpy()
+    crd_par_pret = get_portfolio(passifs).crd_fin_annee(annees)
+    libelles = [p.get('libelle') or f"Prêt {p['id'][:4]}..." for p in passifs]
+    df_crd = pd.DataFrame(crd_par_pret.T, index=pd.Index(annees, name='Année'), columns=libelles)
 
     # 2. Création du graphique
     fig = px.bar(df_crd, x=df_crd.index, y=df_crd.columns, title="Répartition du Capital Restant Dû par Emprunt", labels={'value': "Capital Restant Dû (€)", 'index': "Année", 'variable': 'Prêt'})
@@ -855,3 +858,43 @@ def display_retirement_transition_analysis(df_projection, parents, settings):
         f"et {annee2} (première année de retraite complète). Les variations positives sont en vert, "
         f"les négatives en rouge. Toutes les catégories correspondent exactement aux segments du graphique ci-dessus."
     )
+
+def _fan_chart(bandes, titre, yaxis_title):
+    """Graphique en éventail : bandes P5-P95 et P25-P75 autour de la médiane."""
+    fig = go.Figure()
+    for bas, haut, couleur, nom in (('P5', 'P95', 'rgba(31, 119, 180, 0.15)', '5e - 95e percentile'),
+                                    ('P25', 'P75', 'rgba(31, 119, 180, 0.35)', '25e - 75e percentile')):
+        fig.add_trace(go.Scatter(x=bandes['Année'], y=bandes[haut], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=bandes['Année'], y=bandes[bas], mode='lines', line=dict(width=0), fill='tonexty', fillcolor=couleur, name=nom))
+    fig.add_trace(go.Scatter(x=bandes['Année'], y=bandes['P50'], mode='lines', line=dict(color='rgb(31, 119, 180)', width=2), name='Médiane'))
+    fig.update_layout(title=titre, xaxis_title='Année', yaxis_title=yaxis_title, height=450, hovermode='x unified')
+    return fig
+
+def display_monte_carlo_projection(df_projection):
+    """Affiche la projection stochastique (Monte Carlo) du patrimoine net et du reste à vivre."""
+    st.markdown(
+        "Les flux de la projection sont rejoués sur des milliers de trajectoires aléatoires d'inflation, "
+        "de croissance des loyers et de rendements (AV, PER, SCPI, immobilier). L'épargne annuelle est "
+        "capitalisée sur le portefeuille financier."
+    )
+    hypotheses = creer_hypotheses_monte_carlo()
+    col1, col2, col3, col4 = st.columns(4)
+    nb_chemins = col1.selectbox("Nombre de trajectoires", options=[1000, 5000, 10000, 20000], index=2, key="mc_nb_chemins")
+    graine = col2.number_input("Graine aléatoire", min_value=0, value=42, step=1, key="mc_graine", help="Une même graine donne les mêmes trajectoires.")
+    hypotheses['inflation'] = col3.number_input("Inflation moyenne (%)", value=hypotheses['inflation'] * 100, step=0.1, format="%.1f", key="mc_inflation") / 100
+    euros_constants = col4.checkbox("Euros constants", value=False, key="mc_euros_constants", help="Montants exprimés en euros de la première année.")
+
+    resultats = simuler_monte_carlo(df_projection, foyer_depuis_session(), hypotheses=hypotheses,
+                                    nb_chemins=int(nb_chemins), graine=int(graine), euros_constants=euros_constants)
+
+    patrimoine_final = resultats['patrimoine_net'].iloc[-1]
+    annee_finale = int(patrimoine_final['Année'])
+    col_median, col_p5, col_proba = st.columns(3)
+    col_median.metric(f"Patrimoine net médian en {annee_finale}", f"{patrimoine_final['P50']:,.0f} €")
+    col_p5.metric(f"Scénario défavorable (5e percentile) en {annee_finale}", f"{patrimoine_final['P5']:,.0f} €")
+    col_proba.metric("Probabilité d'au moins une année d'épargne négative", f"{resultats['proba_annee_epargne_negative'] * 100:.1f} %")
+
+    unite = "€ constants" if euros_constants else "€"
+    st.plotly_chart(_fan_chart(resultats['patrimoine_net'], "Patrimoine net projeté", f"Montant ({unite})"), use_container_width=True)
+    st.plotly_chart(_fan_chart(resultats['reste_a_vivre'], "Reste à vivre annuel projeté", f"Montant ({unite})"), use_container_width=True)
+
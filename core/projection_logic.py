@@ -1,10 +1,16 @@
 import pandas as pd
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import CancelledError
+from concurrent.futures.process import BrokenProcessPool
 from datetime import date
-import streamlit as st
-from core.patrimoine_logic import calculate_loan_annual_breakdown, find_associated_loans, calculate_crd, calculate_lmnp_amortissement_annuel
+from core.patrimoine_logic import calculate_lmnp_amortissement_annuel
+from core.loan_schedule import get_portfolio
+from core.entity_store import empreinte_entite
+from core.foyer import foyer_depuis_session
 
 try:
-    from utils.openfisca_utils import analyser_fiscalite_foyer
+    from utils.openfisca_worker import executer_tache
     OPENFISCA_UTILITY_AVAILABLE = True
 except ImportError as e:
     OPENFISCA_UTILITY_AVAILABLE = False
@@ -110,206 +116,379 @@ def generate_gantt_data(parents, enfants, settings, projection_duration):
 
     return gantt_data
 
-def generate_financial_projection(parents, enfants, passifs, settings, projection_duration):
-    """Génère les données de projection financière année par année."""
-    projection_data = []
-    today = date.today()
+# --- Projection incrémentale ---
+# La projection est découpée en groupes de colonnes reliés par un graphe de dépendances. Chaque
+# groupe déclare les entrées qu'il lit (`entrees`) et les groupes dont il dépend ; il n'est recalculé
+# que si ses entrées ou la version d'un groupe amont ont changé. La version d'un groupe n'augmente
+# que si ses sorties diffèrent réellement : un changement sans effet ne se propage pas en aval.
+
+def _empreinte_sorties(valeur):
+    """Empreinte comparable des sorties d'un groupe (tableaux NumPy compris)."""
+    if isinstance(valeur, np.ndarray):
+        return (valeur.dtype.str, valeur.shape, valeur.tobytes())
+    if isinstance(valeur, dict):
+        return tuple((k, _empreinte_sorties(v)) for k, v in valeur.items())
+    if isinstance(valeur, (list, tuple)):
+        return tuple(_empreinte_sorties(v) for v in valeur)
+    return valeur
+
+def _entrees_ages_statuts(ctx):
+    settings = ctx['settings']
+    parents = tuple((p['prenom'], p['date_naissance'], settings[p['prenom']]['retraite']) for p in ctx['parents'])
+    enfants = tuple(
+        (e.get('prenom'), e.get('date_naissance'),
+         settings.get(e.get('prenom'), {}).get('debut_etudes', 18), settings.get(e.get('prenom'), {}).get('duree_etudes', 5))
+        for e in ctx['enfants']
+    )
+    return (ctx['annee_debut'], ctx['nb_annees'], parents, enfants)
+
+def _groupe_ages_statuts(ctx, amont, memo):
+    """Âges et statuts des parents (actif / retraite) et des enfants (scolarisé / études / actif)."""
+    annees, settings = ctx['annees'], ctx['settings']
+    colonnes, parents_actifs = {}, {}
+    for parent in ctx['parents']:
+        prenom = parent['prenom']
+        # Calcul simplifié de l'âge pour cohérence avec le Gantt
+        age = annees - parent['date_naissance'].year
+        actif = age < settings[prenom]['retraite']
+        colonnes[f'Âge {prenom}'] = age
+        colonnes[f'Statut {prenom}'] = np.where(actif, "Actif", "Retraite")
+        parents_actifs[prenom] = actif
+
+    enfants_a_charge = np.zeros((len(ctx['enfants']), len(annees)), dtype=bool)
+    statuts_enfants = []
+    for k, enfant in enumerate(ctx['enfants']):
+        prenom_enfant = enfant.get('prenom')
+        dob_enfant = enfant.get('date_naissance')
+        if not prenom_enfant or not dob_enfant:
+            statuts_enfants.append(None)
+            continue
 
-    # Récupérer les paramètres de revenus pour chaque parent
-    income_settings = {}
-    for p in parents:
-        prenom = p['prenom']
-        income_settings[prenom] = {
-            'revenu_actuel': settings[prenom].get('revenu_actuel', 0),
-            'pension_annuelle': settings[prenom].get('pension_annuelle', 25000)
-        }
-
-    actifs_productifs = [a for a in st.session_state.get('actifs', []) if a.get('type') == 'Immobilier productif']
-
-    for i in range(projection_duration + 1):
-        annee = today.year + i
-        current_date_in_year = date(annee, 1, 1)
-        year_data = {'Année': annee}
-        
-        revenus_annuels_parents = {}
-        
-        # --- Traitement des parents ---
-        for parent in parents:
-            prenom = parent['prenom']
-            dob = parent['date_naissance']
-            # Calcul simplifié de l'âge pour cohérence avec le Gantt
-            age = annee - dob.year
-            year_data[f'Âge {prenom}'] = age
-            
-            age_retraite = settings[prenom]['retraite']
-            
-            if age < age_retraite:
-                status_parent = "Actif"
-                revenu = income_settings[prenom]['revenu_actuel']
+        settings_enfant = settings.get(prenom_enfant, {})
+        age_debut_etudes = settings_enfant.get('debut_etudes', 18)
+        duree_etudes = settings_enfant.get('duree_etudes', 5)
+
+        # Même âge que calculate_age au 1er janvier de chaque année
+        age_enfant = annees - dob_enfant.year - int((1, 1) < (dob_enfant.month, dob_enfant.day))
+        status = np.select([age_enfant < age_debut_etudes, age_enfant <= age_debut_etudes + duree_etudes], ["Scolarisé", "Études"], "Actif")
+        colonnes[f'Âge {prenom_enfant}'] = age_enfant
+        colonnes[f'Statut {prenom_enfant}'] = status
+        enfants_a_charge[k] = status != "Actif"
+        statuts_enfants.append(status)
+
+    return {'colonnes': colonnes, 'parents_actifs': parents_actifs, 'enfants_a_charge': enfants_a_charge, 'statuts_enfants': statuts_enfants}
+
+def _entrees_revenus(ctx):
+    settings, revenus = ctx['settings'], ctx['revenus']
+    parents = tuple((p['prenom'], settings[p['prenom']].get('revenu_actuel', 0), settings[p['prenom']].get('pension_annuelle', 25000)) for p in ctx['parents'])
+    loyers_percus = sum(r.get('montant', 0) * 12 for r in revenus if r.get('type') == 'Patrimoine')
+    autres_revenus = sum(r.get('montant', 0) * 12 for r in revenus if r.get('type') == 'Autre')
+    return (parents, loyers_percus, autres_revenus)
+
+def _groupe_revenus(ctx, amont, memo):
+    """Revenus des parents selon leur statut, revenus annexes (supposés constants) et revenus du foyer."""
+    nb_annees, settings = ctx['nb_annees'], ctx['settings']
+    parents_actifs = amont['ages_statuts']['parents_actifs']
+    colonnes, revenus_parents = {}, {}
+    revenus_par_annee = [{} for _ in range(nb_annees)]
+    for parent in ctx['parents']:
+        prenom = parent['prenom']
+        actif = parents_actifs[prenom]
+        revenu_actuel = settings[prenom].get('revenu_actuel', 0)
+        pension_annuelle = settings[prenom].get('pension_annuelle', 25000)
+        revenu = np.where(actif, revenu_actuel, pension_annuelle)
+        colonnes[f'Revenu {prenom}'] = revenu
+        revenus_parents[prenom] = revenu
+        for revenus_annee, est_actif in zip(revenus_par_annee, actif):
+            revenus_annee[prenom] = revenu_actuel if est_actif else pension_annuelle
+
+    total_revenus_foyer = sum(revenus_parents.values(), np.zeros(nb_annees, dtype=int))
+    colonnes['Revenus bruts du foyer'] = total_revenus_foyer
+
+    _, loyers_percus, autres_revenus = _entrees_revenus(ctx)
+    colonnes['Loyers perçus'] = np.full(nb_annees, loyers_percus)
+    colonnes['Autres revenus'] = np.full(nb_annees, autres_revenus)
+    colonnes['Revenus du foyer'] = total_revenus_foyer + loyers_percus + autres_revenus
+    return {'colonnes': colonnes, 'total_revenus_foyer': total_revenus_foyer, 'revenus_par_annee': revenus_par_annee}
+
+def _entrees_prets(ctx):
+    return (ctx['annee_debut'], ctx['nb_annees'], empreinte_entite(ctx['passifs']))
+
+def _groupe_prets(ctx, amont, memo):
+    """Mensualités, intérêts par actif et CRD de fin d'année de tous les prêts (prêts × années)."""
+    annees = ctx['annees']
+    portefeuille = get_portfolio(ctx['passifs'])
+    prets_annuels = portefeuille.annual(annees)
+    crd_par_pret = portefeuille.crd_fin_annee(annees)
+    return {
+        'colonnes': {'Mensualités Prêts': portefeuille.total(prets_annuels['total_paid'])},
+        'interets_par_actif': portefeuille.par_actif(prets_annuels['interest']),
+        'crd': {f"CRD_{pret['id']}": crd_par_pret[j] for j, pret in enumerate(ctx['passifs'])},
+    }
+
+def _entrees_revenus_fonciers(ctx):
+    return (ctx['annee_debut'], ctx['nb_annees'], empreinte_entite([a for a in ctx['actifs'] if a.get('type') == 'Immobilier productif']))
+
+def _groupe_revenus_fonciers(ctx, amont, memo):
+    """Revenus fonciers nets, revenu LMNP, prélèvements sociaux et réduction Pinel des biens productifs."""
+    annees, nb_annees = ctx['annees'], ctx['nb_annees']
+    interets_par_actif = amont['prets']['interets_par_actif']
+    total_loyers_bruts = np.zeros(nb_annees)
+    total_charges_deductibles = np.zeros(nb_annees)
+    total_reduction_pinel = np.zeros(nb_annees)
+    total_revenu_lmnp = np.zeros(nb_annees)
+
+    for asset in (a for a in ctx['actifs'] if a.get('type') == 'Immobilier productif'):
+        loyers_annuels = asset.get('loyers_mensuels', 0) * 12
+        charges_annuelles = asset.get('charges', 0) * 12
+        taxe_fonciere = asset.get('taxe_fonciere', 0)
+        interets_emprunt = interets_par_actif.get(asset.get('id'), np.zeros(nb_annees))
+
+        # --- Traitement LMNP avec amortissement réel (dotation annuelle) ---
+        if asset.get('mode_exploitation') == 'Location Meublée':
+            amortissement_annuel = calculate_lmnp_amortissement_annuel(asset).get('total', 0)
+            revenu_lmnp = loyers_annuels - charges_annuelles - taxe_fonciere - interets_emprunt - amortissement_annuel
+            total_revenu_lmnp += np.maximum(0, revenu_lmnp)
+            continue  # Ne pas inclure dans les revenus fonciers classiques
+
+        # Traitement classique (revenus fonciers)
+        total_loyers_bruts += loyers_annuels
+        total_charges_deductibles += charges_annuelles + taxe_fonciere + interets_emprunt
+
+        # Réduction d'impôt Pinel : 2 % par an pendant 9 ans, puis 1 % jusqu'à 12 ans
+        if asset.get('dispositif_fiscal') == 'Pinel':
+            annee_debut = asset.get('annee_debut_dispositif')
+            duree = asset.get('duree_dispositif')
+            if annee_debut and duree:
+                annees_ecoulees = annees - annee_debut
+                en_cours = (annee_debut <= annees) & (annees < annee_debut + duree)
+                taux_reduction_annuel = np.where(annees_ecoulees < 9, 0.02, np.where((annees_ecoulees < 12) & (duree == 12), 0.01, 0))
+                total_reduction_pinel += np.where(en_cours, min(asset.get('valeur', 0), 300000) * taux_reduction_annuel, 0)
+
+    # Revenu foncier net calculé (affiché pour vérification) et prélèvements sociaux
+    revenu_foncier_net = np.maximum(0, total_loyers_bruts - total_charges_deductibles)
+    colonnes = {
+        'Revenu Foncier Net': revenu_foncier_net,
+        'Revenu LMNP': total_revenu_lmnp,
+        'Prélèvements Sociaux': revenu_foncier_net * 0.172,
+    }
+    return {'colonnes': colonnes, 'reduction_pinel': total_reduction_pinel}
+
+_TAILLE_MEMO_IMPOT = 512
+
+def _entrees_impot(ctx):
+    return (empreinte_entite(ctx['parents']), empreinte_entite(ctx['enfants']), OPENFISCA_UTILITY_AVAILABLE)
+
+def _groupe_impot(ctx, amont, memo):
+    """
+    Impôt sur le revenu de chaque année. Avec OpenFisca, l'impôt brut de chaque année est mémorisé
+    selon ses propres entrées (foyer, enfants à charge, salaires, revenu foncier) : seules les années
+    dont une entrée a changé sont recalculées, en une simulation. Si ce calcul n'aboutit pas (échéance,
+    annulation, processus de travail arrêté), ces années sont estimées forfaitairement et le groupe
+    est marqué provisoire : il sera recalculé à l'appel suivant.
+    """
+    annees, nb_annees, parents, enfants = ctx['annees'], ctx['nb_annees'], ctx['parents'], ctx['enfants']
+    revenus = amont['revenus']
+    fonciers = amont['revenus_fonciers']['colonnes']
+    revenu_foncier_net = fonciers['Revenu Foncier Net']
+    impots_forfaitaires = (revenus['total_revenus_foyer'] + revenu_foncier_net + fonciers['Revenu LMNP']) * 0.15
+
+    if OPENFISCA_UTILITY_AVAILABLE and parents:
+        impots_annuels = memo.setdefault('impots_annuels', OrderedDict())
+        enfants_a_charge = amont['ages_statuts']['enfants_a_charge']
+        enfants_par_annee = [[e for e, a_charge in zip(enfants, enfants_a_charge[:, i]) if a_charge] for i in range(nb_annees)]
+        foyer = empreinte_entite(parents)
+        cles = [
+            (int(annee), foyer, empreinte_entite(enfants_annee), empreinte_entite(revenus_annee), float(revenu_foncier))
+            for annee, enfants_annee, revenus_annee, revenu_foncier in zip(annees, enfants_par_annee, revenus['revenus_par_annee'], revenu_foncier_net)
+        ]
+        a_calculer = [i for i, cle in enumerate(cles) if cle not in impots_annuels]
+        interrompu = False
+        if a_calculer:
+            try:
+                resultats_fiscaux = executer_tache(
+                    'multi_annees', message="Calcul de l'impôt des années projetées", proprietaire=ctx['proprietaire'],
+                    annees=[int(annees[i]) for i in a_calculer],
+                    parents=parents,
+                    enfants_par_annee=[enfants_par_annee[i] for i in a_calculer],
+                    revenus_par_annee=[revenus['revenus_par_annee'][i] for i in a_calculer],
+                    revenus_fonciers_par_annee=[float(revenu_foncier_net[i]) for i in a_calculer],
+                    est_parent_isole=len(parents) == 1
+                )
+            except (TimeoutError, CancelledError, BrokenProcessPool) as e:
+                print(f"[Projection] Impôt OpenFisca non calculé ({type(e).__name__}) : estimation forfaitaire pour {len(a_calculer)} année(s)")
+                interrompu = True
+                memo['provisoire'] = True
             else:
-                status_parent = "Retraite"
-                revenu = income_settings[prenom]['pension_annuelle']
-            
-            year_data[f'Statut {prenom}'] = status_parent
-            revenus_annuels_parents[prenom] = revenu
-            year_data[f'Revenu {prenom}'] = revenu
-
-        # --- Calculs pour le foyer ---
-        total_revenus_foyer = sum(revenus_annuels_parents.values())
-        year_data['Revenus bruts du foyer'] = total_revenus_foyer
-        
-        # --- Déterminer les enfants à charge pour l'année en cours ---
-        enfants_a_charge_annee = []
-        total_cout_etudes_annee = 0
-        for enfant in enfants:
-            prenom_enfant = enfant.get('prenom')
-            dob_enfant = enfant.get('date_naissance')
-            if not prenom_enfant or not dob_enfant:
-                continue
-
-            # 1. Récupérer les paramètres pour l'enfant
-            settings_enfant = settings.get(prenom_enfant, {})
-            age_debut_etudes = settings_enfant.get('debut_etudes', 18)
-            duree_etudes = settings_enfant.get('duree_etudes', 5)
-            cout_etudes_annuel = settings_enfant.get('cout_etudes_annuel', 0)
-
-            # 2. Calcul de l'âge et du statut de l'enfant pour l'année en cours
-            age_enfant = calculate_age(dob_enfant, current_date_in_year)
-            
-            if age_enfant < age_debut_etudes:
-                status = "Scolarisé"
-            elif age_enfant <= age_debut_etudes + duree_etudes:
-                status = "Études"
-            else:
-                status = "Actif"
-            
-            year_data[f'Âge {prenom_enfant}'] = age_enfant
-            year_data[f'Statut {prenom_enfant}'] = status
-
-            # 3. Déterminer si l'enfant est à charge et ajouter les coûts associés
-            if status != "Actif":
-                enfants_a_charge_annee.append(enfant)
-            
-            if status == "Études":
-                total_cout_etudes_annee += cout_etudes_annuel
-
-        year_data['Coût des études'] = total_cout_etudes_annee
-
-        # --- Flux financiers (revenus et dépenses) ---
-        # 1. Calcul dynamique des mensualités de prêts pour l'année en cours
-        total_paiements_prets_annee = 0
-        for pret in passifs:
-            breakdown = calculate_loan_annual_breakdown(pret, year=annee)
-            total_paiements_prets_annee += breakdown.get('total_paid', 0)
-        year_data['Mensualités Prêts'] = total_paiements_prets_annee
-
-        # 2. Calcul des autres dépenses (qui sont supposées constantes pour l'instant)
-        all_depenses = st.session_state.get('depenses', [])
-        charges_immo = sum(d.get('montant', 0) * 12 for d in all_depenses if d.get('categorie') == 'Logement' and 'source_id' in d)
-        # Exclure l'IR automatique des projections car il est recalculé avec OpenFisca
-        taxes_foncieres = sum(d.get('montant', 0) * 12 for d in all_depenses if d.get('categorie') == 'Impôts et taxes' and 'source_id' in d and d.get('source_id') != 'fiscal_auto')
-        autres_depenses = sum(d.get('montant', 0) * 12 for d in all_depenses if 'source_id' not in d)
-        
-        year_data['Charges Immobilières'] = charges_immo
-        year_data['Taxes Foncières'] = taxes_foncieres
-        year_data['Autres Dépenses'] = autres_depenses
-        total_depenses = total_paiements_prets_annee + charges_immo + taxes_foncieres + autres_depenses + total_cout_etudes_annee
-
-        # 3. Calcul des revenus annexes
-        all_revenus = st.session_state.get('revenus', [])
-        year_data['Loyers perçus'] = sum(r.get('montant', 0) * 12 for r in all_revenus if r.get('type') == 'Patrimoine')
-        year_data['Autres revenus'] = sum(r.get('montant', 0) * 12 for r in all_revenus if r.get('type') == 'Autre')
-
-        # --- Calcul de l'impôt ---
-        # 1. Calcul des revenus fonciers et LMNP ---
-        total_loyers_bruts_annee = 0
-        total_charges_deductibles_annee = 0
-        total_reduction_pinel_annee = 0
-        total_revenu_lmnp_annee = 0
-
-        for asset in actifs_productifs:
-            loyers_annuels = asset.get('loyers_mensuels', 0) * 12
-            charges_annuelles = asset.get('charges', 0) * 12
-            taxe_fonciere = asset.get('taxe_fonciere', 0)
-            loans = find_associated_loans(asset.get('id'), passifs)
-            interets_emprunt = sum(calculate_loan_annual_breakdown(l, year=annee).get('interest', 0) for l in loans)
-            charges_deductibles_asset = charges_annuelles + taxe_fonciere + interets_emprunt
-
-            # --- Traitement LMNP avec amortissement réel ---
-            if asset.get('mode_exploitation') == 'Location Meublée':
-                # Utilisation de l'amortissement réel (dotation annuelle)
-                amortissement = calculate_lmnp_amortissement_annuel(asset)
-                amortissement_annuel = amortissement.get('total', 0)
-                revenu_lmnp = loyers_annuels - charges_annuelles - taxe_fonciere - interets_emprunt - amortissement_annuel
-                total_revenu_lmnp_annee += max(0, revenu_lmnp)
-                continue  # Ne pas inclure dans les revenus fonciers classiques
-
-            # Traitement classique (revenus fonciers)
-            total_loyers_bruts_annee += loyers_annuels
-            total_charges_deductibles_annee += charges_deductibles_asset
-
-            # Calcul de la réduction d'impôt Pinel pour l'année
-            if asset.get('dispositif_fiscal') == 'Pinel':
-                annee_debut = asset.get('annee_debut_dispositif')
-                duree = asset.get('duree_dispositif')
-                if annee_debut and duree and (annee_debut <= annee < annee_debut + duree):
-                    base_calcul = min(asset.get('valeur', 0), 300000)
-                    annees_ecoulees = annee - annee_debut
-                    taux_reduction_annuel = 0.02 if 0 <= annees_ecoulees < 9 else (0.01 if 9 <= annees_ecoulees < 12 and duree == 12 else 0)
-                    total_reduction_pinel_annee += base_calcul * taux_reduction_annuel
-
-        # Ajout du revenu foncier net calculé pour vérification dans le tableau
-        revenu_foncier_net_calcule = max(0, total_loyers_bruts_annee - total_charges_deductibles_annee)
-        year_data['Revenu Foncier Net'] = revenu_foncier_net_calcule
-        year_data['Revenu LMNP'] = total_revenu_lmnp_annee
-
-        # Calcul des prélèvements sociaux sur les revenus fonciers
-        prelevements_sociaux = revenu_foncier_net_calcule * 0.172
-        year_data['Prélèvements Sociaux'] = prelevements_sociaux
-
-        # 2. Appel à OpenFisca avec tous les revenus
-        if OPENFISCA_UTILITY_AVAILABLE:
-            est_parent_isole = len(parents) == 1
-            # Utilisation de la nouvelle fonction d'analyse complète
-            # Retirer le paramètre revenu_lmnp si la fonction ne le supporte pas
-            resultats_fiscaux = analyser_fiscalite_foyer(
-                annee=annee,
-                parents=parents,
-                enfants=enfants_a_charge_annee,
-                revenus_annuels=revenus_annuels_parents,
-                revenu_foncier_net=revenu_foncier_net_calcule,
-                est_parent_isole=est_parent_isole
-            )
-            impot_brut = resultats_fiscaux.get('ir_net', 0)
-            impot = max(0, impot_brut - total_reduction_pinel_annee)
+                for i, ip_net in zip(a_calculer, resultats_fiscaux['ip_net']):
+                    impots_annuels[cles[i]] = float(ip_net)
+        for cle in cles:
+            if cle in impots_annuels:
+                impots_annuels.move_to_end(cle)
+        while len(impots_annuels) > max(_TAILLE_MEMO_IMPOT, nb_annees):
+            impots_annuels.popitem(last=False)
+        if interrompu:
+            memo['detail'] = f"Calcul OpenFisca interrompu : estimation forfaitaire (15 %) pour {len(a_calculer)} année(s) sur {nb_annees}"
         else:
-            # Fallback si OpenFisca n'est pas disponible
-            total_revenus_imposables = total_revenus_foyer + revenu_foncier_net_calcule + total_revenu_lmnp_annee
-            impot_brut = total_revenus_imposables * 0.15
-            impot = max(0, impot_brut - total_reduction_pinel_annee)
-
-        year_data['Impôt sur le revenu'] = impot
-
-        # --- Finalisation des calculs financiers ---
-        # Le "Reste à vivre" est maintenant calculé après déduction de toutes les charges, de l'impôt et des prélèvements sociaux.
-        year_data['Revenus du foyer'] = total_revenus_foyer + year_data['Loyers perçus'] + year_data['Autres revenus']
-        year_data['Reste à vivre'] = year_data['Revenus du foyer'] - total_depenses - impot - prelevements_sociaux
-
-        # --- Calcul du CRD pour chaque prêt ---
-        for pret in passifs:
-            pret_id = pret['id']
-            crd_fin_annee = calculate_crd(
-                principal=pret.get('montant_initial', 0),
-                annual_rate_pct=pret.get('taux_annuel'),
-                duration_months=pret.get('duree_mois', 0),
-                start_date=pret.get('date_debut'),
-                on_date=date(annee, 12, 31)
-            )
-            year_data[f"CRD_{pret_id}"] = crd_fin_annee
-
-        projection_data.append(year_data)
-        
-    df = pd.DataFrame(projection_data)
+            memo['detail'] = f"{len(a_calculer)} année(s) imposée(s) sur {nb_annees}"
+        impots_bruts = np.array([impots_annuels.get(cle, forfait) for cle, forfait in zip(cles, impots_forfaitaires)], dtype=float)
+    else:
+        # Fallback si OpenFisca n'est pas disponible
+        memo['detail'] = "Estimation forfaitaire (15 %)"
+        impots_bruts = impots_forfaitaires
+
+    impot = np.maximum(0, impots_bruts - amont['revenus_fonciers']['reduction_pinel'])
+    return {'colonnes': {'Impôt sur le revenu': impot}}
+
+def _entrees_reste_a_vivre(ctx):
+    depenses, settings = ctx['depenses'], ctx['settings']
+    charges_immo = sum(d.get('montant', 0) * 12 for d in depenses if d.get('categorie') == 'Logement' and 'source_id' in d)
+    # Exclure l'IR automatique des projections car il est recalculé avec OpenFisca
+    taxes_foncieres = sum(d.get('montant', 0) * 12 for d in depenses if d.get('categorie') == 'Impôts et taxes' and 'source_id' in d and d.get('source_id') != 'fiscal_auto')
+    autres_depenses = sum(d.get('montant', 0) * 12 for d in depenses if 'source_id' not in d)
+    couts_etudes = tuple(settings.get(e.get('prenom'), {}).get('cout_etudes_annuel', 0) for e in ctx['enfants'])
+    return (charges_immo, taxes_foncieres, autres_depenses, couts_etudes)
+
+def _groupe_reste_a_vivre(ctx, amont, memo):
+    """Dépenses (supposées constantes), coût des études et reste à vivre."""
+    nb_annees = ctx['nb_annees']
+    charges_immo, taxes_foncieres, autres_depenses, couts_etudes = _entrees_reste_a_vivre(ctx)
+
+    cout_etudes = np.zeros(nb_annees, dtype=int)
+    for status, cout_etudes_annuel in zip(amont['ages_statuts']['statuts_enfants'], couts_etudes):
+        if status is not None:
+            cout_etudes = cout_etudes + np.where(status == "Études", cout_etudes_annuel, 0)
+
+    paiements_prets = amont['prets']['colonnes']['Mensualités Prêts']
+    total_depenses = paiements_prets + charges_immo + taxes_foncieres + autres_depenses + cout_etudes
+    revenus_du_foyer = amont['revenus']['colonnes']['Revenus du foyer']
+    impot = amont['impot']['colonnes']['Impôt sur le revenu']
+    prelevements_sociaux = amont['revenus_fonciers']['colonnes']['Prélèvements Sociaux']
+    colonnes = {
+        'Coût des études': cout_etudes,
+        'Charges Immobilières': np.full(nb_annees, charges_immo),
+        'Taxes Foncières': np.full(nb_annees, taxes_foncieres),
+        'Autres Dépenses': np.full(nb_annees, autres_depenses),
+        # Le "Reste à vivre" est calculé après déduction de toutes les charges, de l'impôt et des prélèvements sociaux.
+        'Reste à vivre': revenus_du_foyer - total_depenses - impot - prelevements_sociaux,
+    }
+    return {'colonnes': colonnes}
+
+# Graphe de dépendances : (groupe, groupes amont, entrées lues, calcul), dans l'ordre topologique
+GRAPHE_PROJECTION = (
+    ('ages_statuts', (), _entrees_ages_statuts, _groupe_ages_statuts),
+    ('revenus', ('ages_statuts',), _entrees_revenus, _groupe_revenus),
+    ('prets', (), _entrees_prets, _groupe_prets),
+    ('revenus_fonciers', ('prets',), _entrees_revenus_fonciers, _groupe_revenus_fonciers),
+    ('impot', ('ages_statuts', 'revenus', 'revenus_fonciers'), _entrees_impot, _groupe_impot),
+    ('reste_a_vivre', ('ages_statuts', 'revenus', 'prets', 'revenus_fonciers', 'impot'), _entrees_reste_a_vivre, _groupe_reste_a_vivre),
+)
+
+class _EtatGroupe:
+    """Dernier calcul d'un groupe : clé d'entrées, sorties, version et mémoire propre au groupe."""
+
+    __slots__ = ('cle', 'sorties', 'version', 'empreinte', 'memo')
+
+    def __init__(self):
+        self.cle = None
+        self.sorties = None
+        self.version = 0
+        self.empreinte = None
+        self.memo = {}
+
+class ProjectionIncrementale:
+    """
+    Moteur de projection incrémental : conserve le dernier calcul de chaque groupe de colonnes et ne
+    recalcule que les groupes (et, pour l'impôt, les années) touchés par un changement d'entrée.
+    `dernier_rapport` indique pour chaque groupe s'il a été recalculé lors du dernier appel ;
+    `dernier_calcul_provisoire` qu'un groupe y a produit une estimation provisoire (calcul interrompu).
+    """
+
+    __slots__ = ('_etats', 'dernier_rapport', 'dernier_calcul_provisoire', 'nb_calculs')
+
+    def __init__(self):
+        self._etats = {nom: _EtatGroupe() for nom, _, _, _ in GRAPHE_PROJECTION}
+        self.dernier_rapport = []
+        self.dernier_calcul_provisoire = False
+        self.nb_calculs = 0
+
+    def calculer(self, ctx):
+        """Retourne les sorties de tous les groupes pour le contexte donné."""
+        sorties, versions, rapport = {}, {}, []
+        provisoire = False
+        for nom, dependances, entrees, calcul in GRAPHE_PROJECTION:
+            etat = self._etats[nom]
+            cle = (entrees(ctx), tuple(versions[d] for d in dependances))
+            recalcule = cle != etat.cle
+            if recalcule:
+                etat.memo.pop('detail', None)
+                resultat = calcul(ctx, {d: sorties[d] for d in dependances}, etat.memo)
+                empreinte = _empreinte_sorties(resultat)
+                if empreinte != etat.empreinte:
+                    etat.version += 1
+                    etat.empreinte = empreinte
+                # Un résultat provisoire (calcul interrompu) n'est pas conservé pour les appels suivants
+                provisoire_groupe = etat.memo.pop('provisoire', False)
+                provisoire = provisoire or provisoire_groupe
+                etat.cle = None if provisoire_groupe else cle
+                etat.sorties = resultat
+            sorties[nom] = etat.sorties
+            versions[nom] = etat.version
+            rapport.append({'groupe': nom, 'recalcule': recalcule, 'version': etat.version, 'detail': etat.memo.get('detail', '') if recalcule else ''})
+        self.dernier_rapport = rapport
+        self.dernier_calcul_provisoire = provisoire
+        self.nb_calculs += 1
+        return sorties
+
+_PROJECTION_HORS_SESSION = ProjectionIncrementale()
+
+def get_projection_incrementale():
+    """Moteur incrémental de la session (hors session Streamlit, un moteur de module est utilisé)."""
+    import streamlit as st
+    try:
+        if '_projection_incrementale' not in st.session_state:
+            st.session_state['_projection_incrementale'] = ProjectionIncrementale()
+        return st.session_state['_projection_incrementale']
+    except Exception:  # session_state inaccessible (exécution hors Streamlit)
+        return _PROJECTION_HORS_SESSION
+
+def projeter_foyer(foyer, settings, projection_duration, moteur=None, proprietaire=None):
+    """
+    Génère les données de projection financière année par année pour un instantané du foyer
+    (`core.foyer.FoyerSnapshot`), sans dépendre de Streamlit.
+    Chaque grandeur est calculée en une fois sur l'axe des années (tableaux NumPy, une valeur par
+    année), par groupes de colonnes (voir `GRAPHE_PROJECTION`). Avec un `moteur` conservé d'un
+    appel à l'autre (`ProjectionIncrementale`), seuls les groupes dont une entrée a changé sont
+    recalculés, et l'impôt des seules années concernées ; sans moteur, tout est calculé.
+    `df.attrs['provisoire']` est vrai si l'impôt de certaines années est une estimation forfaitaire
+    faute de calcul OpenFisca abouti : ce résultat ne doit pas être mis en cache.
+    `proprietaire` identifie la page qui a lancé le calcul de l'impôt (voir utils/openfisca_worker.py).
+    """
+    if moteur is None:
+        moteur = ProjectionIncrementale()
+    parents, enfants = foyer.parents, foyer.enfants
+    today = date.today()
+    annees = np.arange(today.year, today.year + projection_duration + 1)
+    nb_annees = len(annees)
+    ctx = {
+        'annees': annees,
+        'annee_debut': today.year,
+        'nb_annees': nb_annees,
+        'parents': parents,
+        'enfants': enfants,
+        'passifs': foyer.passifs,
+        'settings': settings,
+        'actifs': foyer.actifs,
+        'revenus': foyer.revenus,
+        'depenses': foyer.depenses,
+        'proprietaire': proprietaire,
+    }
+    sorties = moteur.calculer(ctx)
+
+    colonnes = {'Année': annees}
+    for nom, _, _, _ in GRAPHE_PROJECTION:
+        colonnes.update(sorties[nom]['colonnes'])
+    colonnes.update(sorties['prets']['crd'])
 
     # Définir l'ordre des colonnes principales pour l'affichage
     main_columns = ['Année']
@@ -323,14 +502,20 @@ def generate_financial_projection(parents, enfants, passifs, settings, projectio
         'Impôt sur le revenu', 'Prélèvements Sociaux', 'Reste à vivre'
     ])
 
-    # S'assurer que les colonnes principales existent
-    for col in main_columns:
-        if col not in df.columns:
-            df[col] = 0
-
     # Récupérer les autres colonnes (comme les CRD) qui ne sont pas dans les colonnes principales
-    other_columns = [col for col in df.columns if col not in main_columns]
+    other_columns = [col for col in colonnes if col not in main_columns]
 
-    # Combiner les listes pour le nouvel ordre final et réordonner le DataFrame
-    df = df[main_columns + other_columns]
+    # Construire le DataFrame une seule fois dans l'ordre final (colonnes principales absentes à 0)
+    ordre = main_columns + other_columns
+    df = pd.DataFrame({i: colonnes.get(col, np.zeros(nb_annees, dtype=int)) for i, col in enumerate(ordre)})
+    df.columns = ordre
+    df.attrs['provisoire'] = moteur.dernier_calcul_provisoire
     return df
+
+def generate_financial_projection(parents, enfants, passifs, settings, projection_duration, proprietaire=None):
+    """
+    Adaptateur Streamlit de `projeter_foyer` : le foyer est complété par les actifs, revenus et
+    dépenses du session_state, et le moteur incrémental de la session est réutilisé.
+    """
+    foyer = foyer_depuis_session(parents=parents, enfants=enfants, passifs=passifs)
+    return projeter_foyer(foyer, settings, projection_duration, moteur=get_projection_incrementale(), proprietaire=proprietaire)
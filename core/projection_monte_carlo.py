@@ -0,0 +1,161 @@
+# core/projection_monte_carlo.py
+"""
+Projection stochastique (Monte Carlo) du patrimoine net et du reste à vivre.
+
+Les flux annuels de la projection déterministe (`projeter_foyer` / `generate_financial_projection`)
+sont réindexés sur des trajectoires aléatoires d'inflation et de croissance des loyers, et
+l'épargne (reste à vivre) est capitalisée sur une allocation AV / PER / SCPI dont les rendements
+moyens sont ceux de `creer_parametres_defaut`. Toutes les trajectoires sont simulées en même
+temps sous forme de tableaux NumPy (trajectoires × années), sans boucle sur les années.
+"""
+
+import numpy as np
+import pandas as pd
+
+from core.optim_simulation_financiere import creer_parametres_defaut
+
+PERCENTILES_DEFAUT = (5, 25, 50, 75, 95)
+
+# Classes de rendement tirées conjointement (corrélation de `creer_hypotheses_monte_carlo`)
+_CLASSES = ('av', 'per', 'scpi', 'immobilier')
+
+def creer_hypotheses_monte_carlo(parametres=None):
+    """
+    Crée les hypothèses par défaut de la simulation Monte Carlo. Les rendements moyens de l'AV,
+    du PER et des SCPI (distribution + revalorisation) viennent de `parametres`
+    (par défaut `creer_parametres_defaut()`) ; les biens immobiliers se revalorisent au rythme des parts de SCPI.
+    """
+    if parametres is None:
+        parametres = creer_parametres_defaut()
+    return {
+        'rendement_av': parametres['taux_av'],
+        'rendement_per': parametres['taux_per'],
+        'rendement_scpi': parametres['taux_distribution_scpi'] + parametres['taux_appreciation_scpi'],
+        'rendement_immobilier': parametres['taux_appreciation_scpi'],
+        'volatilite_av': 0.06,
+        'volatilite_per': 0.12,
+        'volatilite_scpi': 0.05,
+        'volatilite_immobilier': 0.07,
+        'correlation': 0.4,
+        # Allocation de l'épargne et des actifs financiers existants
+        'allocation_av': 0.5,
+        'allocation_per': 0.3,
+        'allocation_scpi': 0.2,
+        'inflation': 0.02,
+        'volatilite_inflation': 0.01,
+        # Croissance des loyers : inflation de l'année + écart moyen, avec un bruit propre
+        'ecart_loyers_inflation': 0.0,
+        'volatilite_loyers': 0.015,
+    }
+
+def _rendements_correles(rng, hypotheses, nb_chemins, nb_annees):
+    """Rendements annuels log-normaux corrélés de chaque classe : tableau (classes × chemins × années)."""
+    moyennes = np.array([hypotheses[f'rendement_{c}'] for c in _CLASSES])
+    volatilites = np.array([hypotheses[f'volatilite_{c}'] for c in _CLASSES])
+    correlation = np.full((len(_CLASSES), len(_CLASSES)), hypotheses['correlation'])
+    np.fill_diagonal(correlation, 1.0)
+    # Log-rendement de moyenne ln(1 + r) - sigma²/2 : espérance du rendement simple égale à r
+    sigma = np.sqrt(np.log1p((volatilites / (1 + moyennes)) ** 2))
+    mu = np.log1p(moyennes) - sigma ** 2 / 2
+    chocs = np.linalg.cholesky(correlation) @ rng.standard_normal((len(_CLASSES), nb_chemins * nb_annees))
+    return np.expm1(mu[:, None] + sigma[:, None] * chocs).reshape(len(_CLASSES), nb_chemins, nb_annees)
+
+def _indice(taux):
+    """Indice cumulé (1 la première année) d'une série de taux annuels (chemins × années)."""
+    indice = np.ones_like(taux)
+    np.cumprod(1 + taux[:, 1:], axis=1, out=indice[:, 1:])
+    return indice
+
+def _bandes(valeurs, annees, percentiles):
+    """DataFrame des percentiles par année (colonnes 'Année', 'P5', 'P50', ...)."""
+    bandes = np.percentile(valeurs, percentiles, axis=0)
+    df = pd.DataFrame({f'P{p}': bandes[k] for k, p in enumerate(percentiles)})
+    df.insert(0, 'Année', annees)
+    return df
+
+def simuler_monte_carlo(df_projection, foyer, hypotheses=None, nb_chemins=10000, graine=None,
+                        percentiles=PERCENTILES_DEFAUT, euros_constants=False):
+    """
+    Simule `nb_chemins` trajectoires du patrimoine net et du reste à vivre sur les années de
+    `df_projection`.
+
+    - Revenus (hors loyers), dépenses courantes, coût des études et impôt suivent l'inflation ;
+      loyers perçus et prélèvements sociaux suivent la croissance des loyers ; les mensualités
+      de prêts restent nominales.
+    - Le reste à vivre de chaque année est épargné (ou prélevé) sur le portefeuille financier,
+      qui démarre aux « Actifs financiers » du foyer et suit l'allocation AV / PER / SCPI.
+    - Patrimoine net = portefeuille financier + biens immobiliers revalorisés + autres actifs
+      - capital restant dû des prêts (colonnes CRD_ de la projection).
+
+    Args:
+        df_projection (pd.DataFrame): Projection déterministe (une ligne par année).
+        foyer (FoyerSnapshot): Instantané du foyer (valeurs initiales des actifs).
+        hypotheses (dict, optional): Voir `creer_hypotheses_monte_carlo`.
+        nb_chemins (int): Nombre de trajectoires.
+        graine (int, optional): Graine du générateur aléatoire (résultats reproductibles).
+        percentiles (tuple): Percentiles des bandes retournées.
+        euros_constants (bool): Exprimer les montants en euros de la première année.
+
+    Returns:
+        dict: 'patrimoine_net' et 'reste_a_vivre' (DataFrames de bandes de percentiles),
+        'proba_annee_epargne_negative' (probabilité d'au moins une année de reste à vivre
+        négatif), 'proba_epargne_negative_par_annee' (tableau par année), 'nb_chemins', 'graine'.
+    """
+    if hypotheses is None:
+        hypotheses = creer_hypotheses_monte_carlo()
+    annees = df_projection['Année'].to_numpy()
+    nb_annees = len(annees)
+    rng = np.random.default_rng(graine)
+
+    def colonne(nom):
+        return df_projection[nom].to_numpy(dtype=float) if nom in df_projection.columns else np.zeros(nb_annees)
+
+    # --- 1. Trajectoires d'inflation, de loyers et de rendements (chemins × années) ---
+    inflation = hypotheses['inflation'] + hypotheses['volatilite_inflation'] * rng.standard_normal((nb_chemins, nb_annees))
+    croissance_loyers = inflation + hypotheses['ecart_loyers_inflation'] + hypotheses['volatilite_loyers'] * rng.standard_normal((nb_chemins, nb_annees))
+    indice_prix = _indice(inflation)
+    indice_loyers = _indice(croissance_loyers)
+    rendements = _rendements_correles(rng, hypotheses, nb_chemins, nb_annees)
+    rendements_av, rendements_per, rendements_scpi, rendements_immobilier = rendements
+
+    # --- 2. Reste à vivre de chaque trajectoire ---
+    loyers = colonne('Loyers perçus')
+    revenus_indexes = colonne('Revenus du foyer') - loyers
+    depenses_indexees = colonne('Charges Immobilières') + colonne('Taxes Foncières') + colonne('Autres Dépenses') + colonne('Coût des études') + colonne('Impôt sur le revenu')
+    reste_a_vivre = (
+        (revenus_indexes - depenses_indexees) * indice_prix
+        + (loyers - colonne('Prélèvements Sociaux')) * indice_loyers
+        - colonne('Mensualités Prêts')
+    )
+
+    # --- 3. Portefeuille financier : W_t = W_{t-1} (1 + r_t) + S_t, sous forme fermée ---
+    rendement_portefeuille = (
+        hypotheses['allocation_av'] * rendements_av
+        + hypotheses['allocation_per'] * rendements_per
+        + hypotheses['allocation_scpi'] * rendements_scpi
+    )
+    croissance = np.cumprod(1 + rendement_portefeuille, axis=1)
+    financier_initial = sum(a.get('valeur', 0) for a in foyer.actifs if a.get('type') == 'Actifs financiers')
+    portefeuille = croissance * (financier_initial + np.cumsum(reste_a_vivre / croissance, axis=1))
+
+    # --- 4. Patrimoine net ---
+    immobilier_initial = sum(a.get('valeur', 0) for a in foyer.actifs if a.get('type') in ('Immobilier productif', 'Immobilier de jouissance'))
+    autres_actifs = sum(a.get('valeur', 0) for a in foyer.actifs if a.get('type') == 'Autres actifs')
+    immobilier = immobilier_initial * np.cumprod(1 + rendements_immobilier, axis=1)
+    colonnes_crd = [c for c in df_projection.columns if c.startswith('CRD_')]
+    crd = df_projection[colonnes_crd].to_numpy(dtype=float).sum(axis=1) if colonnes_crd else np.zeros(nb_annees)
+    patrimoine_net = portefeuille + immobilier + autres_actifs - crd
+
+    if euros_constants:
+        patrimoine_net /= indice_prix
+        reste_a_vivre /= indice_prix
+
+    epargne_negative = reste_a_vivre < 0
+    return {
+        'patrimoine_net': _bandes(patrimoine_net, annees, percentiles),
+        'reste_a_vivre': _bandes(reste_a_vivre, annees, percentiles),
+        'proba_annee_epargne_negative': float(epargne_negative.any(axis=1).mean()),
+        'proba_epargne_negative_par_annee': epargne_negative.mean(axis=0),
+        'nb_chemins': nb_chemins,
+        'graine': graine,
+    }
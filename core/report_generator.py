@@ -24,7 +24,8 @@ except ImportError:
     DOCX_AVAILABLE = False
 
 # --- Fonctions de base du projet ---
-from .patrimoine_logic import get_patrimoine_df, find_associated_loans
+from .patrimoine_logic import get_patrimoine_df
+from .entity_store import get_entity_store
 from .charts import (
     create_patrimoine_brut_treemap,
     create_patrimoine_net_donut,
@@ -264,12 +265,13 @@ def add_immo_focus_section(pdf, actifs, passifs, tmi, projection_duration, funcs
         pdf.chapter_body("Le module d'analyse immobilière n'est pas disponible.")
         return
 
+    store = get_entity_store(actifs, passifs)
     for asset in productive_assets:
         if asset.get('loyers_mensuels') is None: continue
         pdf.set_font(pdf.font_family_name, 'B', 12)
         pdf.cell(0, 10, f"Analyse de : {asset.get('libelle', 'Sans nom')}", 0, 1, 'L')
         pdf.ln(2)
-        loans = find_associated_loans(asset.get('id'), passifs)
+        loans = store.prets_associes(asset.get('id'))
         df_projection = funcs['generate_immo_projection_data'](asset, loans, tmi, 17.2, projection_duration)
         if df_projection.empty: continue
         
@@ -467,11 +469,12 @@ def generate_word_report_safe(selections, parents, enfants, actifs, passifs, rev
             if not productive_assets:
                 document.add_paragraph("Aucun bien immobilier productif n'a été renseigné.")
             else:
+                store = get_entity_store(actifs, passifs)
                 for asset in productive_assets:
                     if asset.get('loyers_mensuels') is None: continue
                     document.add_heading(f"Analyse de : {asset.get('libelle', 'Sans nom')}", level=2)
                     
-                    metrics = funcs['calculate_property_metrics'](asset, passifs, settings['immo_tmi'], 17.2, date.today().year)
+                    metrics = funcs['calculate_property_metrics'](asset, passifs, settings['immo_tmi'], 17.2, date.today().year, store=store)
                     
                     p = document.add_paragraph()
                     p.add_run('Rentabilité Brute: ').bold = True
@@ -489,7 +492,7 @@ def generate_word_report_safe(selections, parents, enfants, actifs, passifs, rev
                     fig_waterfall = funcs['_create_waterfall_fig'](metrics, date.today().year, is_lmnp=is_lmnp)
                     add_word_figure(document, fig_waterfall)
 
-                    df_projection = funcs['generate_immo_projection_data'](asset, find_associated_loans(asset.get('id'), passifs), settings['immo_tmi'], 17.2, settings['immo_projection_duration'])
+                    df_projection = funcs['generate_immo_projection_data'](asset, store.prets_associes(asset.get('id')), settings['immo_tmi'], 17.2, settings['immo_projection_duration'])
                     if not df_projection.empty:
                         document.add_heading(f"Projections sur {settings['immo_projection_duration']} ans", level=3)
                         fig_cf = funcs['create_cash_flow_projection_fig'](df_projection)
@@ -4,6 +4,7 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from scipy.optimize import fsolve
+from core.loan_schedule import compute_amortization
 
 st.set_page_config(page_title="Analyse SCPI à Crédit", layout="wide")
 
@@ -70,23 +71,20 @@ with st.sidebar:
                                    options=type_differe_options,
                                    index=type_differe_index)
     
-    # Calcul des mensualités
-    taux_mensuel = taux_interet / 100 / 12
+    # Tableau d'amortissement mensuel (différé compris dans la durée de l'emprunt)
     nb_mensualites = duree_emprunt * 12
-    
-    if taux_mensuel > 0:
-        mensualite_hors_assurance = montant_finance * (taux_mensuel * (1 + taux_mensuel)**nb_mensualites) / ((1 + taux_mensuel)**nb_mensualites - 1)
-    else:
-        mensualite_hors_assurance = montant_finance / nb_mensualites
-    
+    echeancier = compute_amortization(
+        montant_finance, taux_interet / 100, nb_mensualites, insurance_rate=taux_assurance / 100,
+        deferral_months=nb_mois_differe, deferral_type='total' if type_differe == "Différé total" else 'partiel'
+    )
+    mensualites_totales = echeancier['payment'] + echeancier['insurance']
+
+    mensualite_hors_assurance = echeancier['monthly_payment']
     mensualite_assurance = montant_finance * taux_assurance / 100 / 12
     mensualite_avec_assurance = mensualite_hors_assurance + mensualite_assurance
     
-    # Calcul de la mensualité pendant le différé (si différé partiel)
-    if type_differe == "Différé partiel":
-        mensualite_differe = mensualite_assurance  # Seulement assurance pendant le différé
-    else:
-        mensualite_differe = 0  # Aucun remboursement pendant le différé total
+    # Mensualité pendant le différé : intérêts et assurance (partiel) ou assurance seule (total)
+    mensualite_differe = mensualites_totales[0] if nb_mois_differe > 0 and nb_mensualites > 0 else 0
     
     # Affichage des mensualités dans un expander
     with st.expander("💰 **Détail des mensualités**", expanded=False):
@@ -139,15 +137,15 @@ st.session_state.scpi_credit_parameters = {
 if 'tmi' in locals() and 'charges_sociales' in locals():
     # Calcul du tableau d'amortissement
     data = []
-    capital_restant = montant_finance
     dividende_annuel = dividende_net / 100 * montant
     deficit_foncier_reporte = 0  # Pour gérer le report de déficit foncier
     
     for annee in range(1, min(si_revente_ans + 1, duree_emprunt + 1)):  # S'arrêter à l'année de revente
-        # Calculs pour l'année
-        interets_annuels = 0
-        amortissement_annuel = 0
-        capital_restant_temp = capital_restant
+        # Mois de l'année dans l'échéancier
+        mois_annee = slice((annee - 1) * 12, annee * 12)
+        interets_annuels = echeancier['interest'][mois_annee].sum()
+        assurance_annuelle = echeancier['insurance'][mois_annee].sum()
+        capital_restant = echeancier['crd'][annee * 12 - 1]
         
         # Dividende effectif en fonction du délai de jouissance
         if annee == 1 and delai_jouissance > 0:
@@ -157,35 +155,8 @@ if 'tmi' in locals() and 'charges_sociales' in locals():
         else:
             dividende_annuel_effectif = dividende_annuel
         
-        for mois in range(12):
-            if capital_restant_temp > 0:
-                # Gestion du différé
-                est_en_differe = (annee == 1 and mois < nb_mois_differe)
-                
-                if est_en_differe:
-                    # Pendant le différé
-                    interet_mois = capital_restant_temp * taux_mensuel
-                    if type_differe == "Différé partiel":
-                        # Différé partiel : on paye seulement l'assurance
-                        amortissement_mois = 0
-                    else:
-                        # Différé total : on ne paye rien, les intérêts s'ajoutent au capital
-                        amortissement_mois = -interet_mois  # Les intérêts s'ajoutent au capital
-                        interet_mois = 0  # Pas de paiement d'intérêts pendant le différé total
-                else:
-                    # Fonctionnement normal
-                    interet_mois = capital_restant_temp * taux_mensuel
-                    amortissement_mois = mensualite_hors_assurance - interet_mois
-                
-                interets_annuels += interet_mois
-                amortissement_annuel += amortissement_mois
-                capital_restant_temp -= amortissement_mois
-                
-                if capital_restant_temp < 0:
-                    capital_restant_temp = 0
-        
         # Calculs fiscaux et de rentabilité
-        charges_deductibles = interets_annuels + charges + mensualite_assurance * 12
+        charges_deductibles = interets_annuels + charges + assurance_annuelle
         bilan_foncier_annuel = dividende_annuel_effectif - charges_deductibles
         
         # Gestion du déficit foncier avec report
@@ -219,19 +190,8 @@ if 'tmi' in locals() and 'charges_sociales' in locals():
         
         dividende_net_apres_fiscalite = dividende_annuel_effectif + impact_fiscal
         
-        # Calcul de la mensualité annuelle effective selon le différé
-        if annee == 1 and nb_mois_differe > 0:
-            # Première année avec différé
-            mois_normaux = 12 - nb_mois_differe
-            if type_differe == "Différé partiel":
-                # Différé partiel : assurance pendant le différé + mensualité normale après
-                mensualite_annuelle_effective = (mensualite_differe * nb_mois_differe) + (mensualite_avec_assurance * mois_normaux)
-            else:
-                # Différé total : rien pendant le différé + mensualité normale après
-                mensualite_annuelle_effective = mensualite_avec_assurance * mois_normaux
-        else:
-            # Années normales
-            mensualite_annuelle_effective = mensualite_avec_assurance * 12
+        # Mensualités effectivement payées sur l'année (différé et fin du prêt compris)
+        mensualite_annuelle_effective = mensualites_totales[mois_annee].sum()
         
         # Rentabilité (sur le montant total incluant frais d'entrée)
         rentabilite_locative = (dividende_net_apres_fiscalite / montant) * 100
@@ -253,7 +213,7 @@ if 'tmi' in locals() and 'charges_sociales' in locals():
             'Année': annee,
             'Mensualité annuelle': int(mensualite_annuelle_effective),
             'Montant dividende brut': int(dividende_annuel_effectif),
-            'Intérêts + ADI': int(interets_annuels + mensualite_assurance * 12),
+            'Intérêts + ADI': int(interets_annuels + assurance_annuelle),
             'Charges déductibles': int(charges_deductibles),
             'Bilan foncier': int(bilan_foncier_total),
             'Impact fiscal': int(impact_fiscal),
@@ -264,11 +224,9 @@ if 'tmi' in locals() and 'charges_sociales' in locals():
             'Cumul effort épargne': 0,  # Sera calculé après création du DataFrame
             'Effort d\'épargne mensuel': int(effort_epargne_mensuel),
             'Valeur parts': int(valeur_parts_potentielle),
-            'CRD': int(capital_restant_temp),
+            'CRD': int(capital_restant),
             'Flux TRI': int(flux_tri_annuel)
         })
-        
-        capital_restant = capital_restant_temp
     
     # Création du DataFrame
     df_amortissement = pd.DataFrame(data)
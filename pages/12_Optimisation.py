@@ -27,6 +27,7 @@ try:
         afficher_details_complementaires,
         afficher_detail_complet_parametres
     )
+    from core.fiscal_logic import estimate_marginal_tax_rate
     from core.tri_patch import afficher_metriques_principales_avec_tri, afficher_tableau_flux_recapitulatif
     from core.optim_calculations import (
         calculer_donnees_tableau_actifs,
@@ -65,6 +66,11 @@ try:
             parent = st.session_state.parents[0]
             if 'tmi' in parent:
                 st.session_state.optim_params['tmi'] = parent.get('tmi', 30) / 100  # Conversion en décimal
+            else:
+                # TMI estimée à partir des revenus du foyer (barème de l'année courante)
+                tmi_estimee = estimate_marginal_tax_rate()
+                if tmi_estimee is not None:
+                    st.session_state.optim_params['tmi'] = tmi_estimee
                 
         st.success("✅ Simulateur d'optimisation initialisé avec succès")
     
@@ -190,6 +196,23 @@ with st.expander("ℹ️ À propos de l'optimisation"):
 
 # --- Debug et informations techniques ---
 if st.checkbox("🔧 Mode développeur"):
+    evaluations = (st.session_state.optim_dernier_resultat or {}).get('evaluations')
+    if evaluations:
+        st.markdown("### Évaluations de la dernière optimisation")
+        methode = st.session_state.optim_dernier_resultat.get('methode', 'slsqp')
+        appels = evaluations['objectif'] + evaluations['contrainte_effort'] + evaluations['contrainte_mensualite']
+        col_methode, col_programmes, col_appels, col_simulations = st.columns(4)
+        col_methode.metric("Méthode", "Programme linéaire" if methode == 'lineaire' else "SLSQP")
+        col_programmes.metric("Programmes linéaires résolus", evaluations.get('programmes_lineaires', 0))
+        col_appels.metric("Appels objectif + contraintes", appels)
+        col_simulations.metric("Simulations exécutées", evaluations['simulations'])
+        if appels:
+            st.caption(
+                f"Objectif : {evaluations['objectif']} · contrainte d'effort : {evaluations['contrainte_effort']} · "
+                f"contrainte de mensualité : {evaluations['contrainte_mensualite']} · "
+                f"jacobiens : {evaluations.get('jacobiens', 0)} · "
+                f"simulations évitées : {max(0, appels - evaluations['simulations'])}"
+            )
     st.markdown("### État du session state (simulateur)")
     debug_keys = [k for k in st.session_state.keys() if any(x in k.lower() for x in ['optim_', 'dernier_', 'activer_'])]
     for key in debug_keys:
@@ -19,7 +19,6 @@ from core.patrimoine_logic import (
     calculate_property_tax,
     calculate_net_yield_tax,
     calculate_savings_effort,
-    find_associated_loans,
     calculate_loan_annual_breakdown,
     calculate_lmnp_amortissement_annuel
 ) 
@@ -34,8 +33,9 @@ from core.immobilier_charts import (
     create_amortissement_projection_fig,
     create_non_productive_waterfall_fig
 ) 
+from core.entity_store import get_entity_store
 
-def display_property_analysis(asset, metrics, passifs, tmi, social_tax, projection_duration, selected_year):
+def display_property_analysis(asset, metrics, passifs, tmi, social_tax, projection_duration, selected_year, store):
     """Affiche les métriques de rentabilité pré-calculées pour un bien immobilier."""
 
     with st.expander(f"Analyse de : {asset.get('libelle', 'Sans nom')} (Année {selected_year})", expanded=True):
@@ -111,7 +111,7 @@ def display_property_analysis(asset, metrics, passifs, tmi, social_tax, projecti
             )
 
         # --- Projections ---
-        loans = find_associated_loans(asset.get('id'), passifs)
+        loans = store.prets_associes(asset.get('id'))
         df_projection = generate_projection_data(asset, loans, tmi, social_tax, projection_duration)
         if not df_projection.empty:
             display_projection_charts(df_projection, projection_duration)
@@ -123,11 +123,11 @@ def display_property_analysis(asset, metrics, passifs, tmi, social_tax, projecti
                 fig_amortissement = create_amortissement_projection_fig(df_projection)
                 st.plotly_chart(fig_amortissement, use_container_width=True)
 
-def display_non_productive_analysis(asset, passifs, selected_year):
+def display_non_productive_analysis(asset, passifs, selected_year, store):
     """Affiche l'analyse du coût de possession pour un bien de jouissance pour une année donnée."""
     with st.expander(f"Analyse de : {asset.get('libelle', 'Sans nom')} (Année {selected_year})", expanded=True):
         # 1. Trouver le prêt associé
-        loans = find_associated_loans(asset.get('id'), passifs)
+        loans = store.prets_associes(asset.get('id'))
 
         # 2. Calculer les coûts annuels
         charges_annuelles = asset.get('charges', 0) * 12
@@ -176,7 +176,7 @@ def display_non_productive_analysis(asset, passifs, selected_year):
         # --- Graphique en cascade ---
         st.markdown("---")
         
-        fig = create_non_productive_waterfall_fig(asset, passifs, selected_year)
+        fig = create_non_productive_waterfall_fig(asset, passifs, selected_year, store=store)
         st.plotly_chart(fig, use_container_width=True)
 
 def display_projection_charts(df_projection, projection_duration):
@@ -254,6 +254,8 @@ st.markdown("---")
 
 # --- Affichage par bien ---
 passifs = st.session_state.get('passifs', [])
+# Magasin d'entités synchronisé une fois pour tous les biens de la page
+store = get_entity_store(passifs=passifs)
 
 
 if productive_assets:
@@ -261,8 +263,8 @@ if productive_assets:
     for asset in productive_assets:
         # Vérifier que les données nécessaires sont présentes
         if asset.get('loyers_mensuels') is not None:
-            metrics = calculate_property_metrics(asset, passifs, st.session_state.immo_tmi, social_tax, selected_year)
-            display_property_analysis(asset, metrics, passifs, st.session_state.immo_tmi, social_tax, projection_duration, selected_year)
+            metrics = calculate_property_metrics(asset, passifs, st.session_state.immo_tmi, social_tax, selected_year, store=store)
+            display_property_analysis(asset, metrics, passifs, st.session_state.immo_tmi, social_tax, projection_duration, selected_year, store)
         else:
             st.warning(f"Les données de loyers pour **{asset.get('libelle')}** ne sont pas renseignées dans la page Patrimoine.")
 
@@ -272,4 +274,4 @@ if non_productive_assets:
     st.subheader("Biens Immobiliers de Jouissance")
     st.info("Cette section affiche les biens qui ne génèrent pas de revenus locatifs, comme votre résidence principale. Le graphique ci-dessous détaille le coût de possession annuel.")
     for asset in non_productive_assets:
-        display_non_productive_analysis(asset, passifs, selected_year)
\ No newline at end of file
+        display_non_productive_analysis(asset, passifs, selected_year, store)
\ No newline at end of file
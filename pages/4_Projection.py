@@ -6,6 +6,8 @@ from core.projection_logic import (
     generate_financial_projection,
     OPENFISCA_UTILITY_AVAILABLE
 )
+from utils.openfisca_worker import proprietaire_page
+from core.projection_cache import PROJECTION_CACHE, cle_projection
 from core.projection_display import (
     display_settings_ui,
     display_gantt_chart,
@@ -14,7 +16,8 @@ from core.projection_display import (
     display_projection_chart,
     display_annual_tax_chart,
     display_cumulative_tax_at_retirement,
-    display_retirement_transition_analysis
+    display_retirement_transition_analysis,
+    display_monte_carlo_projection
 )
 
 # --- Exécution Principale ---
@@ -78,29 +81,23 @@ display_gantt_chart(gantt_data, duree_projection, parents, enfants)
 if st.session_state.projection_calculated:
     passifs = st.session_state.get('passifs', [])
     
-    # Créer une clé de cache basée sur les paramètres
-    import json
-    cache_key = json.dumps({
-        'duree_projection': duree_projection,
-        'settings': settings,
-        'passifs_count': len(passifs),
-        'parents_count': len(parents),
-        'enfants_count': len(enfants)
-    }, sort_keys=True)
+    # Clé de cache : empreinte de toutes les entrées lues par la projection
+    cache_key = cle_projection(
+        parents, enfants, passifs, st.session_state.get('actifs', []),
+        st.session_state.get('revenus', []), st.session_state.get('depenses', []),
+        settings, duree_projection
+    )
     
-    # Vérifier si les données de projection sont déjà en cache
-    if ('projection_cache_key' not in st.session_state or 
-        st.session_state.projection_cache_key != cache_key or
-        'df_projection' not in st.session_state):
-        
-        # Recalculer seulement si nécessaire
+    # Recalculer seulement si ce scénario n'est pas parmi les projections récentes
+    df_projection = PROJECTION_CACHE.get(cache_key)
+    if df_projection is None:
         with st.spinner("🔄 Calcul de la projection financière en cours..."):
-            df_projection = generate_financial_projection(parents, enfants, passifs, settings, duree_projection)
-            st.session_state.df_projection = df_projection
-            st.session_state.projection_cache_key = cache_key
-    else:
-        # Utiliser les données en cache
-        df_projection = st.session_state.df_projection
+            df_projection = generate_financial_projection(parents, enfants, passifs, settings, duree_projection, proprietaire=proprietaire_page('4_Projection'))
+        # Une projection dont l'impôt est une estimation provisoire n'est pas partagée : elle sera recalculée
+        if not df_projection.attrs.get('provisoire'):
+            PROJECTION_CACHE.put(cache_key, df_projection)
+    st.session_state.df_projection = df_projection
+    st.session_state.projection_cache_key = cache_key
 
     st.header("📈 Projection Financière Annuelle")
     if not OPENFISCA_UTILITY_AVAILABLE:
@@ -110,6 +107,11 @@ if st.session_state.projection_calculated:
             f"**Erreur technique :** `{error_msg}`\n\n"
             "Pour un calcul précis, assurez-vous que le package `openfisca-france` est bien installé dans votre environnement."
         )
+    elif df_projection.attrs.get('provisoire'):
+        st.warning(
+            "**Le calcul OpenFisca de l'impôt n'a pas abouti** (délai dépassé ou processus interrompu) : l'impôt de certaines "
+            "années est une estimation forfaitaire (15 %). La projection sera recalculée au prochain affichage."
+        )
 
     if df_projection.empty:
         st.info("Aucune donnée de projection financière à afficher.")
@@ -133,6 +135,10 @@ if st.session_state.projection_calculated:
         st.header("🔎 Focus Emprunts")
         display_loan_crd_chart(df_projection, passifs)
 
+        st.markdown("---")
+        st.header("🎲 Projection stochastique (Monte Carlo)")
+        display_monte_carlo_projection(df_projection)
+
 else:
     st.info("👈 Cliquez sur le bouton **'Calculer la Projection'** dans la barre latérale pour afficher la projection financière.")
     
@@ -11,6 +11,7 @@ import plotly.figure_factory as ff
 import importlib
 
 from core.report_generator import generate_report_safe, generate_word_report_safe
+from utils import fiscalite
 
 # --- Vérification de la disponibilité des modules et fonctions ---
 
@@ -38,12 +39,18 @@ generate_financial_projection, _ = import_from("4_Projection", "generate_financi
 # create_gantt_chart_fig, _ = import_from("4_Projection", "create_gantt_chart_fig")
 
 get_revenus_imposables_fiscalite, FOCUS_FISCALITE_AVAILABLE = import_from("8_Focus_Fiscalite", "get_revenus_imposables")
-analyser_fiscalite_foyer_fiscalite, _ = import_from("8_Focus_Fiscalite", "analyser_fiscalite_foyer")
-simuler_evolution_fiscalite, _ = import_from("8_Focus_Fiscalite", "simuler_evolution_fiscalite")
 display_income_evolution_chart, _ = import_from("8_Focus_Fiscalite", "display_income_evolution_chart")
+create_base_tax_evolution_fig_per, OPTIMISATION_PER_AVAILABLE = import_from("9_Optimisation_PER", "create_base_tax_evolution_fig")
 
-analyser_optimisation_per, OPTIMISATION_PER_AVAILABLE = import_from("9_Optimisation_PER", "analyser_optimisation_per")
-create_base_tax_evolution_fig_per, _ = import_from("9_Optimisation_PER", "create_base_tax_evolution_fig")
+# Calculs fiscaux : résolus par la façade utils.fiscalite au premier appel
+def analyser_fiscalite_foyer_fiscalite(*args, **kwargs):
+    return fiscalite.analyser_fiscalite_foyer(*args, **kwargs)
+
+def simuler_evolution_fiscalite(*args, **kwargs):
+    return fiscalite.simuler_evolution_fiscalite(*args, **kwargs)
+
+def analyser_optimisation_per(*args, **kwargs):
+    return fiscalite.analyser_optimisation_per(*args, **kwargs)
 
 # --- Vérification des dépendances critiques ---
 try:
@@ -52,11 +59,7 @@ try:
 except ImportError:
     FPDF_AVAILABLE = False
 
-try:
-    from utils.openfisca_utils import analyser_fiscalite_foyer
-    OPENFISCA_AVAILABLE = True
-except ImportError:
-    OPENFISCA_AVAILABLE = False
+OPENFISCA_AVAILABLE = fiscalite.OPENFISCA_READY
 
 # --- Sidebar pour le format ---
 st.sidebar.header("Format du Rapport")
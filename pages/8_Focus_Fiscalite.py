@@ -15,8 +15,13 @@ if project_root not in sys.path:
 from core.fiscal_logic import get_revenus_imposables
 
 try:
-    from utils.openfisca_utils import analyser_fiscalite_foyer, simuler_evolution_fiscalite, add_bracket_lines_to_fig
-    OPENFISCA_UTILITY_AVAILABLE = True
+    from utils.openfisca_utils import add_bracket_lines_to_fig
+    from utils.openfisca_worker import executer_tache, proprietaire_page
+    from utils import fiscalite
+    # Sonde sans import d'OpenFisca : le paquet n'est chargé qu'au premier calcul
+    OPENFISCA_UTILITY_AVAILABLE = fiscalite.OPENFISCA_READY
+    if not OPENFISCA_UTILITY_AVAILABLE:
+        st.session_state.openfisca_import_error = "Le paquet openfisca-france n'est pas installé."
 except ImportError as e:
     OPENFISCA_UTILITY_AVAILABLE = False
     st.session_state.openfisca_import_error = str(e)
@@ -210,9 +215,12 @@ revenu_max_graphique = st.sidebar.number_input(
 )
 
 # --- Lancement de l'analyse ---
+# Calculs confiés aux processus OpenFisca : la page affiche leur progression au lieu de se figer
+proprietaire = proprietaire_page('8_Focus_Fiscalite')
 with st.spinner("Analyse de la fiscalité en cours avec OpenFisca..."):
     try:
-        resultats_fiscaux = analyser_fiscalite_foyer(
+        resultats_fiscaux = executer_tache(
+            'foyer', message="Analyse du foyer", proprietaire=proprietaire,
             annee=annee_simulation,
             parents=parents,
             enfants=enfants,
@@ -222,7 +230,8 @@ with st.spinner("Analyse de la fiscalité en cours avec OpenFisca..."):
         )
 
         # Lancer la simulation pour le graphique
-        df_evolution, bareme = simuler_evolution_fiscalite(
+        df_evolution, bareme = executer_tache(
+            'evolution', message="Évolution de l'impôt selon le revenu", proprietaire=proprietaire,
             annee=annee_simulation, parents=parents, enfants=enfants,
             revenu_foncier_net=revenu_foncier_net, est_parent_isole=est_parent_isole,
             revenu_max_simu=revenu_max_graphique
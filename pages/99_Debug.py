@@ -8,11 +8,17 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+from core.projection_cache import PROJECTION_CACHE
 
 try:
     # Tentative d'import de la fonction à tester
     from utils.openfisca_utils import calculer_impot_openfisca
-    OPENFISCA_UTILITY_AVAILABLE = True
+    from utils.openfisca_worker import OPENFISCA_WORKERS
+    from utils import fiscalite
+    # Sonde sans import d'OpenFisca : le paquet n'est chargé qu'au premier calcul
+    OPENFISCA_UTILITY_AVAILABLE = fiscalite.OPENFISCA_READY
+    if not OPENFISCA_UTILITY_AVAILABLE:
+        st.session_state.openfisca_import_error = "Le paquet openfisca-france n'est pas installé."
 except ImportError as e:
     OPENFISCA_UTILITY_AVAILABLE = False
     # Store the specific error for more informative messages
@@ -42,6 +48,61 @@ st.write("---")
 # --- Section de test pour la fonction de calcul d'impôt ---
 st.header("🧪 Test du calcul d'impôt (OpenFisca)")
 
+if OPENFISCA_UTILITY_AVAILABLE:
+    # Les simulations s'exécutent dans les processus de travail : leurs compteurs sont demandés à l'un d'eux
+    stats_processus = OPENFISCA_WORKERS.stats_processus()
+    if stats_processus is None:
+        st.info("Les processus OpenFisca sont occupés ou en cours de démarrage : compteurs du système, du cache et du pool de simulations indisponibles.")
+    else:
+        if OPENFISCA_WORKERS.nb_processus > 0:
+            st.caption(f"Compteurs du processus de travail {stats_processus['pid']}" + (f" (un des {OPENFISCA_WORKERS.nb_processus} processus)" if OPENFISCA_WORKERS.nb_processus > 1 else ""))
+        build_seconds = stats_processus['systeme'].get('build_seconds')
+        warmup_seconds = stats_processus['systeme'].get('warmup_seconds')
+        col_build, col_warmup = st.columns(2)
+        col_build.metric("Construction du système OpenFisca", f"{build_seconds:.2f} s" if build_seconds is not None else "Non construit")
+        col_warmup.metric("Préchauffage (construction + premier calcul)", f"{warmup_seconds:.2f} s" if warmup_seconds is not None else "En cours")
+
+        cache_stats = stats_processus['cache']
+        col_size, col_hits, col_misses, col_rate = st.columns(4)
+        col_size.metric("Résultats fiscaux en cache", f"{cache_stats['size']} / {cache_stats['maxsize']}", help="Niveau SQLite persistant actif" if cache_stats['persistent'] else "Cache en mémoire uniquement")
+        col_hits.metric("Succès (mémoire + disque)", f"{cache_stats['hits']} + {cache_stats['disk_hits']}")
+        col_misses.metric("Échecs (simulations lancées)", cache_stats['misses'])
+        col_rate.metric("Taux de succès", f"{cache_stats['hit_rate'] * 100:.0f} %")
+
+        pool_stats = stats_processus['pool']
+        col_formes, col_builds, col_reuses = st.columns(3)
+        col_formes.metric("Formes de foyer en pool", f"{pool_stats['formes']} ({pool_stats['simulations']} simulations)")
+        col_builds.metric("Simulations construites", pool_stats['builds'])
+        col_reuses.metric("Simulations réutilisées", pool_stats['reuses'])
+
+    worker_stats = OPENFISCA_WORKERS.stats()
+    col_processus, col_en_cours, col_soumises, col_dedup = st.columns(4)
+    col_processus.metric("Processus OpenFisca", worker_stats['processus'] or "Aucun (thread du script)")
+    col_en_cours.metric("Tâches en cours", worker_stats['en_cours'])
+    col_soumises.metric("Tâches soumises", worker_stats['soumises'])
+    col_dedup.metric("Tâches partagées / annulées", f"{worker_stats['dedupliquees']} / {worker_stats['annulees']}")
+
+projection_stats = PROJECTION_CACHE.stats()
+col_proj_size, col_proj_hits, col_proj_misses, col_proj_rate = st.columns(4)
+col_proj_size.metric("Projections en cache", f"{projection_stats['size']} / {projection_stats['maxsize']}")
+col_proj_hits.metric("Projections réutilisées", projection_stats['hits'])
+col_proj_misses.metric("Projections calculées", projection_stats['misses'])
+col_proj_rate.metric("Taux de succès (projections)", f"{projection_stats['hit_rate'] * 100:.0f} %")
+
+projection_incrementale = st.session_state.get('_projection_incrementale')
+if projection_incrementale is not None and projection_incrementale.dernier_rapport:
+    st.subheader("Dernier calcul de la projection (groupes de colonnes)")
+    st.caption(f"{projection_incrementale.nb_calculs} calcul(s) de projection dans cette session")
+    st.dataframe([
+        {
+            'Groupe': ligne['groupe'],
+            'Recalculé': "✅" if ligne['recalcule'] else "—",
+            'Version': ligne['version'],
+            'Détail': ligne['detail'],
+        }
+        for ligne in projection_incrementale.dernier_rapport
+    ], hide_index=True)
+
 if not OPENFISCA_UTILITY_AVAILABLE:
     error_msg = st.session_state.get('openfisca_import_error', "Erreur inconnue.")
     st.error(
@@ -96,4 +157,25 @@ else:
                     "revenus_annuels": test_revenus,
                     "revenu_foncier_net": test_revenu_foncier_net,
                     "est_parent_isole": test_parent_isole
-                })
\ No newline at end of file
+                })
+st.write("---")
+
+# --- Validation du noyau NumPy de l'impôt sur le revenu ---
+st.header("🧮 Validation du noyau IR vectorisé")
+
+if not OPENFISCA_UTILITY_AVAILABLE:
+    st.info("La validation nécessite OpenFisca comme référence.")
+else:
+    st.markdown("Compare `utils.bareme_ir` à `analyser_fiscalite_foyer` sur une grille de salaires et de compositions de foyer.")
+    col_annee, col_points = st.columns(2)
+    validation_annee = col_annee.number_input("Année des paramètres", min_value=2015, max_value=date.today().year + 10, value=date.today().year, key="validation_ir_annee")
+    validation_points = col_points.number_input("Points de salaire par composition", min_value=2, max_value=50, value=8, key="validation_ir_points")
+    if st.button("Lancer la validation"):
+        from utils.bareme_ir import valider_contre_openfisca, get_parametres_ir
+        with st.spinner("Simulations OpenFisca de référence en cours..."):
+            validation = valider_contre_openfisca(annee=int(validation_annee), nb_points_salaire=int(validation_points))
+        ecart_max = validation['ecart_max']
+        (st.success if ecart_max < 1 else st.warning)(f"**Écart maximal : {ecart_max:,.2f} €** sur {validation['nb_points']} foyers simulés")
+        with st.expander("Paramètres extraits et détail des points"):
+            st.json(get_parametres_ir(int(validation_annee)).to_dict())
+            st.dataframe(validation['details'])
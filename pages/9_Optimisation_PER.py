@@ -15,8 +15,13 @@ if project_root not in sys.path:
 from core.fiscal_logic import get_revenus_imposables
 
 try:
-    from utils.openfisca_utils import analyser_optimisation_per, add_bracket_lines_to_fig
-    OPENFISCA_UTILITY_AVAILABLE = True
+    from utils.openfisca_utils import add_bracket_lines_to_fig, evaluer_surface_per
+    from utils.openfisca_worker import executer_tache, proprietaire_page
+    from utils import fiscalite
+    # Sonde sans import d'OpenFisca : le paquet n'est chargé qu'au premier calcul
+    OPENFISCA_UTILITY_AVAILABLE = fiscalite.OPENFISCA_READY
+    if not OPENFISCA_UTILITY_AVAILABLE:
+        st.session_state.openfisca_import_error = "Le paquet openfisca-france n'est pas installé."
 except ImportError as e:
     OPENFISCA_UTILITY_AVAILABLE = False
     st.session_state.openfisca_import_error = str(e)
@@ -356,6 +361,36 @@ def display_per_effect_tab(results, salary, plafond_PER, ir_residuel_min):
     fig_eco.update_layout(title="Économie d'impôt en fonction du versement PER", xaxis_ticksuffix='€', yaxis_ticksuffix='€')
     st.plotly_chart(fig_eco, use_container_width=True)
 
+def display_salary_change_tab(results, salary, plafond_PER):
+    """Affiche l'onglet 'Et si mon salaire change ?' à partir de la surface salaire × versement PER."""
+    surface = results.get('surface_per')
+    if not surface:
+        st.info("La surface d'impôt salaire × versement PER n'est pas disponible.")
+        return
+
+    st.subheader("Et si mon salaire change ?")
+    st.caption("Impôt calculé par le barème vérifié sur les simulations OpenFisca de la courbe d'impôt : aucun nouveau calcul OpenFisca.")
+    col_salaire, col_versement = st.columns(2)
+    salaire_test = col_salaire.number_input("Salaire annuel du foyer envisagé (€)", min_value=0, max_value=int(surface['salaires'][-1]), value=int(min(salary, surface['salaires'][-1])), step=1000)
+    versement_test = col_versement.slider("Versement PER envisagé", 0, int(surface['versements'][-1]), int(min(plafond_PER, surface['versements'][-1])), 100, key="per_versement_surface")
+
+    ir_sans_per = evaluer_surface_per(surface, salaire_test, 0)
+    ir_avec_per = evaluer_surface_per(surface, salaire_test, versement_test)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Impôt sans versement", format_space_thousand_sep(ir_sans_per))
+    col2.metric("Impôt après versement", format_space_thousand_sep(ir_avec_per))
+    col3.metric("Économie d'impôt", format_space_thousand_sep(ir_sans_per - ir_avec_per))
+
+    st.divider()
+    st.subheader("Économie d'impôt marginale par euro versé")
+    fig = px.imshow(
+        surface['economie_marginale'].T * 100, x=surface['salaires'], y=surface['versements'], origin='lower', aspect='auto',
+        color_continuous_scale='Viridis', labels={'x': 'Salaire annuel du foyer', 'y': 'Versement PER', 'color': 'Économie (%)'}
+    )
+    fig.add_scatter(x=[salaire_test], y=[versement_test], mode='markers', marker=dict(color='red', size=12, symbol='x'), name='Votre hypothèse', showlegend=False)
+    fig.update_layout(xaxis_ticksuffix='€', yaxis_ticksuffix='€', coloraxis_colorbar_ticksuffix=' %')
+    st.plotly_chart(fig, use_container_width=True)
+
 # --- Logique principale de la page ---
 
 st.title("💡 Optimisation PER")
@@ -432,12 +467,13 @@ st.session_state.per_input_parameters = {
     'revenu_max_simu': input_revenu_max_simu
 }
 
+proprietaire = proprietaire_page('9_Optimisation_PER')
 if run_simulation:
     with st.spinner("Calculs d'optimisation en cours avec OpenFisca..."):
         try:
             # On recalcule les revenus avec l'année de simulation au cas où elle aurait changé
             revenus_salaires, revenu_foncier_net = get_revenus_imposables(annee_simulation)
-            results = analyser_optimisation_per(annee=annee_simulation, parents=parents, enfants=enfants, revenus_annuels=revenus_salaires, revenu_foncier_net=revenu_foncier_net, est_parent_isole=est_parent_isole, plafond_per=input_plafond_PER, ir_residuel_min=input_ir_residuel_min, revenu_max_simu=input_revenu_max_simu)
+            results = executer_tache('optimisation_per', message="Optimisation du versement PER", proprietaire=proprietaire, annee=annee_simulation, parents=parents, enfants=enfants, revenus_annuels=revenus_salaires, revenu_foncier_net=revenu_foncier_net, est_parent_isole=est_parent_isole, plafond_per=input_plafond_PER, ir_residuel_min=input_ir_residuel_min, revenu_max_simu=input_revenu_max_simu)
             st.session_state.per_simulation_results = results
             st.session_state.per_simulation_results['plafond_per_input'] = input_plafond_PER
             st.session_state.per_simulation_results['total_salary_input'] = total_salary
@@ -466,13 +502,15 @@ if 'per_simulation_results' in st.session_state:
     if "error" not in results:
         salary = results['total_salary_input']
         plafond_per = results['plafond_per_input']
-        tab_one_shot, tab_per_optim, tab_per_effect = st.tabs(["Synthèse de l'impôt", "Versement Optimal PER", "Effet d'un versement"])
+        tab_one_shot, tab_per_optim, tab_per_effect, tab_salary_change = st.tabs(["Synthèse de l'impôt", "Versement Optimal PER", "Effet d'un versement", "Et si mon salaire change ?"])
         with tab_one_shot:
             display_one_shot_tab(results, salary)
         with tab_per_optim:
             display_per_optim_tab(results, salary, input_ir_residuel_min)
         with tab_per_effect:
             display_per_effect_tab(results, salary, plafond_per, input_ir_residuel_min)
+        with tab_salary_change:
+            display_salary_change_tab(results, salary, plafond_per)
 
     # Le bloc de débogage est maintenant en dehors de la condition de succès
     # et est développé par défaut en cas d'erreur.
@@ -484,8 +522,13 @@ if 'per_simulation_results' in st.session_state:
             st.subheader("Traceback de l'erreur")
             st.text(results.get("traceback"))
         else:
-            st.subheader("Données envoyées à OpenFisca")
+            st.subheader("Points simulés par OpenFisca")
             st.json({
-                "Données pour la simulation (courbe d'impôt vs Revenu)": results.get("simulation_input_income"),
-                "Données pour la simulation (courbe d'impôt vs Versement PER)": results.get("simulation_input_per")
-            })
\ No newline at end of file
+                "Courbe d'impôt vs Revenu": results.get("simulation_input_income"),
+                "Courbe d'impôt vs Versement PER": results.get("simulation_input_per")
+            })
+            st.subheader("Points de rupture des courbes d'impôt")
+            st.caption(f"{results.get('nb_points_simules', 0)} points simulés ; les courbes sont reconstruites par interpolation entre ces points de rupture.")
+            col_income, col_per = st.columns(2)
+            col_income.dataframe(results.get("points_rupture_income"))
+            col_per.dataframe(results.get("points_rupture_PER"))
\ No newline at end of file
@@ -0,0 +1,271 @@
+# utils/bareme_ir.py
+"""
+Calcul vectorisé (NumPy) de l'impôt sur le revenu à partir des paramètres d'OpenFisca.
+
+Les paramètres d'une année (barème, plafonnement du quotient familial, décote, abattement
+de 10 % et taux des prélèvements sociaux) sont lus une seule fois dans
+`tax_benefit_system.parameters` et conservés dans un `ParametresIR` compact. Le calcul
+porte ensuite sur des tableaux de (revenu, parts) sans aucun appel à OpenFisca.
+
+Périmètre : foyers de métropole, salaires et revenus fonciers, case T. Les abattements
+spéciaux (personnes âgées ou invalides) et les réductions d'impôt ne sont pas modélisés.
+"""
+
+import threading
+from datetime import date
+import numpy as np
+
+from utils import fiscalite
+
+class ParametresIR:
+    """Instantané des paramètres de l'impôt sur le revenu pour une année."""
+
+    __slots__ = (
+        'annee', 'seuils', 'taux', 'plafond_demi_part', 'plafond_demi_part_parent_isole',
+        'decote_seuil_celib', 'decote_seuil_couple', 'decote_taux',
+        'abattement_taux', 'abattement_min', 'abattement_max', 'taux_ps', 'source'
+    )
+
+    def __init__(self, annee, seuils, taux, plafond_demi_part, plafond_demi_part_parent_isole,
+                 decote_seuil_celib, decote_seuil_couple, decote_taux,
+                 abattement_taux, abattement_min, abattement_max, taux_ps, source):
+        self.annee = annee
+        self.seuils = np.asarray(seuils, dtype=float)
+        self.taux = np.asarray(taux, dtype=float)
+        self.plafond_demi_part = plafond_demi_part
+        self.plafond_demi_part_parent_isole = plafond_demi_part_parent_isole
+        self.decote_seuil_celib = decote_seuil_celib
+        self.decote_seuil_couple = decote_seuil_couple
+        self.decote_taux = decote_taux
+        self.abattement_taux = abattement_taux
+        self.abattement_min = abattement_min
+        self.abattement_max = abattement_max
+        self.taux_ps = taux_ps
+        self.source = source
+
+    def to_dict(self):
+        """Représentation sérialisable (page Debug, cache)."""
+        return {k: (getattr(self, k).tolist() if isinstance(getattr(self, k), np.ndarray) else getattr(self, k)) for k in self.__slots__}
+
+# Paramètres des revenus 2023 (barème appliqué en 2024), utilisés lorsque OpenFisca n'est pas installé.
+PARAMETRES_IR_DEFAUT = ParametresIR(
+    annee=2023,
+    seuils=[0, 11294, 28797, 82341, 177106],
+    taux=[0, 0.11, 0.30, 0.41, 0.45],
+    plafond_demi_part=1759, plafond_demi_part_parent_isole=4149,
+    decote_seuil_celib=873, decote_seuil_couple=1444, decote_taux=0.4525,
+    abattement_taux=0.10, abattement_min=495, abattement_max=14171,
+    taux_ps=0.172, source='defaut'
+)
+
+_parametres_par_annee = {}
+_parametres_lock = threading.Lock()
+
+def extraire_parametres_ir(annee, tax_benefit_system=None):
+    """Lit les paramètres de l'année dans le système socio-fiscal OpenFisca."""
+    if tax_benefit_system is None:
+        tax_benefit_system = fiscalite.get_tax_benefit_system()
+    P = tax_benefit_system.parameters(f"{annee}-01-01")
+    bareme = P.impot_revenu.bareme_ir_depuis_1945.bareme
+    plaf_qf = P.impot_revenu.calcul_impot_revenu.plaf_qf
+    abatpro = P.impot_revenu.calcul_revenus_imposables.deductions.abatpro
+    ps = P.taxation_capital.prelevements_sociaux
+    taux_ps = (
+        ps.csg.taux_global.produits_de_placement
+        + P.prelevements_sociaux.contributions_sociales.crds
+        + ps.prelevements_solidarite.revenus_du_patrimoine
+    )
+    return ParametresIR(
+        annee=int(annee),
+        seuils=bareme.thresholds,
+        taux=bareme.rates,
+        plafond_demi_part=float(plaf_qf.plafond_avantages_procures_par_demi_part.general),
+        plafond_demi_part_parent_isole=float(plaf_qf.plafond_avantages_procures_par_demi_part.celib_enf),
+        decote_seuil_celib=float(plaf_qf.decote.seuil_celib),
+        decote_seuil_couple=float(plaf_qf.decote.seuil_couple),
+        decote_taux=float(plaf_qf.decote.taux),
+        abattement_taux=float(abatpro.taux),
+        abattement_min=float(abatpro.min),
+        abattement_max=float(abatpro.max),
+        taux_ps=round(float(taux_ps), 6),
+        source='openfisca'
+    )
+
+def get_parametres_ir(annee=None):
+    """
+    Retourne l'instantané des paramètres de l'année (mis en cache par processus).
+    Sans OpenFisca, retourne `PARAMETRES_IR_DEFAUT`.
+    """
+    annee = int(annee or date.today().year)
+    if not fiscalite.OPENFISCA_READY:
+        return PARAMETRES_IR_DEFAUT
+    parametres = _parametres_par_annee.get(annee)
+    if parametres is None:
+        with _parametres_lock:
+            parametres = _parametres_par_annee.get(annee)
+            if parametres is None:
+                parametres = extraire_parametres_ir(annee)
+                _parametres_par_annee[annee] = parametres
+    return parametres
+
+def parametres_ir_disponibles(annee=None):
+    """
+    Paramètres de l'année déjà extraits dans ce processus, sinon `PARAMETRES_IR_DEFAUT`.
+    Ne construit jamais le système socio-fiscal : destiné aux replis des pages, dont les calculs
+    OpenFisca sont confiés aux processus de travail.
+    """
+    return _parametres_par_annee.get(int(annee or date.today().year), PARAMETRES_IR_DEFAUT)
+
+# --- Noyau de calcul ---
+
+def _appliquer_bareme(quotient, parametres):
+    """Impôt par part : somme sur les tranches du taux × fraction du quotient dans la tranche."""
+    seuils_haut = np.append(parametres.seuils[1:], np.inf)
+    largeur = np.clip(np.asarray(quotient, dtype=float)[..., None] - parametres.seuils, 0, seuils_haut - parametres.seuils)
+    return largeur @ parametres.taux
+
+def _tranche(quotient, parametres):
+    """Indice de la tranche du barème atteinte par le quotient."""
+    return np.searchsorted(parametres.seuils, np.asarray(quotient, dtype=float), side='right') - 1
+
+def revenu_net_imposable(salaires, revenu_foncier_net=0.0, parametres=None):
+    """
+    Revenu net imposable du foyer : salaires après abattement forfaitaire de 10 % (borné, par
+    déclarant) + revenu foncier net.
+
+    Args:
+        salaires (array-like): Salaires imposables, de forme (..., nb_declarants).
+        revenu_foncier_net (array-like): Revenu foncier net du foyer, diffusé sur les premières dimensions.
+    """
+    parametres = parametres or PARAMETRES_IR_DEFAUT
+    salaires = np.asarray(salaires, dtype=float)
+    abattement = np.round(np.clip(parametres.abattement_taux * salaires, parametres.abattement_min, parametres.abattement_max))
+    return np.maximum(0, salaires - abattement).sum(axis=-1) + np.asarray(revenu_foncier_net, dtype=float)
+
+def nombre_parts(nb_adultes, nb_enfants=0, nb_enfants_garde_alternee=0, parent_isole=False):
+    """
+    Nombre de parts de quotient familial (cas général, vectorisé).
+    Les deux premiers enfants comptent pour une demi-part, les suivants pour une part ;
+    les enfants en garde alternée comptent pour moitié après les enfants à charge exclusive.
+    """
+    nb_adultes = np.asarray(nb_adultes, dtype=float)
+    nb_pac = np.asarray(nb_enfants, dtype=float)
+    nb_h = np.asarray(nb_enfants_garde_alternee, dtype=float)
+    parent_isole = np.asarray(parent_isole, dtype=bool)
+
+    parts_pac = 0.5 * np.minimum(nb_pac, 2) + np.maximum(nb_pac - 2, 0)
+    rang_libre = np.maximum(2 - nb_pac, 0)  # demi-parts de rang 1-2 encore disponibles
+    parts_alt = 0.5 * (0.5 * np.minimum(nb_h, rang_libre) + np.maximum(nb_h - rang_libre, 0))
+    majoration_isole = parent_isole * (nb_adultes == 1) * np.where(nb_pac > 0, 0.5, np.where(nb_h == 1, 0.25, np.where(nb_h >= 2, 0.5, 0)))
+    return nb_adultes + parts_pac + parts_alt + majoration_isole
+
+def calculer_ir_vectorise(rni, nb_parts, nb_adultes=1, parent_isole=False, parametres=None):
+    """
+    Calcule l'impôt sur le revenu pour des tableaux de revenus nets imposables et de parts.
+    Toutes les entrées sont diffusées (broadcasting) entre elles.
+
+    Returns:
+        dict: Tableaux 'ir_net' (équivalent de `ip_net`), 'ir_plaf_qf', 'ir_ss_qf', 'avantage_qf',
+        'decote', 'ir_tranche' et 'tmi' (taux marginal, en décimal).
+    """
+    parametres = parametres or PARAMETRES_IR_DEFAUT
+    rni, nb_parts, nb_adultes, parent_isole = np.broadcast_arrays(
+        np.asarray(rni, dtype=float), np.asarray(nb_parts, dtype=float),
+        np.asarray(nb_adultes, dtype=float), np.asarray(parent_isole, dtype=bool)
+    )
+
+    # 1. Impôt avec et sans quotient familial
+    ir_brut = nb_parts * _appliquer_bareme(rni / nb_parts, parametres)
+    ir_ss_qf = nb_adultes * _appliquer_bareme(rni / nb_adultes, parametres)
+
+    # 2. Plafonnement des effets du quotient familial
+    demi_parts_sup = (nb_parts - nb_adultes) * 2
+    demi_parts_isole = np.minimum((nb_parts - 1) * 2, 2)
+    plafond = np.where(
+        parent_isole & (nb_adultes == 1),
+        parametres.plafond_demi_part_parent_isole * demi_parts_isole / 2 + parametres.plafond_demi_part * (demi_parts_sup - demi_parts_isole),
+        parametres.plafond_demi_part * demi_parts_sup
+    )
+    ir_plafonne = np.maximum(0, ir_ss_qf - plafond)
+    plafonnement = ir_plafonne > ir_brut
+    ir_plaf_qf = np.maximum(ir_brut, ir_plafonne)
+
+    # 3. Décote
+    seuil_decote = np.where(nb_adultes == 1, parametres.decote_seuil_celib, parametres.decote_seuil_couple)
+    decote = np.round(np.maximum(0, seuil_decote - parametres.decote_taux * ir_plaf_qf))
+    decote_gain = np.round(np.minimum(decote, ir_plaf_qf))
+    ir_net = np.round(ir_plaf_qf - decote_gain)
+
+    # 4. Tranche marginale (calculée sur le nombre de parts retenu après plafonnement)
+    tranche = _tranche(rni / np.where(plafonnement, nb_adultes, nb_parts), parametres)
+
+    return {
+        'ir_net': ir_net,
+        'ir_plaf_qf': ir_plaf_qf,
+        'ir_ss_qf': ir_ss_qf,
+        'avantage_qf': ir_ss_qf - ir_plaf_qf,
+        'decote': decote_gain,
+        'ir_tranche': tranche,
+        'tmi': parametres.taux[tranche],
+    }
+
+def calculer_ir_foyer(annee, parents, enfants, revenus_annuels, revenu_foncier_net=0, est_parent_isole=False, parametres=None):
+    """
+    Équivalent scalaire de `analyser_fiscalite_foyer` (IR net, TMI, parts) calculé avec le noyau NumPy.
+    """
+    parametres = parametres or get_parametres_ir(annee)
+    nb_adultes = max(1, len(parents))
+    salaires = [revenus_annuels.get(p.get('prenom', f'parent_{i+1}'), 0) for i, p in enumerate(parents)] or [0]
+    parts = nombre_parts(nb_adultes, len([e for e in enfants if not e.get('garde_alternee')]),
+                         len([e for e in enfants if e.get('garde_alternee')]), est_parent_isole)
+    rni = revenu_net_imposable(salaires, revenu_foncier_net, parametres)
+    resultats = calculer_ir_vectorise(rni, parts, nb_adultes, est_parent_isole, parametres)
+    return {
+        'ir_net': float(resultats['ir_net']),
+        'ps_foncier': revenu_foncier_net * parametres.taux_ps,
+        'tmi': float(resultats['tmi']) * 100,
+        'parts_fiscales': float(parts),
+        'ir_sans_quotient': float(resultats['ir_ss_qf']),
+        'gain_quotient': -float(resultats['avantage_qf']),
+        'revenu_net_imposable': float(rni),
+    }
+
+# --- Validation ---
+
+def valider_contre_openfisca(annee=None, salaires_max=250000, nb_points_salaire=12, compositions=None, revenu_foncier_net=(0, 12000)):
+    """
+    Compare le noyau NumPy à `analyser_fiscalite_foyer` sur une grille échantillonnée
+    (salaires × compositions du foyer × revenu foncier) et retourne l'écart maximal.
+
+    Args:
+        compositions (list[tuple]): (nb_adultes, nb_enfants, nb_enfants_garde_alternee, parent_isole).
+
+    Returns:
+        dict: 'ecart_max' (€), 'point_ecart_max', 'nb_points' et 'details' (liste de tous les points).
+    """
+    from utils.openfisca_utils import analyser_fiscalite_foyer
+
+    annee = int(annee or date.today().year)
+    parametres = get_parametres_ir(annee)
+    if compositions is None:
+        compositions = [(1, 0, 0, False), (1, 1, 0, True), (2, 0, 0, False), (2, 2, 0, False), (2, 3, 1, False)]
+
+    details = []
+    for nb_adultes, nb_enfants, nb_alternes, parent_isole in compositions:
+        parents = [{'prenom': f'parent_{i+1}', 'date_naissance': date(1980, 1, 1)} for i in range(nb_adultes)]
+        enfants = [{'prenom': f'enfant_{i+1}', 'date_naissance': date(2012, 1, 1), 'garde_alternee': i >= nb_enfants} for i in range(nb_enfants + nb_alternes)]
+        for salaire in np.linspace(0, salaires_max, nb_points_salaire):
+            revenus = {p['prenom']: float(salaire) * (0.6 if i == 0 and nb_adultes == 2 else 0.4 if nb_adultes == 2 else 1.0) for i, p in enumerate(parents)}
+            for foncier in revenu_foncier_net:
+                reference = analyser_fiscalite_foyer(annee, parents, enfants, revenus, foncier, parent_isole)
+                noyau = calculer_ir_foyer(annee, parents, enfants, revenus, foncier, parent_isole, parametres)
+                details.append({
+                    'composition': (nb_adultes, nb_enfants, nb_alternes, parent_isole),
+                    'salaires': float(salaire), 'revenu_foncier_net': foncier,
+                    'ir_openfisca': float(reference['ir_net']), 'ir_noyau': noyau['ir_net'],
+                    'parts_openfisca': float(reference['parts_fiscales']), 'parts_noyau': noyau['parts_fiscales'],
+                    'ecart': abs(float(reference['ir_net']) - noyau['ir_net']),
+                })
+
+    pire = max(details, key=lambda d: d['ecart'])
+    return {'ecart_max': pire['ecart'], 'point_ecart_max': pire, 'nb_points': len(details), 'details': details}
@@ -0,0 +1,104 @@
+# utils/benchmark_demarrage.py
+"""
+Mesure du démarrage à froid de chaque page Streamlit.
+
+Chaque page est exécutée une fois (streamlit.testing.v1.AppTest) dans un interpréteur neuf, avec
+un foyer de démonstration dans le session_state : la durée mesurée comprend les imports de la page.
+Avec --prechauffe, OpenFisca est préchauffé avant la mesure, comme après le démarrage du serveur
+(app.py) : la durée est alors celle d'un changement de page.
+Les résultats sont enregistrés en JSON pour comparer deux versions de l'application :
+
+    python -m utils.benchmark_demarrage --sortie avant.json --racine /chemin/ancienne/version
+    python -m utils.benchmark_demarrage --sortie apres.json
+    python -m utils.benchmark_demarrage --comparer avant.json apres.json
+"""
+
+import os
+import sys
+import json
+import glob
+import argparse
+import subprocess
+
+# Exécuté dans le sous-processus : racine, page et préchauffage en arguments, résultat JSON sur la dernière ligne
+_SCRIPT_PAGE = r'''
+import sys, time, json
+racine, page, prechauffe = sys.argv[1], sys.argv[2], sys.argv[3] == '1'
+sys.path.insert(0, racine)
+if prechauffe:
+    try:
+        from utils.openfisca_worker import OPENFISCA_WORKERS
+        futures = OPENFISCA_WORKERS.demarrer()
+        for future in futures:
+            future.result()
+        if not futures:
+            raise ImportError
+    except ImportError:
+        try:
+            from utils.openfisca_utils import warmup_tax_benefit_system
+            warmup_tax_benefit_system()
+        except ImportError:  # versions sans système socio-fiscal partagé
+            import openfisca_france
+debut = time.perf_counter()
+from datetime import date
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(f"{racine}/{page}", default_timeout=300)
+app.session_state['parents'] = [{'prenom': 'Alice', 'date_naissance': date(1980, 5, 3)}]
+app.session_state['enfants'] = []
+app.session_state['actifs'] = []
+app.session_state['passifs'] = []
+app.session_state['revenus'] = [{'libelle': 'Salaire Alice', 'type': 'Salaire', 'montant': 4000}]
+app.session_state['depenses'] = []
+app.run()
+print(json.dumps({
+    'page': page,
+    'secondes': round(time.perf_counter() - debut, 3),
+    'exceptions': len(app.exception),
+    'openfisca_importe': 'openfisca_france' in sys.modules,
+}))
+'''
+
+def mesurer_page(racine, page, prechauffe=False, timeout=600):
+    """Démarrage à froid d'une page dans un interpréteur neuf."""
+    sortie = subprocess.run([sys.executable, '-c', _SCRIPT_PAGE, racine, page, '1' if prechauffe else '0'], capture_output=True, text=True, timeout=timeout, cwd=racine)
+    lignes = [l for l in sortie.stdout.splitlines() if l.startswith('{')]
+    if not lignes:
+        return {'page': page, 'secondes': None, 'exceptions': None, 'openfisca_importe': None, 'erreur': sortie.stderr[-500:]}
+    return json.loads(lignes[-1])
+
+def mesurer_pages(racine, pages=None, prechauffe=False):
+    """Mesure toutes les pages du dossier pages/ (ou la liste fournie)."""
+    if pages is None:
+        pages = sorted(os.path.relpath(p, racine) for p in glob.glob(os.path.join(racine, 'pages', '*.py')))
+    resultats = []
+    for page in pages:
+        resultat = mesurer_page(racine, page, prechauffe)
+        print(f"{page:45s} {resultat['secondes'] if resultat['secondes'] is not None else 'erreur':>8} s  OpenFisca importé : {resultat['openfisca_importe']}")
+        resultats.append(resultat)
+    return resultats
+
+def comparer(avant, apres):
+    """Affiche les durées de deux mesures page par page."""
+    durees_avant = {r['page']: r['secondes'] for r in avant}
+    print(f"{'Page':45s} {'Avant':>8} {'Après':>8}")
+    for r in apres:
+        a = durees_avant.get(r['page'])
+        print(f"{r['page']:45s} {a if a is not None else '-':>8} {r['secondes'] if r['secondes'] is not None else '-':>8}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Démarrage à froid des pages Streamlit")
+    parser.add_argument('--racine', default=os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    parser.add_argument('--sortie', help="Fichier JSON des résultats")
+    parser.add_argument('--page', action='append', help="Page à mesurer (toutes par défaut)")
+    parser.add_argument('--prechauffe', action='store_true', help="Préchauffer OpenFisca avant la mesure")
+    parser.add_argument('--comparer', nargs=2, metavar=('AVANT', 'APRES'))
+    args = parser.parse_args()
+
+    if args.comparer:
+        with open(args.comparer[0]) as f_avant, open(args.comparer[1]) as f_apres:
+            comparer(json.load(f_avant), json.load(f_apres))
+    else:
+        resultats = mesurer_pages(os.path.abspath(args.racine), args.page, args.prechauffe)
+        if args.sortie:
+            with open(args.sortie, 'w') as f:
+                json.dump(resultats, f, indent=2, ensure_ascii=False)
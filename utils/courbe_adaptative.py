@@ -0,0 +1,129 @@
+# utils/courbe_adaptative.py
+"""
+Échantillonnage adaptatif des courbes d'impôt.
+
+L'impôt en fonction du salaire (ou du versement PER) est linéaire par morceaux : il ne change
+de pente qu'aux seuils des tranches, à la sortie de la décote, au plafonnement du quotient familial
+et aux bornes de l'abattement de 10 %. Plutôt que d'évaluer chaque point d'un axe uniforme, on
+évalue un axe grossier puis on subdivise uniquement les segments qui contiennent une rupture de
+pente. Les points retenus forment une représentation compacte (points de rupture) à partir de
+laquelle la courbe est reconstruite exactement sur l'axe uniforme d'origine.
+
+Les calculs se font en indices de l'axe uniforme (0 .. nb_points - 1) : chaque point évalué est
+un point de l'axe d'origine, ce qui garantit une reconstruction identique aux points évalués.
+"""
+
+import numpy as np
+
+def _taille_lot(nb_indices, taille_lot_min):
+    """Taille des lots évalués, arrondie à une puissance de deux pour réutiliser les simulations du pool."""
+    return max(taille_lot_min, 1 << int(np.ceil(np.log2(max(1, nb_indices)))))
+
+def echantillonner_courbe(evaluer, nb_points, colonnes_lineaires, colonnes_discretes=(), indices_imposes=(),
+                          nb_points_initial=33, subdivisions=8, tolerance=1.0, taille_lot_min=16, nb_points_direct=256):
+    """
+    Échantillonne une courbe linéaire par morceaux définie sur un axe de `nb_points` points.
+
+    Args:
+        evaluer (callable): Reçoit un tableau d'indices de l'axe et retourne un dict colonne -> tableau de valeurs.
+        colonnes_lineaires (list): Colonnes linéaires par morceaux (changements de pente détectés entre segments voisins).
+        colonnes_discretes (list): Colonnes constantes par morceaux (ex. 'ir_tranche') : tout changement est raffiné.
+        indices_imposes (list): Indices toujours évalués et conservés (ex. la situation actuelle du foyer).
+        subdivisions (int): Nombre de parts d'un segment raffiné (un lot de simulations par niveau).
+        tolerance (float): Écart maximal toléré à la corde (les montants OpenFisca sont arrondis à l'euro).
+        nb_points_direct (int): En dessous de ce nombre de points, tout l'axe est évalué en un seul lot
+            (chaque lot a un coût fixe : plusieurs niveaux de raffinement coûteraient plus cher).
+
+    Returns:
+        dict: 'indices' (points de rupture retenus, triés), 'valeurs' (dict colonne -> valeurs aux indices),
+        'indices_evalues' (tous les points évalués, triés) et 'nb_evaluations' (leur nombre).
+    """
+    colonnes = list(colonnes_lineaires) + list(colonnes_discretes)
+    valeurs = {c: np.full(nb_points, np.nan) for c in colonnes}
+    evalue = np.zeros(nb_points, dtype=bool)
+
+    def evaluer_indices(indices):
+        indices = np.unique(np.asarray(indices, dtype=int))
+        indices = indices[~evalue[indices]]
+        if len(indices) == 0:
+            return
+        lot = np.concatenate([indices, np.full(_taille_lot(len(indices), taille_lot_min) - len(indices), indices[-1])])
+        resultats = evaluer(lot)
+        for c in colonnes:
+            valeurs[c][indices] = np.asarray(resultats[c], dtype=float)[:len(indices)]
+        evalue[indices] = True
+
+    def lineaire(a, m, b):
+        for c in colonnes_discretes:
+            if not (valeurs[c][a] == valeurs[c][m] == valeurs[c][b]):
+                return False
+        for c in colonnes_lineaires:
+            corde = valeurs[c][a] + (valeurs[c][b] - valeurs[c][a]) * (m - a) / (b - a)
+            if abs(valeurs[c][m] - corde) > tolerance:
+                return False
+        return True
+
+    # 1. Passe grossière (+ points imposés)
+    indices_imposes = np.asarray(indices_imposes, dtype=int)
+    if nb_points <= nb_points_direct:
+        nb_points_initial = nb_points
+    noeuds = np.unique(np.concatenate([
+        np.round(np.linspace(0, nb_points - 1, min(nb_points, nb_points_initial))).astype(int), indices_imposes
+    ]))
+    evaluer_indices(noeuds)
+
+    # 2. Raffinement : un segment dont la pente diffère de celles de ses deux voisins contient une
+    #    rupture ; il est découpé en `subdivisions` parts, tous les segments d'un niveau en un seul lot.
+    #    Une rupture située exactement sur un point évalué ne demande aucun raffinement.
+    while True:
+        evalues = np.flatnonzero(evalue)
+        a_raffiner = []
+        for k, (a, b) in enumerate(zip(evalues[:-1], evalues[1:])):
+            if b - a <= 1:
+                continue
+            rupture_gauche = k > 0 and not lineaire(evalues[k - 1], a, b)
+            rupture_droite = k + 2 < len(evalues) and not lineaire(a, b, evalues[k + 2])
+            seul_voisin = k == 0 or k + 2 == len(evalues)
+            changement_discret = any(valeurs[c][a] != valeurs[c][b] for c in colonnes_discretes)
+            if changement_discret or (rupture_gauche and rupture_droite) or (seul_voisin and (rupture_gauche or rupture_droite)):
+                a_raffiner.append((a, b))
+        if not a_raffiner:
+            break
+        evaluer_indices(np.concatenate([np.round(np.linspace(a, b, subdivisions + 1)[1:-1]).astype(int) for a, b in a_raffiner]))
+
+    # 3. Représentation compacte : un point n'est retiré que si tous les points évalués entre
+    #    les deux points conservés qui l'encadrent restent sur leur corde
+    evalues = np.flatnonzero(evalue)
+    imposes = set(indices_imposes.tolist())
+    retenus = [evalues[0]]
+    debut = 0
+    for j in range(2, len(evalues)):
+        a, b = evalues[debut], evalues[j]
+        intermediaires = evalues[debut + 1:j]
+        if any(i in imposes or not lineaire(a, i, b) for i in intermediaires):
+            debut = j - 1
+            retenus.append(evalues[debut])
+    if len(evalues) > 1:
+        retenus.append(evalues[-1])
+    retenus = np.array(retenus, dtype=int)
+
+    return {
+        'indices': retenus,
+        'valeurs': {c: valeurs[c][retenus] for c in colonnes},
+        'indices_evalues': evalues,
+        'nb_evaluations': int(evalue.sum()),
+    }
+
+def reconstruire_courbe(courbe, nb_points, colonnes_lineaires, colonnes_discretes=()):
+    """
+    Reconstruit la courbe sur l'axe uniforme complet à partir de ses points de rupture :
+    interpolation linéaire pour les colonnes linéaires, valeur du point de rupture précédent
+    pour les colonnes discrètes.
+    """
+    axe = np.arange(nb_points)
+    indices = courbe['indices']
+    dense = {c: np.interp(axe, indices, courbe['valeurs'][c]) for c in colonnes_lineaires}
+    precedent = np.searchsorted(indices, axe, side='right') - 1
+    for c in colonnes_discretes:
+        dense[c] = courbe['valeurs'][c][precedent]
+    return dense
@@ -0,0 +1,51 @@
+# utils/fiscalite.py
+"""
+Façade du sous-système fiscal, importé au premier usage.
+
+`utils.openfisca_utils` (et avec lui OpenFisca, pandas, plotly...) n'est importé que lorsqu'une
+de ses fonctions est réellement appelée : les pages qui n'affichent aucun calcul d'impôt ne paient
+pas ce coût au démarrage. La disponibilité d'OpenFisca est testée sans importer le paquet.
+
+    from utils import fiscalite
+    if fiscalite.OPENFISCA_READY:
+        resultats = fiscalite.analyser_fiscalite_foyer(...)
+"""
+
+import importlib
+import importlib.util
+import threading
+
+# Sonde de disponibilité : recherche du paquet sans l'importer
+OPENFISCA_READY = importlib.util.find_spec('openfisca_france') is not None
+
+_prechauffage_lock = threading.Lock()
+_prechauffage_lance = False
+
+def _module():
+    return importlib.import_module('utils.openfisca_utils')
+
+def __getattr__(nom):
+    """Résout les autres attributs (analyser_fiscalite_foyer, SIMULATION_POOL...) dans utils.openfisca_utils."""
+    if nom.startswith('__'):
+        raise AttributeError(nom)
+    return getattr(_module(), nom)
+
+def demarrer_prechauffage():
+    """
+    Prépare les calculs fiscaux en arrière-plan sans bloquer la page : les processus OpenFisca
+    (utils/openfisca_worker.py) sont lancés et préchauffés, ou, sans processus, le système
+    socio-fiscal est importé et construit dans un thread. Sans effet si OpenFisca est absent.
+    """
+    global _prechauffage_lance
+    if not OPENFISCA_READY:
+        return False
+    with _prechauffage_lock:
+        if _prechauffage_lance:
+            return False
+        _prechauffage_lance = True
+    from utils.openfisca_worker import OPENFISCA_WORKERS
+    if OPENFISCA_WORKERS.nb_processus > 0:
+        OPENFISCA_WORKERS.demarrer()
+    else:
+        threading.Thread(target=lambda: _module().start_tax_benefit_system_warmup(), name="openfisca-import", daemon=True).start()
+    return True
@@ -1,20 +1,147 @@
 # utils/openfisca_utils.py
 
 from datetime import date
+import importlib.util
+import os
+import threading
+import time
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 
-try:
-    from openfisca_france import FranceTaxBenefitSystem
+# OpenFisca n'est importé qu'au premier calcul (voir aussi la façade utils/fiscalite.py)
+OPENFISCA_READY = importlib.util.find_spec('openfisca_france') is not None
+
+from utils.tax_cache import TaxResultCache, cle_fiscalite_foyer
+from utils.simulation_pool import SimulationPool
+from utils.courbe_adaptative import echantillonner_courbe, reconstruire_courbe
+
+# --- Système socio-fiscal partagé ---
+# La construction de FranceTaxBenefitSystem coûte plusieurs secondes. Une seule instance
+# est construite par processus et partagée par toutes les sessions du serveur Streamlit.
+_tax_benefit_system = None
+_tax_benefit_system_lock = threading.Lock()
+_warmup_lock = threading.Lock()
+_warmup_thread = None
+
+# Durées mesurées lors de la construction / du préchauffage (affichées sur la page Debug)
+TAX_BENEFIT_SYSTEM_STATS = {'build_seconds': None, 'warmup_seconds': None, 'built_at': None}
+
+def get_tax_benefit_system():
+    """
+    Retourne le FranceTaxBenefitSystem partagé, construit au premier appel.
+    Thread-safe : les sessions concurrentes attendent la fin de la construction en cours.
+    """
+    global _tax_benefit_system
+    if not OPENFISCA_READY:
+        return None
+    if _tax_benefit_system is None:
+        with _tax_benefit_system_lock:
+            if _tax_benefit_system is None:
+                from openfisca_france import FranceTaxBenefitSystem
+                start = time.perf_counter()
+                _tax_benefit_system = FranceTaxBenefitSystem()
+                TAX_BENEFIT_SYSTEM_STATS['build_seconds'] = time.perf_counter() - start
+                TAX_BENEFIT_SYSTEM_STATS['built_at'] = time.time()
+    return _tax_benefit_system
+
+def warmup_tax_benefit_system(annee=None):
+    """
+    Construit le système socio-fiscal partagé et lance un calcul minimal pour charger
+    les paramètres de l'année. Retourne la durée totale en secondes (None si OpenFisca est absent).
+    """
+    if not OPENFISCA_READY:
+        return None
+    if TAX_BENEFIT_SYSTEM_STATS['warmup_seconds'] is not None:
+        return TAX_BENEFIT_SYSTEM_STATS['warmup_seconds']
+
+    annee_str = str(annee or date.today().year)
+    start = time.perf_counter()
+    tax_benefit_system = get_tax_benefit_system()
+    CASE = {
+        'individus': {'warmup': {'salaire_imposable': {annee_str: 30000}}},
+        'foyers_fiscaux': {'foyerfiscal1': {'declarants': ['warmup']}},
+        'familles': {'famille1': {'parents': ['warmup']}},
+        'menages': {'menage1': {'personne_de_reference': ['warmup']}},
+    }
     from openfisca_core.simulation_builder import SimulationBuilder
-    OPENFISCA_READY = True
-except ImportError:
-    OPENFISCA_READY = False
+    simulation = SimulationBuilder().build_from_entities(tax_benefit_system, CASE)
+    simulation.calculate('ip_net', annee_str)
+    elapsed = time.perf_counter() - start
+    TAX_BENEFIT_SYSTEM_STATS['warmup_seconds'] = elapsed
+    print(f"[OpenFisca] Préchauffage terminé en {elapsed:.2f} s (construction du système : {TAX_BENEFIT_SYSTEM_STATS['build_seconds']:.2f} s)")
+    return elapsed
+
+def start_tax_benefit_system_warmup():
+    """
+    Lance le préchauffage dans un thread d'arrière-plan (une seule fois par processus),
+    afin de ne pas bloquer l'affichage de la première page.
+    """
+    global _warmup_thread
+    if not OPENFISCA_READY:
+        return None
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=warmup_tax_benefit_system, name="openfisca-warmup", daemon=True)
+            _warmup_thread.start()
+    return _warmup_thread
+
+# --- Pool de simulations pré-construites ---
+# Une simulation par forme de foyer est conservée et réutilisée : les requêtes ne réécrivent
+# que les salaires, versements PER et revenus fonciers (voir utils/simulation_pool.py).
+SIMULATION_POOL = SimulationPool(
+    get_tax_benefit_system,
+    max_formes=int(os.environ.get('AUDIT_SIMULATION_POOL_SIZE', 16))
+)
+
+# --- Cache des résultats de analyser_fiscalite_foyer ---
+# Partagé par toutes les sessions. La variable d'environnement AUDIT_TAX_CACHE_DB active
+# un niveau SQLite persistant (chemin du fichier de base de données).
+TAX_RESULT_CACHE = TaxResultCache(
+    maxsize=int(os.environ.get('AUDIT_TAX_CACHE_SIZE', 512)),
+    db_path=os.environ.get('AUDIT_TAX_CACHE_DB') or None
+)
+
+def statistiques_processus():
+    """
+    Compteurs OpenFisca du processus courant (système socio-fiscal, cache de résultats, pool de
+    simulations). Exécuté par un processus de travail pour la page Debug (voir utils/openfisca_worker.py).
+    """
+    return {
+        'pid': os.getpid(),
+        'systeme': dict(TAX_BENEFIT_SYSTEM_STATS),
+        'cache': TAX_RESULT_CACHE.stats(),
+        'pool': SIMULATION_POOL.stats(),
+    }
+
+def _openfisca_version():
+    """Version d'OpenFisca-France, intégrée aux clés de cache pour invalider les résultats persistés lors d'une mise à jour."""
+    try:
+        from importlib.metadata import version
+        return version('OpenFisca-France')
+    except Exception:
+        return 'inconnue'
+
+_CACHE_NAMESPACE = f"analyser_fiscalite_foyer/{_openfisca_version()}"
 
 def analyser_fiscalite_foyer(annee, parents, enfants, revenus_annuels, revenu_foncier_net=0, est_parent_isole=False):
     """
     Analyse complète de la fiscalité d'un foyer pour une année donnée avec OpenFisca.
+    Les résultats sont mémorisés dans `TAX_RESULT_CACHE` : un foyer identique n'est simulé qu'une fois.
+    """
+    if not OPENFISCA_READY:
+        return _analyser_fiscalite_foyer_sans_cache(annee, parents, enfants, revenus_annuels, revenu_foncier_net, est_parent_isole)
+
+    cle = cle_fiscalite_foyer(annee, parents, enfants, revenus_annuels, revenu_foncier_net, est_parent_isole, namespace=_CACHE_NAMESPACE)
+    resultats = TAX_RESULT_CACHE.get(cle)
+    if resultats is None:
+        resultats = _analyser_fiscalite_foyer_sans_cache(annee, parents, enfants, revenus_annuels, revenu_foncier_net, est_parent_isole)
+        TAX_RESULT_CACHE.put(cle, resultats)
+    return resultats
+
+def _analyser_fiscalite_foyer_sans_cache(annee, parents, enfants, revenus_annuels, revenu_foncier_net=0, est_parent_isole=False):
+    """
+    Simulation OpenFisca effective derrière `analyser_fiscalite_foyer`.
     """
     if not OPENFISCA_READY:
         # Fallback simple si OpenFisca n'est pas disponible
@@ -27,86 +154,20 @@ def analyser_fiscalite_foyer(annee, parents, enfants, revenus_annuels, revenu_fo
             'simulation_data': {'error': 'OpenFisca not available'}
         }
 
-    tax_benefit_system = FranceTaxBenefitSystem()
-    
-    # --- 1. Séparation des enfants en fonction de la garde alternée ---
-    enfants_a_charge_plein = [e for e in enfants if not e.get('garde_alternee')]
-    enfants_en_garde_alternee = [e for e in enfants if e.get('garde_alternee')]
-
-    # --- 2. Construction des entités OpenFisca ---
-    individus = {}
-    declarants = []
-    all_children_names = []
-
-    # Parents
-    for i, parent in enumerate(parents):
-        prenom = parent.get('prenom', f'parent_{i+1}')
-        dob = parent.get('date_naissance')
-        # Gérer le format date de Streamlit: {'_type': 'date', 'value': '1976-08-12'}
-        if isinstance(dob, dict) and '_type' in dob and dob['_type'] == 'date':
-            date_naissance_formatee = dob['value']
-        elif hasattr(dob, 'strftime'):
-            date_naissance_formatee = dob.strftime('%Y-%m-%d')
-        else:
-            date_naissance_formatee = date(1980, 1, 1).strftime('%Y-%m-%d')
-        
-        revenu_parent = revenus_annuels.get(prenom, 0)
-        
-        individus[prenom] = {
-            'salaire_imposable': {str(annee): revenu_parent},
-            'date_naissance': {'ETERNITY': date_naissance_formatee}
-        }
-        declarants.append(prenom)
-
-    # Enfants (tous les enfants sont des individus)
-    for i, enfant in enumerate(enfants):
-        prenom = enfant.get('prenom', f'enfant_{i+1}')
-        dob = enfant.get('date_naissance')
-        # Gérer le format date de Streamlit: {'_type': 'date', 'value': '2015-03-25'}
-        if isinstance(dob, dict) and '_type' in dob and dob['_type'] == 'date':
-            date_naissance_formatee = dob['value']
-        elif hasattr(dob, 'strftime'):
-            date_naissance_formatee = dob.strftime('%Y-%m-%d')
-        else:
-            date_naissance_formatee = date(2010, 1, 1).strftime('%Y-%m-%d')
-        
-        individus[prenom] = {
-            'date_naissance': {'ETERNITY': date_naissance_formatee}
-        }
-        all_children_names.append(prenom)
-
-    # Foyer Fiscal
-    foyer_fiscal = {'foyerfiscal1': {
-        'declarants': declarants,
-        # nb_pac: Nombre d'enfants à charge exclusive
-        'nb_pac': {str(annee): len(enfants_a_charge_plein)},
-        # nbH: Nombre d'enfants en garde alternée
-        'nbH': {str(annee): len(enfants_en_garde_alternee)},
-    }}
-
-    if revenu_foncier_net > 0:
-        foyer_fiscal['foyerfiscal1']['revenu_categoriel_foncier'] = {str(annee): revenu_foncier_net}
-
-    if est_parent_isole:
-        foyer_fiscal['foyerfiscal1']['caseT'] = {str(annee): True}
-
-    # Famille et Ménage (nécessaire pour certaines variables)
-    famille = {'famille1': {'parents': declarants, 'enfants': all_children_names}}
-    menage = {'menage1': {'personne_de_reference': [declarants[0]]}}
-    if len(declarants) > 1:
-        menage['menage1']['conjoint'] = declarants[1:]
-
-    CASE = {'individus': individus, 'foyers_fiscaux': foyer_fiscal, 'familles': famille, 'menages': menage}
-
-    # --- 3. Simulation ---
-    sb = SimulationBuilder()
-    simulation = sb.build_from_entities(tax_benefit_system, CASE)
-    
-    annee_str = str(annee)
-    variables_to_calc = ['ip_net', 'ir_taux_marginal', 'nbptr', 'ir_ss_qf', 'avantage_qf']#, 'revenu_brut_global', 'revenu_net_imposable']
-    results_openfisca = {var: simulation.calculate(var, annee_str)[0] for var in variables_to_calc}
+    # --- 1. Déclarants (les revenus sont indexés par prénom) ---
+    declarants = [parent.get('prenom', f'parent_{i+1}') for i, parent in enumerate(parents)]
 
-    # --- 4. Formatage des résultats ---
+    # --- 2. Simulation (réutilise la simulation du pool pour cette forme de foyer) ---
+    variables_to_calc = ['ip_net', 'ir_taux_marginal', 'nbptr', 'ir_ss_qf', 'avantage_qf']#, 'revenu_brut_global', 'revenu_net_imposable']
+    salaires = [revenus_annuels.get(prenom, 0) for prenom in declarants]
+    results_pool = SIMULATION_POOL.calculer(
+        annee, parents, enfants, variables_to_calc,
+        salaires=[salaires],
+        revenu_foncier_net=max(0, revenu_foncier_net), est_parent_isole=est_parent_isole
+    )
+    results_openfisca = {var: valeurs[0] for var, valeurs in results_pool.items()}
+
+    # --- 3. Formatage des résultats ---
     ir_net = results_openfisca.get('ip_net', 0)
     ps_foncier = revenu_foncier_net * 0.172
     total_revenus_bruts = sum(revenus_annuels.values()) + revenu_foncier_net
@@ -123,7 +184,16 @@ def analyser_fiscalite_foyer(annee, parents, enfants, revenus_annuels, revenu_fo
         'gain_quotient': gain_quotient,
         'revenu_brut_global': 0, #results_openfisca.get('revenu_brut_global', 0),
         'revenu_net_imposable': 0, #results_openfisca.get('revenu_net_imposable', 0),
-        'simulation_data': CASE
+        # Entrées effectivement transmises au pool de simulations
+        'simulation_data': {
+            'annee': annee,
+            'variables': variables_to_calc,
+            'salaires': dict(zip(declarants, salaires)),
+            'nb_enfants': len(enfants),
+            'nb_enfants_garde_alternee': sum(1 for e in enfants if e.get('garde_alternee')),
+            'revenu_foncier_net': max(0, revenu_foncier_net),
+            'est_parent_isole': est_parent_isole,
+        }
     }
 
 def calculer_impot_openfisca(annee, parents, enfants, revenus_annuels, revenu_foncier_net=0, est_parent_isole=False):
@@ -142,6 +212,120 @@ def calculer_impot_openfisca(annee, parents, enfants, revenus_annuels, revenu_fo
         print(f"Erreur dans calculer_impot_openfisca: {e}")
         return 0
 
+def _date_naissance_decalee(dob, defaut, decalage_annees):
+    """
+    Formate une date de naissance (date ou format Streamlit sérialisé) en la décalant de
+    `decalage_annees` ans, afin de conserver l'âge du membre lorsqu'un foyer est évalué
+    sur une autre période que son année de projection.
+    """
+    if isinstance(dob, dict) and dob.get('_type') == 'date':
+        dob = date.fromisoformat(dob['value'])
+    elif not hasattr(dob, 'strftime'):
+        dob = defaut
+    try:
+        dob = dob.replace(year=dob.year + decalage_annees)
+    except ValueError:  # 29 février
+        dob = dob.replace(year=dob.year + decalage_annees, day=28)
+    return dob.strftime('%Y-%m-%d')
+
+def calculer_fiscalite_multi_annees(annees, parents, enfants_par_annee, revenus_par_annee, revenus_fonciers_par_annee, est_parent_isole=False, annee_reference=None):
+    """
+    Calcule l'impôt de plusieurs années en une seule simulation OpenFisca.
+
+    Chaque année est représentée par un foyer distinct (foyers empilés). Les années postérieures
+    à `annee_reference` (par défaut l'année en cours) sont évaluées avec la législation de
+    l'année de référence, qui est celle qu'OpenFisca prolonge pour les années futures ; les dates
+    de naissance sont décalées pour que les âges restent ceux de l'année projetée.
+
+    Args:
+        annees (list[int]): Années à calculer.
+        parents (list[dict]): Déclarants du foyer.
+        enfants_par_annee (list[list[dict]]): Enfants à charge pour chaque année.
+        revenus_par_annee (list[dict]): Salaires imposables {prénom: montant} pour chaque année.
+        revenus_fonciers_par_annee (list[float]): Revenu foncier net pour chaque année.
+        est_parent_isole (bool | list[bool]): Case T, commune ou par année.
+        annee_reference (int, optional): Dernière année évaluée avec sa propre législation.
+
+    Returns:
+        dict: Tableaux NumPy alignés sur `annees` : 'ip_net', 'ir_taux_marginal', 'nbptr'.
+    """
+    annees = [int(a) for a in annees]
+    n_annees = len(annees)
+    if isinstance(est_parent_isole, bool):
+        est_parent_isole = [est_parent_isole] * n_annees
+
+    if not OPENFISCA_READY:
+        # Fallback simple si OpenFisca n'est pas disponible (cohérent avec analyser_fiscalite_foyer)
+        totaux = np.array([sum(r.values()) + rf for r, rf in zip(revenus_par_annee, revenus_fonciers_par_annee)], dtype=float)
+        return {
+            'annees': np.array(annees),
+            'ip_net': totaux * 0.15,
+            'ir_taux_marginal': np.full(n_annees, 0.15),
+            'nbptr': np.array([len(parents) + len(e) * 0.5 for e in enfants_par_annee], dtype=float),
+        }
+
+    if annee_reference is None:
+        annee_reference = date.today().year
+    tax_benefit_system = get_tax_benefit_system()
+
+    # --- 1. Un foyer par année, regroupés par période de calcul ---
+    periodes = [min(annee, annee_reference) for annee in annees]
+    individus, foyers_fiscaux, familles, menages = {}, {}, {}, {}
+    # Comme dans analyser_fiscalite_foyer, les enfants ne sont pas rattachés au foyer (nb_pac et nbH
+    # sont des entrées) : ils ont chacun leur propre foyer, déclaré explicitement après ceux des années.
+    foyers_enfants = {}
+    for annee, periode, enfants, revenus, revenu_foncier, case_t in zip(annees, periodes, enfants_par_annee, revenus_par_annee, revenus_fonciers_par_annee, est_parent_isole):
+        periode_str = str(periode)
+        decalage = periode - annee
+        declarants, noms_enfants = [], []
+
+        for i, parent in enumerate(parents):
+            prenom = parent.get('prenom', f'parent_{i+1}')
+            nom = f"{prenom}_{annee}"
+            individus[nom] = {
+                'salaire_imposable': {periode_str: revenus.get(prenom, 0)},
+                'date_naissance': {'ETERNITY': _date_naissance_decalee(parent.get('date_naissance'), date(1980, 1, 1), decalage)}
+            }
+            declarants.append(nom)
+
+        for i, enfant in enumerate(enfants):
+            nom = f"{enfant.get('prenom', f'enfant_{i+1}')}_{annee}"
+            individus[nom] = {'date_naissance': {'ETERNITY': _date_naissance_decalee(enfant.get('date_naissance'), date(2010, 1, 1), decalage)}}
+            noms_enfants.append(nom)
+            foyers_enfants[f'foyerfiscal_{nom}'] = {'declarants': [nom]}
+
+        foyer = {
+            'declarants': declarants,
+            'nb_pac': {periode_str: len([e for e in enfants if not e.get('garde_alternee')])},
+            'nbH': {periode_str: len([e for e in enfants if e.get('garde_alternee')])},
+        }
+        if revenu_foncier > 0:
+            foyer['revenu_categoriel_foncier'] = {periode_str: revenu_foncier}
+        if case_t:
+            foyer['caseT'] = {periode_str: True}
+        foyers_fiscaux[f'foyerfiscal_{annee}'] = foyer
+
+        familles[f'famille_{annee}'] = {'parents': declarants, 'enfants': noms_enfants}
+        menages[f'menage_{annee}'] = {'personne_de_reference': [declarants[0]]}
+        if len(declarants) > 1:
+            menages[f'menage_{annee}']['conjoint'] = declarants[1:]
+
+    foyers_fiscaux.update(foyers_enfants)
+    CASE = {'individus': individus, 'foyers_fiscaux': foyers_fiscaux, 'familles': familles, 'menages': menages}
+
+    # --- 2. Une seule construction, un calcul par période distincte ---
+    from openfisca_core.simulation_builder import SimulationBuilder
+    simulation = SimulationBuilder().build_from_entities(tax_benefit_system, CASE)
+    periodes_array = np.array(periodes)
+    resultats = {var: np.zeros(n_annees) for var in ('ip_net', 'ir_taux_marginal', 'nbptr')}
+    for periode in sorted(set(periodes)):
+        masque = periodes_array == periode
+        for var in resultats:
+            resultats[var][masque] = simulation.calculate(var, str(periode))[:n_annees][masque]
+
+    resultats['annees'] = np.array(annees)
+    return resultats
+
 def add_bracket_lines_to_fig(fig, df_simulation, bareme_annee_simulation):
     """
     Ajoute des lignes verticales au graphique aux points où la tranche de TMI change.
@@ -157,6 +341,41 @@ def add_bracket_lines_to_fig(fig, df_simulation, bareme_annee_simulation):
             fig.add_vline(x=rbg_threshold, line_width=1, line_dash="dash", line_color="grey", annotation_text=f"TMI {int(official_rate*100)}%", annotation_position="top right", annotation_font_size=14)
     return fig
 
+def _indices_ruptures_abattement(annee, salaires_axe):
+    """
+    Indices de l'axe encadrant les bornes de l'abattement de 10 % du premier déclarant.
+    Sous le minimum d'abattement, la courbe s'écarte d'une droite passant par l'origine de l'axe
+    puis la rejoint : le test du point milieu ne peut pas détecter cette rupture, on l'impose.
+    """
+    from utils.bareme_ir import get_parametres_ir
+    parametres = get_parametres_ir(annee)
+    bornes = [parametres.abattement_min, parametres.abattement_min / parametres.abattement_taux, parametres.abattement_max / parametres.abattement_taux]
+    indices = np.searchsorted(salaires_axe, bornes)
+    return [int(i) for i in np.concatenate([indices - 1, indices]) if 0 <= i < len(salaires_axe)]
+
+def _courbe_ir_adaptative(annee, parents, enfants, colonnes_lineaires, colonnes_discretes, nb_points, salaires, versements_per=None, revenu_foncier_net=0, est_parent_isole=False, indices_imposes=()):
+    """
+    Courbe d'impôt le long d'un axe uniforme de `nb_points` points, évaluée par échantillonnage
+    adaptatif (voir utils/courbe_adaptative.py) avec les simulations du pool.
+
+    Args:
+        salaires (np.ndarray): Salaires de chaque déclarant, de forme (nb_points, nb_parents) ou (1, nb_parents).
+        versements_per (np.ndarray): Versements PER, mêmes formes possibles (ou None).
+
+    Returns:
+        tuple: (dict variable -> valeurs sur tout l'axe, points de rupture retenus)
+    """
+    def evaluer(indices):
+        return SIMULATION_POOL.calculer(
+            annee, parents, enfants, list(colonnes_lineaires) + list(colonnes_discretes),
+            salaires=salaires[indices] if len(salaires) > 1 else salaires,
+            versements_per=None if versements_per is None else (versements_per[indices] if len(versements_per) > 1 else versements_per),
+            revenu_foncier_net=revenu_foncier_net, est_parent_isole=est_parent_isole, nb_copies=len(indices)
+        )
+
+    courbe = echantillonner_courbe(evaluer, nb_points, colonnes_lineaires, colonnes_discretes, indices_imposes=indices_imposes)
+    return reconstruire_courbe(courbe, nb_points, colonnes_lineaires, colonnes_discretes), courbe
+
 def simuler_evolution_fiscalite(annee, parents, enfants, revenu_foncier_net=0, est_parent_isole=False, revenu_max_simu=150000, step=1000):
     """
     Simule l'évolution de l'impôt sur le revenu en fonction du revenu du travail.
@@ -164,83 +383,23 @@ def simuler_evolution_fiscalite(annee, parents, enfants, revenu_foncier_net=0, e
     if not OPENFISCA_READY:
         return pd.DataFrame(), None
 
-    tax_benefit_system = FranceTaxBenefitSystem()
-    
-    # --- 1. Construction des entités (similaire à analyser_fiscalite_foyer) ---
-    enfants_a_charge_plein = [e for e in enfants if not e.get('garde_alternee')]
-    enfants_en_garde_alternee = [e for e in enfants if e.get('garde_alternee')]
-
-    individus = {}
-    declarants = []
-    all_children_names = []
-
-    for i, parent in enumerate(parents):
-        prenom = parent.get('prenom', f'parent_{i+1}')
-        dob = parent.get('date_naissance')
-        # Gérer le format date de Streamlit: {'_type': 'date', 'value': '1976-08-12'}
-        if isinstance(dob, dict) and '_type' in dob and dob['_type'] == 'date':
-            date_naissance_formatee = dob['value']
-        elif hasattr(dob, 'strftime'):
-            date_naissance_formatee = dob.strftime('%Y-%m-%d')
-        else:
-            date_naissance_formatee = date(1980, 1, 1).strftime('%Y-%m-%d')
-        individus[prenom] = {'date_naissance': {'ETERNITY': date_naissance_formatee}}
-        declarants.append(prenom)
-
-    for i, enfant in enumerate(enfants):
-        prenom = enfant.get('prenom', f'enfant_{i+1}')
-        dob = enfant.get('date_naissance')
-        # Gérer le format date de Streamlit: {'_type': 'date', 'value': '2015-03-25'}
-        if isinstance(dob, dict) and '_type' in dob and dob['_type'] == 'date':
-            date_naissance_formatee = dob['value']
-        elif hasattr(dob, 'strftime'):
-            date_naissance_formatee = dob.strftime('%Y-%m-%d')
-        else:
-            date_naissance_formatee = date(2010, 1, 1).strftime('%Y-%m-%d')
-        individus[prenom] = {'date_naissance': {'ETERNITY': date_naissance_formatee}}
-        all_children_names.append(prenom)
-
-    foyer_fiscal = {'foyerfiscal1': {
-        'declarants': declarants,
-        'nb_pac': {str(annee): len(enfants_a_charge_plein)},
-        'nbH': {str(annee): len(enfants_en_garde_alternee)},
-    }}
-    if revenu_foncier_net > 0:
-        foyer_fiscal['foyerfiscal1']['revenu_categoriel_foncier'] = {str(annee): revenu_foncier_net}
-    if est_parent_isole:
-        foyer_fiscal['foyerfiscal1']['caseT'] = {str(annee): True}
-
-    famille = {'famille1': {'parents': declarants, 'enfants': all_children_names}}
-    menage = {'menage1': {'personne_de_reference': [declarants[0]]}}
-    if len(declarants) > 1:
-        menage['menage1']['conjoint'] = declarants[1:]
-
-    # --- 2. Définition de l'axe de simulation ---
-    axis_count = int(revenu_max_simu / step) if step > 0 else 1
-    
-    CASE = {
-        'individus': individus, 'foyers_fiscaux': foyer_fiscal, 'familles': famille, 'menages': menage,
-        'axes': [[{'count': axis_count, 'name': 'salaire_imposable', 'min': 0, 'max': revenu_max_simu, 'period': str(annee)}]]
-    }
-
-    # --- 3. Simulation ---
-    sb = SimulationBuilder()
-    simulation = sb.build_from_entities(tax_benefit_system, CASE)
-    
+    tax_benefit_system = get_tax_benefit_system()
     annee_str = str(annee)
-    #n_reshape = len(declarants) + len(all_children_names)
-    n_reshape_out = 1 + len(all_children_names)
-    n_reshape = 1
-
-    # L'axe s'applique à chaque individu. On somme les revenus des déclarants.
-    n_reshape_salary = int(simulation.calculate_add('salaire_imposable', annee_str).shape[0] / axis_count)
-    salaire_foyer = simulation.calculate_add('salaire_imposable', annee_str).reshape(axis_count, n_reshape_salary)[:, :len(declarants)].sum(axis=1)
 
-    # Les variables du foyer sont diffusées à tous les individus. On prend la première valeur.    
-    n_reshape_loc = int(simulation.calculate_add('ip_net', annee_str).shape[0] / axis_count)
-
-    ir_net_evol = simulation.calculate('ip_net', annee_str).reshape(axis_count, n_reshape_loc)[:, 0]
-    ir_tranche_evol = simulation.calculate('ir_tranche', annee_str).reshape(axis_count, n_reshape_loc)[:, 0]
+    # --- 1. Définition de l'axe de simulation (salaire du premier déclarant) ---
+    axis_count = int(revenu_max_simu / step) if step > 0 else 1
+    salaires = np.zeros((axis_count, len(parents)), dtype=np.float32)
+    salaires[:, 0] = np.linspace(0, revenu_max_simu, axis_count)
+    salaire_foyer = salaires.sum(axis=1)
+
+    # --- 2. Simulation (échantillonnage adaptatif, courbe reconstruite sur tout l'axe) ---
+    results, _ = _courbe_ir_adaptative(
+        annee, parents, enfants, ['ip_net'], ['ir_tranche'], axis_count, salaires,
+        revenu_foncier_net=max(0, revenu_foncier_net), est_parent_isole=est_parent_isole,
+        indices_imposes=_indices_ruptures_abattement(annee, salaires[:, 0])
+    )
+    ir_net_evol = np.round(results['ip_net'])
+    ir_tranche_evol = results['ir_tranche'].astype(int)
 
     df_evolution = pd.DataFrame({
         'Revenu': salaire_foyer + revenu_foncier_net,  # Ajouter les revenus fonciers au total
@@ -295,6 +454,160 @@ def _calculate_optimal_per_payment(df_per, df_one_shot, plafond_per, ir_residuel
 
     return versement_final, impot_final, versement_tmi_opt
 
+def _plus_petit_entier(predicat, debut, fin):
+    """Plus petit entier v de [debut, fin] tel que predicat(v) (predicat monotone), ou None."""
+    if not predicat(fin):
+        return None
+    while debut < fin:
+        milieu = (debut + fin) // 2
+        if predicat(milieu):
+            fin = milieu
+        else:
+            debut = milieu + 1
+    return debut
+
+def _optimiser_versement_per(annee, parents, enfants, salaires, revenu_foncier_net, est_parent_isole, plafond_per, ir_residuel_min, versement_max, tranche_initiale, ir_initial, nb_points_verification=8):
+    """
+    Versement PER optimal calculé sur la courbe linéaire par morceaux IR(versement) du noyau
+    `utils.bareme_ir` (barème, quotient familial et décote de l'année) au lieu d'un balayage de l'axe f6rs.
+
+    Le versement est déduit du revenu net imposable : une simulation OpenFisca fournit ce revenu et
+    le nombre de parts, puis le seuil de changement de TMI et le plus grand versement respectant
+    l'IR résiduel sont trouvés par dichotomie, à l'euro près. Une seconde simulation vérifie le noyau
+    aux points trouvés et sur quelques points de l'axe.
+
+    Returns:
+        dict: 'versement_optimal', 'impot_final', 'versement_tmi', 'evaluer' (courbe du noyau, pour
+        les graphiques), 'versements_verifies' (versements simulés par OpenFisca) et 'nb_points_simules' ; None si le noyau ne reproduit pas OpenFisca pour ce
+        foyer (abattements spéciaux, etc.) : l'appelant revient alors au balayage.
+    """
+    from utils.bareme_ir import get_parametres_ir, calculer_ir_vectorise
+
+    versement_max = int(versement_max)
+    situation = SIMULATION_POOL.calculer(
+        annee, parents, enfants, ['rni', 'nbptr'], salaires=salaires,
+        revenu_foncier_net=revenu_foncier_net, est_parent_isole=est_parent_isole
+    )
+    rni_initial, nb_parts = float(situation['rni'][0]), float(situation['nbptr'][0])
+    parametres = get_parametres_ir(annee)
+
+    def evaluer(versements):
+        resultats = calculer_ir_vectorise(np.maximum(0, rni_initial - np.asarray(versements, dtype=float)), nb_parts, len(parents), est_parent_isole, parametres)
+        return {'ip_net': resultats['ir_net'], 'ir_tranche': resultats['ir_tranche']}
+
+    def ir(versement):
+        return float(evaluer([versement])['ip_net'][0])
+
+    # 1. Versement minimal pour changer de TMI
+    versement_tmi = 0
+    if tranche_initiale > 0:
+        versement_tmi = _plus_petit_entier(lambda v: evaluer([v])['ir_tranche'][0] < tranche_initiale, 0, versement_max) or 0
+
+    # 2. Plus grand versement laissant un IR au moins égal à l'IR résiduel (l'IR décroît avec le versement)
+    if ir(0) >= ir_residuel_min:
+        premier_sous_residuel = _plus_petit_entier(lambda v: ir(v) < ir_residuel_min, 0, versement_max)
+        versement_optimal = versement_max if premier_sous_residuel is None else premier_sous_residuel - 1
+        impot_final = ir(versement_optimal)
+    else:
+        versement_optimal, impot_final = 0, ir_initial
+
+    # 3. Plafonnement par le plafond de l'utilisateur
+    versement_final = min(versement_optimal, int(plafond_per))
+    if versement_final < versement_optimal:
+        impot_final = ir(versement_final)
+
+    # 4. Vérification du noyau par OpenFisca aux points trouvés et sur l'axe
+    points = np.unique(np.clip(np.concatenate([
+        np.linspace(0, versement_max, nb_points_verification).astype(int),
+        [versement_tmi - 1, versement_tmi, versement_optimal, versement_optimal + 1, versement_final]
+    ]), 0, versement_max))
+    versements = np.zeros((len(points), len(parents)), dtype=np.int64)
+    versements[:, 0] = points
+    reference = SIMULATION_POOL.calculer(
+        annee, parents, enfants, ['ip_net', 'ir_tranche'], salaires=salaires, versements_per=versements,
+        revenu_foncier_net=revenu_foncier_net, est_parent_isole=est_parent_isole, nb_copies=len(points)
+    )
+    noyau = evaluer(points)
+    ecarts = np.abs(reference['ip_net'] - noyau['ip_net'])
+    tranches_differentes = reference['ir_tranche'] != noyau['ir_tranche']
+    if ecarts.max() > 0.5 or np.any(tranches_differentes):
+        pire = int(ecarts.argmax())
+        print(
+            f"[PER] Noyau IR différent d'OpenFisca pour ce foyer (écart max {ecarts[pire]:.2f} € "
+            f"à {int(points[pire])} € versés, {int(tranches_differentes.sum())} tranche(s) différente(s) "
+            f"sur {len(points)} points) : retour au balayage de l'axe f6rs"
+        )
+        return None
+
+    return {
+        'versement_optimal': float(versement_final),
+        'impot_final': float(impot_final),
+        'versement_tmi': float(versement_tmi),
+        'evaluer': evaluer,
+        'versements_verifies': points,
+        'nb_points_simules': 1 + len(points),
+    }
+
+def _surface_per(annee, parents, revenus_annuels, revenu_foncier_net, est_parent_isole, courbe_income, salaires_income, results_income, salaire_max, versement_max, nb_salaires=33, nb_versements=33):
+    """
+    Surface d'impôt salaire × versement PER calculée par le noyau `utils.bareme_ir`, sans
+    nouvelle simulation : le versement est déduit du revenu net imposable, comme dans
+    `_optimiser_versement_per`.
+
+    Le noyau est d'abord comparé à OpenFisca sur les points déjà simulés de la courbe IR / revenu
+    (revenu net imposable et impôt). Le salaire du foyer varie en conservant la répartition actuelle
+    entre les déclarants ; le versement PER est porté par le premier déclarant.
+
+    Returns:
+        dict: paramètres du noyau pour `evaluer_surface_per`, 'salaires' et 'versements' (axes de la
+        grille affichée) et 'economie_marginale' (baisse d'impôt par euro versé, de forme
+        (nb_salaires, nb_versements)) ; None si le noyau ne reproduit pas OpenFisca pour ce foyer.
+    """
+    from utils.bareme_ir import get_parametres_ir, revenu_net_imposable, calculer_ir_vectorise
+
+    parametres = get_parametres_ir(annee)
+    nb_parts = float(results_income['nbptr'][0])
+    evalues = courbe_income['indices_evalues']
+    rni_noyau = revenu_net_imposable(salaires_income[evalues], revenu_foncier_net, parametres)
+    ir_noyau = calculer_ir_vectorise(rni_noyau, nb_parts, len(parents), est_parent_isole, parametres)['ir_net']
+    ecart_rni = np.abs(rni_noyau - results_income['rni'][evalues]).max()
+    ecart_ir = np.abs(ir_noyau - results_income['ip_net'][evalues]).max()
+    # Les salaires de l'axe ne sont pas entiers : l'abattement arrondi à l'euro peut différer d'1 €
+    if ecart_rni > 1 or ecart_ir > 1:
+        print(f"[PER] Noyau IR différent d'OpenFisca pour ce foyer (écart max {ecart_rni:.2f} € de revenu net imposable, {ecart_ir:.2f} € d'impôt) : surface salaire × versement indisponible")
+        return None
+
+    total = sum(revenus_annuels.get(p.get('prenom', f'parent_{i+1}'), 0) for i, p in enumerate(parents))
+    surface = {
+        'parametres': parametres,
+        'repartition': np.array([revenus_annuels.get(p.get('prenom', f'parent_{i+1}'), 0) / total if total > 0 else float(i == 0) for i, p in enumerate(parents)]),
+        'revenu_foncier_net': revenu_foncier_net,
+        'nb_parts': nb_parts,
+        'nb_adultes': len(parents),
+        'est_parent_isole': est_parent_isole,
+        'salaires': np.linspace(0, salaire_max, nb_salaires),
+        'versements': np.round(np.linspace(0, versement_max, nb_versements)),
+    }
+    grille_salaires, grille_versements = np.meshgrid(surface['salaires'], surface['versements'], indexing='ij')
+    ir = evaluer_surface_per(surface, grille_salaires, grille_versements)
+    surface['economie_marginale'] = -np.gradient(ir, surface['versements'], axis=1) if nb_versements > 1 else np.zeros_like(ir)
+    return surface
+
+def evaluer_surface_per(surface, salaire, versement):
+    """
+    Impôt pour un salaire du foyer et un versement PER (scalaires ou tableaux diffusables), calculé
+    exactement par le noyau `utils.bareme_ir` à partir de la surface (aucun calcul OpenFisca).
+    """
+    from utils.bareme_ir import revenu_net_imposable, calculer_ir_vectorise
+
+    salaires = np.asarray(salaire, dtype=float)[..., None] * surface['repartition']
+    rni = revenu_net_imposable(salaires, surface['revenu_foncier_net'], surface['parametres'])
+    ir = calculer_ir_vectorise(
+        np.maximum(0, rni - np.asarray(versement, dtype=float)), surface['nb_parts'],
+        surface['nb_adultes'], surface['est_parent_isole'], surface['parametres']
+    )['ir_net']
+    return float(ir) if ir.ndim == 0 else ir
+
 def analyser_optimisation_per(annee, parents, enfants, revenus_annuels, revenu_foncier_net, est_parent_isole, plafond_per, ir_residuel_min, revenu_max_simu, step=100):
     """
     Analyse complète de l'optimisation PER pour un foyer.
@@ -302,91 +615,110 @@ def analyser_optimisation_per(annee, parents, enfants, revenus_annuels, revenu_f
     if not OPENFISCA_READY:
         return {'error': 'OpenFisca not available'}
 
-    tax_benefit_system = FranceTaxBenefitSystem()
+    tax_benefit_system = get_tax_benefit_system()
     annee_str = str(annee)
 
-    # --- 1. Création des entités de base ---
-    enfants_a_charge_plein = [e for e in enfants if not e.get('garde_alternee')]
-    enfants_en_garde_alternee = [e for e in enfants if e.get('garde_alternee')]
-    individus, declarants, all_children_names = {}, [], []
-
-    for i, p in enumerate(parents):
-        prenom = p.get('prenom', f'parent_{i+1}')
-        dob = p.get('date_naissance')
-        date_naissance_formatee = dob.strftime('%Y-%m-%d') if dob else date(1980, 1, 1).strftime('%Y-%m-%d')
-        individus[prenom] = {'date_naissance': {'ETERNITY': date_naissance_formatee}}
-        declarants.append(prenom)
-
-    for i, e in enumerate(enfants):
-        prenom = e.get('prenom', f'enfant_{i+1}')
-        dob = e.get('date_naissance')
-        date_naissance_formatee = dob.strftime('%Y-%m-%d') if dob else date(2010, 1, 1).strftime('%Y-%m-%d')
-        individus[prenom] = {'date_naissance': {'ETERNITY': date_naissance_formatee}}
-        all_children_names.append(prenom)
-
-    foyer_fiscal = {'foyerfiscal1': {
-        'declarants': declarants,
-        'nb_pac': {annee_str: len(enfants_a_charge_plein)}, 'nbH': {annee_str: len(enfants_en_garde_alternee)},
-    }}
-    if revenu_foncier_net > 0: foyer_fiscal['foyerfiscal1']['revenu_categoriel_foncier'] = {annee_str: revenu_foncier_net}
-    if est_parent_isole: foyer_fiscal['foyerfiscal1']['caseT'] = {annee_str: True}
-    
-    famille = {'famille1': {'parents': declarants, 'enfants': all_children_names}}
-    menage = {'menage1': {'personne_de_reference': [declarants[0]]}}
-    if len(declarants) > 1: menage['menage1']['conjoint'] = declarants[1:]
-
-    base_case = {'individus': individus, 'foyers_fiscaux': foyer_fiscal, 'familles': famille, 'menages': menage}
-    n_individus = len(declarants) + len(all_children_names)
+    # --- 1. Déclarants (les revenus sont indexés par prénom) ---
+    declarants = [p.get('prenom', f'parent_{i+1}') for i, p in enumerate(parents)]
 
     # --- 2. Simulation de l'évolution de l'IR en fonction du revenu ---
     axis_count_income = int(revenu_max_simu / step) if step > 0 else 1
-    case_income_sim = base_case.copy()
-    case_income_sim['axes'] = [[{'count': axis_count_income, 'name': 'salaire_imposable', 'min': 0, 'max': revenu_max_simu, 'period': annee_str}]]
-    
-    sb_income = SimulationBuilder()
-    sim_income = sb_income.build_from_entities(tax_benefit_system, case_income_sim)
-    
-    salaire_foyer = sim_income.calculate_add('salaire_imposable', annee_str).reshape(axis_count_income, n_individus)[:, :len(declarants)].sum(axis=1)
-    vars_to_calc = ['ip_net', 'ir_taux_marginal', 'ir_tranche', 'ir_ss_qf', 'avantage_qf', 'decote_gain_fiscal', 'taux_moyen_imposition']
-    results_income = {var: sim_income.calculate(var, annee_str).reshape(axis_count_income, 
-                                                                        int(sim_income.calculate(var, annee_str).shape[0]/axis_count_income))[:, 0] for var in vars_to_calc}
+    salaires_income = np.zeros((axis_count_income, len(declarants)), dtype=np.float32)
+    salaires_income[:, 0] = np.linspace(0, revenu_max_simu, axis_count_income)
+    salaire_foyer = salaires_income.sum(axis=1)
+
+    # Échantillonnage adaptatif : le point de la situation actuelle (df_one_shot) est toujours évalué
+    total_salary = sum(revenus_annuels.values())
+    indices_one_shot = np.flatnonzero(np.round(salaire_foyer, -2).astype(int) == int(np.round(total_salary, -2)))[:1]
+    results_income, courbe_income = _courbe_ir_adaptative(
+        annee, parents, enfants,
+        # nbptr ne dépend pas du salaire : constant le long de l'axe, il ne coûte aucun point supplémentaire
+        ['ip_net', 'ir_ss_qf', 'avantage_qf', 'decote_gain_fiscal', 'rni'], ['ir_taux_marginal', 'ir_tranche', 'nbptr'],
+        axis_count_income, salaires_income,
+        revenu_foncier_net=max(0, revenu_foncier_net), est_parent_isole=est_parent_isole,
+        indices_imposes=_indices_ruptures_abattement(annee, salaires_income[:, 0]) + indices_one_shot.tolist()
+    )
+
+    # Taux moyen (non linéaire par morceaux) recalculé à partir de l'IR et du revenu net imposable.
+    # Il ne diffère de taux_moyen_imposition que par la contribution exceptionnelle sur les hauts
+    # revenus, coûteuse à simuler : elle n'est demandée à OpenFisca que pour la situation actuelle
+    # et seulement au-delà de son premier seuil.
+    rni = results_income['rni']
+    taux_moyen = (results_income['ip_net'] / (rni + (rni == 0))) * (rni > 0)
+    salaires_simules_income = salaire_foyer[courbe_income['indices_evalues']]
+    if len(indices_one_shot):
+        try:
+            bareme_cehr = tax_benefit_system.parameters(annee_str).impot_revenu.contributions_exceptionnelles.contribution_exceptionnelle_hauts_revenus
+            seuil_cehr = bareme_cehr.celibataire_ou_assimile.thresholds[1]
+        except Exception:
+            seuil_cehr = 0
+        if rni[indices_one_shot[0]] >= seuil_cehr:
+            salaires_simules_income = np.append(salaires_simules_income, salaire_foyer[indices_one_shot[0]])
+            taux_moyen[indices_one_shot[0]] = SIMULATION_POOL.calculer(
+                annee, parents, enfants, ['taux_moyen_imposition'], salaires=salaires_income[indices_one_shot],
+                revenu_foncier_net=max(0, revenu_foncier_net), est_parent_isole=est_parent_isole
+            )['taux_moyen_imposition'][0]
 
     df_income_evol = pd.DataFrame({
-        'Revenu': salaire_foyer, 'IR': results_income['ip_net'], 'TMI': results_income['ir_taux_marginal'],
-        'ir_tranche': results_income['ir_tranche'], 'IR sans QF': results_income['ir_ss_qf'],
-        'Reduction QF': -results_income['avantage_qf'], 'Decote': results_income['decote_gain_fiscal'],
-        'Taux moyen d imposition': results_income['taux_moyen_imposition']
+        'Revenu': salaire_foyer, 'IR': np.round(results_income['ip_net']), 'TMI': results_income['ir_taux_marginal'],
+        'ir_tranche': results_income['ir_tranche'].astype(int), 'IR sans QF': results_income['ir_ss_qf'],
+        'Reduction QF': -results_income['avantage_qf'], 'Decote': np.round(results_income['decote_gain_fiscal']),
+        'Taux moyen d imposition': taux_moyen
     })
     df_income_evol['Revenu'] = df_income_evol['Revenu'].apply(lambda x: int(np.round(x, -2)))
+    surface_per = _surface_per(
+        annee, parents, revenus_annuels, max(0, revenu_foncier_net), est_parent_isole, courbe_income,
+        salaires_income, results_income, revenu_max_simu, max(plafond_per, 1000)
+    )
 
     # --- 3. Simulation de l'effet du versement PER ---
-    total_salary = sum(revenus_annuels.values())
-    case_per_sim = base_case.copy()
-    # Assigner les salaires réels pour cette simulation
-    for prenom, revenu in revenus_annuels.items():
-        case_per_sim['individus'][prenom]['salaire_imposable'] = {annee_str: revenu}
+    salaires_reels = np.array([[revenus_annuels.get(prenom, 0) for prenom in declarants]])
+    df_one_shot = df_income_evol[df_income_evol['Revenu'] == int(np.round(total_salary, -2))].head(1)
 
     axis_count_per = int(total_salary / step) if step > 0 else 1
+    solution_per = None
+    if axis_count_per > 0 and not df_one_shot.empty:
+        solution_per = _optimiser_versement_per(
+            annee, parents, enfants, salaires_reels, max(0, revenu_foncier_net), est_parent_isole,
+            plafond_per, ir_residuel_min, total_salary, int(df_one_shot['ir_tranche'].values[0]), df_one_shot['IR'].values[0]
+        )
+
+    versements_simules_per = np.zeros(0)
     if axis_count_per > 0:
-        case_per_sim['axes'] = [[{'count': axis_count_per, 'name': 'f6rs', 'min': 0, 'max': total_salary, 'period': annee_str}]]        
-        sb_per = SimulationBuilder()
-        sim_per = sb_per.build_from_entities(tax_benefit_system, case_per_sim)
-        versement_per_axis = sim_per.calculate_add('f6rs', annee_str).reshape(axis_count_per, n_individus)[:, :len(declarants)].sum(axis=1)
-        ir_per_evol = sim_per.calculate('ip_net', annee_str).reshape(axis_count_per, 1 + len(all_children_names))[:, 0]
-        ir_tranche_per_evol = sim_per.calculate('ir_tranche', annee_str).reshape(axis_count_per, 1 + len(all_children_names))[:, 0]
+        versements_per = np.zeros((axis_count_per, len(declarants)), dtype=np.int64)  # f6rs est une variable entière
+        versements_per[:, 0] = np.linspace(0, total_salary, axis_count_per)
+        versement_per_axis = versements_per.sum(axis=1)
+        if solution_per is not None:
+            # Courbe du noyau vérifié par le solveur : aucune simulation supplémentaire
+            courbe_per = echantillonner_courbe(lambda indices: solution_per['evaluer'](versement_per_axis[indices]), axis_count_per, ['ip_net'], ['ir_tranche'])
+            results_per = reconstruire_courbe(courbe_per, axis_count_per, ['ip_net'], ['ir_tranche'])
+            courbe_per['nb_evaluations'] = solution_per['nb_points_simules']
+            versements_simules_per = solution_per['versements_verifies']
+        else:
+            results_per, courbe_per = _courbe_ir_adaptative(
+                annee, parents, enfants, ['ip_net'], ['ir_tranche'], axis_count_per,
+                salaires_reels, versements_per=versements_per,
+                revenu_foncier_net=max(0, revenu_foncier_net), est_parent_isole=est_parent_isole
+            )
+            versements_simules_per = versement_per_axis[courbe_per['indices_evalues']]
+        ir_per_evol, ir_tranche_per_evol = np.round(results_per['ip_net']), results_per['ir_tranche'].astype(int)
         df_per_evol = pd.DataFrame({'Versement_PER': versement_per_axis, 'IR': ir_per_evol, 'ir_tranche': ir_tranche_per_evol})
     else:
         df_per_evol = pd.DataFrame(columns=['Versement_PER', 'IR', 'ir_tranche'])
+        courbe_per = None
 
     # --- 4. Calculs finaux ---
-    df_one_shot = df_income_evol[df_income_evol['Revenu'] == int(np.round(total_salary, -2))].head(1)
-    versement_optimal, impot_final, versement_tmi = _calculate_optimal_per_payment(df_per_evol, df_one_shot, plafond_per, ir_residuel_min)
+    if solution_per is not None:
+        versement_optimal, impot_final, versement_tmi = solution_per['versement_optimal'], solution_per['impot_final'], solution_per['versement_tmi']
+    else:
+        versement_optimal, impot_final, versement_tmi = _calculate_optimal_per_payment(df_per_evol, df_one_shot, plafond_per, ir_residuel_min)
     
+    # Nombre de parts lu dans la simulation de la courbe de revenu, sans nouvelle analyse du foyer
+    nb_parts = float(results_income['nbptr'][indices_one_shot[0] if len(indices_one_shot) else 0])
     try:
         bareme = tax_benefit_system.parameters.impot_revenu.bareme_ir_depuis_1945.bareme(annee_str)
-        nb_parts = analyser_fiscalite_foyer(annee, parents, enfants, revenus_annuels, revenu_foncier_net, est_parent_isole)['parts_fiscales']
     except:
-        bareme, nb_parts = None, len(parents)
+        bareme = None
 
     return {
         "df_income_tax_evol": df_income_evol,
@@ -398,6 +730,21 @@ def analyser_optimisation_per(annee, parents, enfants, revenus_annuels, revenu_f
         "impot_avec_versement": impot_final,
         "versement_PER_TMI": versement_tmi,
         "length_simu": revenu_max_simu,
-        "simulation_input_income": case_income_sim,
-        "simulation_input_per": case_per_sim,
+        "surface_per": surface_per,
+        # Entrées effectivement simulées par le pool (points de l'axe évalués)
+        "simulation_input_income": {
+            'annee': annee, 'axe': 'salaire_imposable du premier déclarant',
+            'salaires_simules': salaires_simules_income.tolist(),
+            'revenu_foncier_net': max(0, revenu_foncier_net), 'est_parent_isole': est_parent_isole,
+        },
+        "simulation_input_per": {
+            'annee': annee, 'axe': 'f6rs du premier déclarant',
+            'salaires': dict(zip(declarants, salaires_reels[0].tolist())),
+            'versements_simules': np.asarray(versements_simules_per).tolist(),
+            'revenu_foncier_net': max(0, revenu_foncier_net), 'est_parent_isole': est_parent_isole,
+        },
+        # Représentation compacte des courbes (points de rupture) et nombre de points réellement simulés
+        "points_rupture_income": df_income_evol.iloc[courbe_income['indices']].reset_index(drop=True),
+        "points_rupture_PER": df_per_evol.iloc[courbe_per['indices']].reset_index(drop=True) if courbe_per else df_per_evol,
+        "nb_points_simules": courbe_income['nb_evaluations'] + (courbe_per['nb_evaluations'] if courbe_per else 0),
     }
\ No newline at end of file
@@ -0,0 +1,320 @@
+# utils/openfisca_worker.py
+"""
+Exécution des calculs OpenFisca dans des processus de travail dédiés.
+
+Les simulations bloquent le thread du script Streamlit pendant plusieurs secondes (Focus
+Fiscalité, Projection, Optimisation PER). Les calculs sont ici confiés à un pool de processus
+qui possèdent chacun leur système socio-fiscal préchauffé : la page soumet une tâche, reçoit une
+`TacheFiscale` (future) et affiche une barre de progression en l'interrogeant.
+
+- Une tâche identique déjà en cours (mêmes paramètres) est partagée au lieu d'être relancée,
+  ce qui permet aussi à un rerun Streamlit de retrouver la tâche lancée par l'exécution précédente.
+- Une tâche expire après `timeout` secondes. Les tâches d'une session lancées depuis une page
+  sont annulées lorsqu'une autre page OpenFisca de la même session soumet un calcul (voir
+  `proprietaire_page`) ; quitter une page pour une page sans calcul OpenFisca n'annule rien.
+  Seules les tâches encore en attente sont réellement annulées : une tâche déjà démarrée dans un
+  processus va à son terme, son résultat est simplement ignoré.
+- `AUDIT_OPENFISCA_WORKERS=0` exécute les tâches dans le thread appelant (sans processus).
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import types
+import contextlib
+import hashlib
+import threading
+import multiprocessing
+import concurrent.futures
+import concurrent.futures.process
+
+# Types de tâches : fonction de utils.openfisca_utils exécutée par le processus de travail
+TYPES_TACHES = {
+    'foyer': 'analyser_fiscalite_foyer',
+    'evolution': 'simuler_evolution_fiscalite',
+    'optimisation_per': 'analyser_optimisation_per',
+    'multi_annees': 'calculer_fiscalite_multi_annees',
+    'stats': 'statistiques_processus',
+}
+
+# Paramètres de calculer_fiscalite_multi_annees découpés par lots d'années (un lot par sous-tâche)
+_PARAMETRES_PAR_ANNEE = ('annees', 'enfants_par_annee', 'revenus_par_annee', 'revenus_fonciers_par_annee')
+
+def _initialiser_processus():
+    """Préchauffe le système socio-fiscal du processus de travail."""
+    from utils.openfisca_utils import warmup_tax_benefit_system
+    warmup_tax_benefit_system()
+
+def _pret():
+    return True
+
+def _executer(type_tache, parametres):
+    """Point d'entrée des processus de travail."""
+    from utils import openfisca_utils
+    return getattr(openfisca_utils, TYPES_TACHES[type_tache])(**parametres)
+
+def _fusionner_multi_annees(resultats):
+    """Concatène les résultats des lots d'années de calculer_fiscalite_multi_annees."""
+    import numpy as np
+    return {cle: np.concatenate([r[cle] for r in resultats]) for cle in resultats[0]}
+
+_main_lock = threading.Lock()
+
+@contextlib.contextmanager
+def _main_neutre():
+    """
+    Les processus 'spawn' réexécutent le module __main__ du parent. Sous Streamlit, c'est le
+    script de la page en cours : il est masqué le temps de lancer les processus (ils démarrent
+    lors des soumissions).
+    """
+    with _main_lock:
+        principal = sys.modules.get('__main__')
+        sys.modules['__main__'] = types.ModuleType('__main__')
+        try:
+            yield
+        finally:
+            sys.modules['__main__'] = principal
+
+def cle_tache(type_tache, parametres):
+    """Empreinte des paramètres d'une tâche (les dates sont sérialisées en texte)."""
+    contenu = json.dumps([type_tache, parametres], sort_keys=True, default=str)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+class TacheFiscale:
+    """
+    Future d'un calcul OpenFisca, éventuellement découpé en sous-tâches (lots d'années).
+    """
+
+    def __init__(self, cle, type_tache, futures, assembler=None, timeout=None, proprietaire=None):
+        self.cle = cle
+        self.type_tache = type_tache
+        self.proprietaire = proprietaire
+        self._futures = futures
+        self._assembler = assembler
+        self.debut = time.monotonic()
+        self.echeance = self.debut + timeout if timeout else None
+        self.annulee = False
+
+    def progression(self):
+        """Fraction des sous-tâches terminées (0 à 1)."""
+        return sum(f.done() for f in self._futures) / len(self._futures)
+
+    def expiree(self):
+        return self.echeance is not None and time.monotonic() > self.echeance and not self.terminee()
+
+    def terminee(self):
+        return all(f.done() for f in self._futures)
+
+    def duree(self):
+        return time.monotonic() - self.debut
+
+    def annuler(self):
+        """Annule les sous-tâches en attente ; le résultat des sous-tâches déjà démarrées est ignoré."""
+        self.annulee = True
+        for f in self._futures:
+            f.cancel()
+
+    def resultat(self, timeout=None):
+        """
+        Attend le résultat (au plus `timeout` secondes, et jamais au-delà de l'échéance de la tâche).
+        Lève TimeoutError, concurrent.futures.CancelledError ou l'exception du calcul.
+        """
+        if self.annulee:
+            raise concurrent.futures.CancelledError()
+        if self.echeance is not None:
+            restant = max(0, self.echeance - time.monotonic())
+            timeout = restant if timeout is None else min(timeout, restant)
+        fin = None if timeout is None else time.monotonic() + timeout
+        resultats = []
+        for f in self._futures:
+            try:
+                resultats.append(f.result(None if fin is None else max(0, fin - time.monotonic())))
+            except concurrent.futures.TimeoutError:
+                raise TimeoutError(f"Calcul OpenFisca '{self.type_tache}' non terminé après {self.duree():.0f} s")
+        return self._assembler(resultats) if self._assembler else resultats[0]
+
+class OpenFiscaWorkerPool:
+    """
+    Pool de processus OpenFisca avec file de tâches, déduplication des tâches en cours,
+    échéance et annulation par propriétaire (session / page).
+    """
+
+    def __init__(self, nb_processus=1, timeout=120, taille_lot_annees=None):
+        self.nb_processus = nb_processus
+        self.timeout = timeout
+        self.taille_lot_annees = taille_lot_annees
+        self._executor = None
+        self._en_cours = {}
+        self._lock = threading.Lock()
+        self.soumises = 0
+        self.dedupliquees = 0
+        self.annulees = 0
+
+    def _get_executor(self):
+        # 'spawn' : les processus ne doivent pas hériter des threads du serveur Streamlit
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.nb_processus, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_initialiser_processus
+            )
+        return self._executor
+
+    def _taille_lot(self, nb_annees):
+        """
+        Nombre d'années par sous-tâche multi_annees. Chaque lot reconstruit ses simulations
+        OpenFisca : par défaut, un lot par processus de travail.
+        """
+        if self.taille_lot_annees:
+            return self.taille_lot_annees
+        return -(-nb_annees // max(1, self.nb_processus))
+
+    def demarrer(self):
+        """Lance et préchauffe les processus sans attendre (démarrage de l'application) ; retourne leurs futures."""
+        if self.nb_processus <= 0:
+            return []
+        executor = self._get_executor()
+        with _main_neutre():
+            return [executor.submit(_pret) for _ in range(self.nb_processus)]
+
+    def _lancer(self, type_tache, parametres):
+        if self.nb_processus <= 0:
+            future = concurrent.futures.Future()
+            try:
+                future.set_result(_executer(type_tache, parametres))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        with _main_neutre():
+            try:
+                return self._get_executor().submit(_executer, type_tache, parametres)
+            except concurrent.futures.process.BrokenProcessPool:
+                # Un processus de travail s'est arrêté brutalement (mémoire, signal) : le pool
+                # est inutilisable, il est reconstruit une fois
+                print(f"[OpenFisca] Pool de processus interrompu : reconstruction pour la tâche '{type_tache}'")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                return self._get_executor().submit(_executer, type_tache, parametres)
+
+    def soumettre(self, type_tache, proprietaire=None, timeout=None, **parametres):
+        """
+        Soumet un calcul (voir TYPES_TACHES) et retourne sa `TacheFiscale`. Un calcul identique
+        encore en cours est partagé plutôt que relancé.
+        """
+        if type_tache not in TYPES_TACHES:
+            raise ValueError(f"Type de tâche OpenFisca inconnu : {type_tache}")
+        cle = cle_tache(type_tache, parametres)
+        with self._lock:
+            tache = self._en_cours.get(cle)
+            if tache is not None and not tache.annulee and not tache.expiree():
+                self.dedupliquees += 1
+                tache.proprietaire = proprietaire
+                return tache
+            self.soumises += 1
+
+        taille_lot = self._taille_lot(len(parametres['annees'])) if type_tache == 'multi_annees' else 0
+        if type_tache == 'multi_annees' and len(parametres['annees']) > taille_lot:
+            lots = range(0, len(parametres['annees']), taille_lot)
+            futures = [self._lancer(type_tache, {
+                k: (v[i:i + taille_lot] if k in _PARAMETRES_PAR_ANNEE or (k == 'est_parent_isole' and isinstance(v, list)) else v)
+                for k, v in parametres.items()
+            }) for i in lots]
+            assembler = _fusionner_multi_annees
+        else:
+            futures, assembler = [self._lancer(type_tache, parametres)], None
+
+        tache = TacheFiscale(cle, type_tache, futures, assembler, timeout or self.timeout, proprietaire)
+        with self._lock:
+            self._en_cours[cle] = tache
+        for f in futures:
+            f.add_done_callback(lambda _, tache=tache: self._retirer_si_terminee(tache))
+        return tache
+
+    def _retirer_si_terminee(self, tache):
+        with self._lock:
+            if tache.terminee() and self._en_cours.get(tache.cle) is tache:
+                del self._en_cours[tache.cle]
+
+    def annuler_proprietaire(self, session, sauf_page=None):
+        """Annule les tâches d'une session lancées depuis une autre page que `sauf_page`."""
+        with self._lock:
+            taches = [t for t in self._en_cours.values() if t.proprietaire and t.proprietaire[0] == session and t.proprietaire[1] != sauf_page]
+            for tache in taches:
+                del self._en_cours[tache.cle]
+        for tache in taches:
+            tache.annuler()
+            print(f"[OpenFisca] Tâche '{tache.type_tache}' annulée (calcul soumis depuis une autre page)")
+        self.annulees += len(taches)
+        return len(taches)
+
+    def arreter(self):
+        """Arrête les processus de travail (les tâches en attente sont annulées)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats_processus(self, timeout=5):
+        """
+        Compteurs OpenFisca d'un processus de travail (du processus courant sans processus de travail),
+        hors compteurs de tâches. None si aucun processus ne répond dans le délai (calculs en cours)
+        ou si le pool s'est interrompu pendant l'attente.
+        """
+        try:
+            return self._lancer('stats', {}).result(timeout)
+        except (concurrent.futures.TimeoutError, concurrent.futures.process.BrokenProcessPool):
+            return None
+
+    def stats(self):
+        """Retourne les compteurs du pool."""
+        with self._lock:
+            return {
+                'processus': self.nb_processus,
+                'en_cours': len(self._en_cours),
+                'soumises': self.soumises,
+                'dedupliquees': self.dedupliquees,
+                'annulees': self.annulees,
+            }
+
+OPENFISCA_WORKERS = OpenFiscaWorkerPool(
+    nb_processus=int(os.environ.get('AUDIT_OPENFISCA_WORKERS', 1)),
+    timeout=float(os.environ.get('AUDIT_OPENFISCA_TIMEOUT', 120))
+)
+
+def proprietaire_page(page):
+    """
+    Identifiant (session, page) des tâches lancées depuis une page Streamlit, à appeler par les
+    pages qui soumettent des calculs OpenFisca. Les tâches de la même session lancées depuis une
+    autre page sont alors annulées (celles déjà démarrées vont à leur terme, résultat ignoré).
+    """
+    import streamlit as st
+    if 'openfisca_session_id' not in st.session_state:
+        st.session_state.openfisca_session_id = uuid.uuid4().hex
+    session = st.session_state.openfisca_session_id
+    OPENFISCA_WORKERS.annuler_proprietaire(session, sauf_page=page)
+    return (session, page)
+
+def executer_tache(type_tache, message="Calcul OpenFisca en cours...", proprietaire=None, **parametres):
+    """
+    Soumet une tâche et attend son résultat en affichant une barre de progression Streamlit
+    (rafraîchie pendant l'attente). Hors Streamlit, attend simplement le résultat.
+    """
+    tache = OPENFISCA_WORKERS.soumettre(type_tache, proprietaire=proprietaire, **parametres)
+    if tache.terminee():
+        return tache.resultat()
+    try:
+        import streamlit as st
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        barre = st.progress(0.0, text=message) if get_script_run_ctx(suppress_warning=True) is not None else None
+    except ImportError:
+        barre = None
+    if barre is None:
+        return tache.resultat()
+
+    while not tache.terminee():
+        if tache.expiree():
+            break
+        barre.progress(tache.progression(), text=f"{message} ({tache.duree():.0f} s)")
+        time.sleep(0.1)
+    barre.empty()
+    return tache.resultat()
@@ -0,0 +1,166 @@
+# utils/simulation_pool.py
+"""
+Pool de simulations OpenFisca pré-construites, indexées par forme de foyer.
+
+Construire une simulation (`SimulationBuilder.build_from_entities`) à partir des dictionnaires
+d'entités coûte bien plus cher que le calcul lui-même lorsque seuls quelques montants changent
+(curseurs des pages Focus Fiscalité et Optimisation PER). Une simulation est donc construite une
+fois par forme de foyer (année, nombre de parents, enfants à charge exclusive / en garde alternée,
+case T, nombre de copies) puis réutilisée : seules les entrées variables sont réécrites avec
+`set_input` après avoir vidé les valeurs calculées lors de la requête précédente.
+"""
+
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from utils.tax_cache import _normaliser_date
+
+# Entrées réécrites à chaque requête (les autres entrées du cas définissent la forme du foyer)
+VARIABLES_REQUETE = ('date_naissance', 'salaire_imposable', 'f6rs', 'revenu_categoriel_foncier')
+
+def extraire_variables(simulation, variables, periode, nb_copies=1):
+    """
+    Calcule chaque variable une seule fois et la découpe par copie du foyer, d'après le nombre
+    d'entités de sa population (individus, foyers fiscaux, familles, ménages) dans la simulation.
+
+    Returns:
+        dict: variable -> tableau de forme (nb_copies, nb_entites_par_copie).
+    """
+    periode = str(periode)
+    resultats = {}
+    for variable in variables:
+        entite = simulation.tax_benefit_system.get_variable(variable).entity.key
+        nb_entites = simulation.populations[entite].count // nb_copies
+        resultats[variable] = np.asarray(simulation.calculate(variable, periode)).reshape(nb_copies, nb_entites)
+    return resultats
+
+class SimulationPool:
+    """
+    Pool thread-safe de simulations OpenFisca réutilisables.
+
+    Chaque forme de foyer conserve au plus `max_par_forme` simulations inactives ; une requête
+    concurrente sur une forme déjà utilisée construit une simulation supplémentaire plutôt que
+    d'attendre. Les formes les moins récemment utilisées sont évincées au-delà de `max_formes`.
+    """
+
+    def __init__(self, get_tax_benefit_system, max_formes=16, max_par_forme=2):
+        self._get_tax_benefit_system = get_tax_benefit_system
+        self.max_formes = max_formes
+        self.max_par_forme = max_par_forme
+        self._inactives = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.reuses = 0
+
+    @staticmethod
+    def cle_forme(annee, parents, enfants, est_parent_isole=False, nb_copies=1):
+        """Clé de la forme du foyer : tout ce qui fixe la structure des entités, sauf les montants et les dates."""
+        nb_garde_alternee = len([e for e in enfants if e.get('garde_alternee')])
+        return (int(annee), len(parents), len(enfants) - nb_garde_alternee, nb_garde_alternee, bool(est_parent_isole), int(nb_copies))
+
+    def _construire(self, cle):
+        annee, nb_parents, nb_plein, nb_alternee, est_parent_isole, nb_copies = cle
+        annee_str = str(annee)
+        declarants = [f'parent_{i+1}' for i in range(nb_parents)]
+        enfants = [f'enfant_{i+1}' for i in range(nb_plein + nb_alternee)]
+        individus = {nom: {} for nom in declarants + enfants}
+        foyer_fiscal = {'declarants': declarants, 'nb_pac': {annee_str: nb_plein}, 'nbH': {annee_str: nb_alternee}}
+        if est_parent_isole:
+            foyer_fiscal['caseT'] = {annee_str: True}
+        menage = {'personne_de_reference': [declarants[0]]}
+        if nb_parents > 1:
+            menage['conjoint'] = declarants[1:]
+        case = {
+            'individus': individus,
+            'foyers_fiscaux': {'foyerfiscal1': foyer_fiscal},
+            'familles': {'famille1': {'parents': declarants, 'enfants': enfants}},
+            'menages': {'menage1': menage},
+            # L'axe ne sert qu'à répliquer le foyer : les montants sont réécrits à chaque requête.
+            'axes': [[{'count': nb_copies, 'name': 'salaire_imposable', 'min': 0, 'max': 0, 'period': annee_str}]],
+        }
+        from openfisca_core.simulation_builder import SimulationBuilder
+        simulation = SimulationBuilder().build_from_entities(self._get_tax_benefit_system(), case)
+        # Entrées structurelles (nb_pac, nbH, caseT...) à conserver entre deux requêtes
+        simulation._entrees_structurelles = set(simulation.get_memory_usage()['by_variable']) - set(VARIABLES_REQUETE)
+        return simulation
+
+    def _acquerir(self, cle):
+        with self._lock:
+            inactives = self._inactives.get(cle)
+            if inactives:
+                self._inactives.move_to_end(cle)
+                self.reuses += 1
+                return inactives.pop()
+            self.builds += 1
+        return self._construire(cle)
+
+    def _liberer(self, cle, simulation):
+        with self._lock:
+            inactives = self._inactives.setdefault(cle, [])
+            self._inactives.move_to_end(cle)
+            if len(inactives) < self.max_par_forme:
+                inactives.append(simulation)
+            while len(self._inactives) > self.max_formes:
+                self._inactives.popitem(last=False)
+
+    def calculer(self, annee, parents, enfants, variables, salaires=None, versements_per=None, revenu_foncier_net=0, est_parent_isole=False, nb_copies=1):
+        """
+        Calcule des variables du foyer fiscal pour `nb_copies` copies du foyer.
+
+        Args:
+            salaires (array-like): Salaires imposables annuels, de forme (nb_copies, nb_parents) ou diffusable.
+            versements_per (array-like): Versements PER (f6rs), même forme que `salaires`.
+            revenu_foncier_net (array-like): Revenu foncier net, scalaire ou de forme (nb_copies,).
+
+        Returns:
+            dict: Un tableau de longueur `nb_copies` par variable demandée (valeur de la première
+            entité de chaque copie : le foyer fiscal du ménage, ou le premier déclarant).
+        """
+        cle = self.cle_forme(annee, parents, enfants, est_parent_isole, nb_copies)
+        annee_str = str(annee)
+        nb_parents, nb_enfants = len(parents), len(enfants)
+        nb_individus, nb_foyers = nb_parents + nb_enfants, 1 + nb_enfants
+
+        def par_individu(montants_parents):
+            tableau = np.zeros((nb_copies, nb_individus), dtype=np.float32)
+            if montants_parents is not None:
+                tableau[:, :nb_parents] = np.broadcast_to(np.asarray(montants_parents, dtype=float), (nb_copies, nb_parents))
+            return tableau.ravel()
+
+        # Les enfants non déclarés dans le foyer reçoivent chacun un foyer implicite, placé après le foyer du ménage
+        foncier = np.zeros((nb_copies, nb_foyers))
+        foncier[:, 0] = np.broadcast_to(np.asarray(revenu_foncier_net, dtype=float), (nb_copies,))
+
+        dates_parents = [_normaliser_date(p.get('date_naissance')) or '1980-01-01' for p in parents]
+        dates_enfants = [_normaliser_date(e.get('date_naissance')) or '2010-01-01' for e in enfants]
+        dates = np.tile(np.array(dates_parents + dates_enfants, dtype='datetime64[D]'), nb_copies)
+
+        # En cas d'erreur, la simulation (dans un état incertain) n'est pas remise dans le pool
+        simulation = self._acquerir(cle)
+        for variable in simulation.get_memory_usage()['by_variable']:
+            if variable not in simulation._entrees_structurelles:
+                simulation.delete_arrays(variable)
+        simulation.set_input('date_naissance', 'ETERNITY', dates)
+        simulation.set_input('salaire_imposable', annee_str, par_individu(salaires))
+        simulation.set_input('f6rs', annee_str, par_individu(versements_per))
+        simulation.set_input('revenu_categoriel_foncier', annee_str, foncier.ravel())
+        resultats = {var: valeurs[:, 0] for var, valeurs in extraire_variables(simulation, variables, annee_str, nb_copies).items()}
+        self._liberer(cle, simulation)
+        return resultats
+
+    def clear(self):
+        """Vide le pool et remet les compteurs à zéro."""
+        with self._lock:
+            self._inactives.clear()
+            self.builds = self.reuses = 0
+
+    def stats(self):
+        """Retourne les compteurs du pool."""
+        with self._lock:
+            return {
+                'formes': len(self._inactives),
+                'simulations': sum(len(v) for v in self._inactives.values()),
+                'builds': self.builds,
+                'reuses': self.reuses,
+            }
@@ -0,0 +1,133 @@
+# utils/tax_cache.py
+
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+
+def _normaliser_date(dob):
+    """Retourne une date de naissance au format 'AAAA-MM-JJ' (ou None), quel que soit son format d'origine."""
+    if isinstance(dob, dict) and dob.get('_type') == 'date':
+        return dob['value']
+    if hasattr(dob, 'strftime'):
+        return dob.strftime('%Y-%m-%d')
+    return None
+
+def _json_default(obj):
+    """Sérialise les scalaires NumPy et les dates rencontrés dans les résultats OpenFisca."""
+    if hasattr(obj, 'item'):
+        return obj.item()
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError(f"Type non sérialisable : {type(obj)}")
+
+def cle_fiscalite_foyer(annee, parents, enfants, revenus_annuels, revenu_foncier_net=0, est_parent_isole=False, namespace=''):
+    """
+    Calcule une clé canonique (SHA-256) des entrées de `analyser_fiscalite_foyer`.
+    Seules les données qui influencent le résultat sont prises en compte : l'ordre des
+    revenus n'a pas d'importance et les enfants ne sont identifiés que par leur date de
+    naissance et leur garde alternée.
+    """
+    contenu = {
+        'namespace': namespace,
+        'annee': int(annee),
+        'parents': [(p.get('prenom', f'parent_{i+1}'), _normaliser_date(p.get('date_naissance'))) for i, p in enumerate(parents)],
+        'enfants': sorted((_normaliser_date(e.get('date_naissance')) or '', bool(e.get('garde_alternee'))) for e in enfants),
+        'revenus_annuels': sorted((str(k), float(v)) for k, v in revenus_annuels.items()),
+        'revenu_foncier_net': float(revenu_foncier_net),
+        'est_parent_isole': bool(est_parent_isole),
+    }
+    return hashlib.sha256(json.dumps(contenu, sort_keys=True, default=_json_default).encode('utf-8')).hexdigest()
+
+class TaxResultCache:
+    """
+    Cache LRU des résultats fiscaux, partagé par toutes les sessions et protégé par un verrou.
+    Si `db_path` est renseigné, les résultats sont aussi persistés dans une base SQLite afin
+    de survivre à un redémarrage du serveur.
+    """
+
+    def __init__(self, maxsize=512, db_path=None):
+        self.maxsize = maxsize
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if db_path:
+            with sqlite3.connect(db_path) as conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS tax_results (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def get(self, key):
+        """Retourne une copie du résultat mis en cache, ou None."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(self._entries[key])
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, value)
+        return copy.deepcopy(value)
+
+    def put(self, key, value):
+        """Ajoute un résultat au cache (et à la base SQLite si elle est configurée)."""
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._store(key, value)
+        self._write_disk(key, value)
+
+    def clear(self):
+        """Vide le niveau mémoire et remet les compteurs à zéro (la base SQLite est conservée)."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self):
+        """Retourne les compteurs du cache."""
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / total if total else 0.0,
+                'persistent': bool(self.db_path),
+            }
+
+    def _store(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key):
+        if not self.db_path:
+            return None
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                row = conn.execute("SELECT value FROM tax_results WHERE key = ?", (key,)).fetchone()
+            return json.loads(row[0]) if row else None
+        except sqlite3.Error as e:
+            print(f"Erreur de lecture du cache fiscal SQLite: {e}")
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.db_path:
+            return
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("INSERT OR REPLACE INTO tax_results (key, value) VALUES (?, ?)",
+                             (key, json.dumps(value, default=_json_default)))
+        except (sqlite3.Error, TypeError) as e:
+            print(f"Erreur d'écriture du cache fiscal SQLite: {e}")